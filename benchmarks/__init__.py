@@ -0,0 +1,29 @@
+# encoding: utf-8
+""" Benchmarks and stress tests for the MXLIMS object store
+
+One module per feature, each runnable on its own from the top directory
+of the repository, e.g.:
+
+    python -m benchmarks.query --help
+
+Shared test data builders and checks are in benchmarks.fixtures
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
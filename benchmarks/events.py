@@ -0,0 +1,108 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Benchmark for MxlimsStore change events
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.events --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import random
+import time
+from contextlib import nullcontext
+
+from benchmarks.fixtures import benchmark_parser
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.impl.StoreEvents import EventKind
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+
+
+def benchmark_events(n_objects: int, seed: int = 0) -> dict:
+    """Time changes to the store without and with a change event subscriber
+
+    Creates n_objects Pins in Pucks, then moves each Pin to another Puck
+    three times and changes its barcode; without subscribers, with
+    a subscriber keeping a count of Pins per Puck, and with the same subscriber
+    and the changes made inside store.batch_events().
+    Raises RuntimeError if the count kept by the subscriber is wrong
+
+    :param n_objects: Number of Pins to create
+    :param seed: Random number seed
+    :return: Dictionary of timings in seconds, and numbers of events delivered
+    """
+    rng = random.Random(seed)
+    result = {}
+    for mode in ("no subscriber", "subscriber", "batched"):
+        with MxlimsStore() as store:
+            pucks = list(Puck() for _ in range(max(n_objects // 16, 1)))
+            pins = list(Pin(container_id=rng.choice(pucks).uuid) for _ in range(n_objects))
+            moves = list(rng.choice(pucks) for _ in range(3 * n_objects))
+            # {puck uuid: number of pins}, maintained from events
+            counts = {}
+            for pin in pins:
+                counts[pin.container_id] = counts.get(pin.container_id, 0) + 1
+            delivered = [0]
+
+            def count_pins(events: list) -> None:
+                delivered[0] += len(events)
+                for event in events:
+                    if event.fields == ("container_id",):
+                        if event.kind is EventKind.linked:
+                            counts[event.target] = counts.get(event.target, 0) + 1
+                        else:
+                            counts[event.target] -= 1
+
+            if mode != "no subscriber":
+                store.subscribe(count_pins, kinds=(EventKind.linked, EventKind.unlinked))
+            context = store.batch_events() if mode == "batched" else nullcontext()
+            start = time.perf_counter()
+            with context:
+                for ind, puck in enumerate(moves):
+                    pin = pins[ind % n_objects]
+                    pin.container = puck
+                    pin.barcode = f"P{ind}"
+            result[mode] = time.perf_counter() - start
+            result[f"{mode} events"] = delivered[0]
+            if mode != "no subscriber":
+                for puck in pucks:
+                    if counts.get(puck.uuid, 0) != len(puck.contents):
+                        raise RuntimeError("Pin count kept from events is wrong")
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "events",
+        """
+Benchmark for MXLIMS object store change events""",
+    )
+
+    argsobj = parser.parse_args()
+    timings = benchmark_events(argsobj.objects)
+    print(f"change events  objects: {argsobj.objects:8d}")
+    for mode in ("no subscriber", "subscriber", "batched"):
+        print(
+            f"    {mode:13s}  time: {timings[mode]:8.3f}s  "
+            f"events delivered: {timings[mode + ' events']:8d}"
+        )
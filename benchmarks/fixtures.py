@@ -0,0 +1,195 @@
+# encoding: utf-8
+""" Shared test data builders and checks for the MXLIMS store benchmarks
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import json
+import random
+import uuid
+from argparse import ArgumentParser, RawTextHelpFormatter
+from pathlib import Path
+from typing import Iterator, Optional
+
+import mxlims
+from mxlims.impl.MxlimsImplementation import (
+    LINK_ID_FIELDS_N1,
+    LINK_ID_FIELDS_NN,
+    MxlimsStore,
+)
+from mxlims.mxpydantic.messages.MxlimsMessageStrict import MxlimsMessageStrict
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+
+# Example messages, used as input for benchmarks
+MESSAGE_DIR = Path(mxlims.__file__).parent / "test" / "json" / "v0.6.13" / "messages"
+
+
+def benchmark_parser(
+    prog: str, description: str, objects: Optional[int] = 10000
+) -> ArgumentParser:
+    """ArgumentParser for running a benchmark module
+
+    :param prog: Program name, as shown in the help text
+    :param description: Description, as shown in the help text
+    :param objects: Default for the --objects option; None to leave it out
+    :return: ArgumentParser
+    """
+    parser = ArgumentParser(
+        prog=prog,
+        formatter_class=RawTextHelpFormatter,
+        prefix_chars="--",
+        description=description,
+    )
+    if objects is not None:
+        parser.add_argument(
+            "--objects",
+            metavar="objects",
+            type=int,
+            default=objects,
+            help="Number of objects to create for each object type",
+        )
+    return parser
+
+
+def make_pins_and_sweeps(
+    n_objects: int, rng: random.Random, energy: bool = True
+) -> tuple[list[Puck], list[Pin], list[CollectionSweep]]:
+    """Make n_objects Pins, with barcodes, in Pucks of 16 on average,
+    and a CollectionSweep for each Pin, in the current store
+
+    :param n_objects: Number of Pins (and of CollectionSweeps) to create
+    :param rng: Random number generator, for picking Pucks and energies
+    :param energy: Set a random energy on the CollectionSweeps?
+    :return: (Pucks, Pins, CollectionSweeps)
+    """
+    pucks = list(Puck(barcode=f"K{ind}") for ind in range(max(n_objects // 16, 1)))
+    pins = []
+    sweeps = []
+    for ind in range(n_objects):
+        pin = Pin(barcode=f"P{ind}", container_id=rng.choice(pucks).uuid)
+        pins.append(pin)
+        if energy:
+            sweeps.append(
+                CollectionSweep(
+                    energy=rng.uniform(12000.0, 13000.0),
+                    logistical_sample_id=pin.uuid,
+                )
+            )
+        else:
+            sweeps.append(CollectionSweep(logistical_sample_id=pin.uuid))
+    return pucks, pins, sweeps
+
+
+def write_pins_and_sweeps(path: Path, n_objects: int, rng: random.Random) -> int:
+    """Write an MxlimsMessageStrict message with objects from make_pins_and_sweeps
+
+    The objects are made in a temporary store, and are not kept
+
+    :param path: Message file to write
+    :param n_objects: Number of Pins (and of CollectionSweeps) to create
+    :param rng: Random number generator, for picking Pucks and energies
+    :return: Number of objects in the message
+    """
+    with MxlimsStore():
+        pucks, pins, sweeps = make_pins_and_sweeps(n_objects, rng)
+        contents = pucks + pins + sweeps
+        MxlimsMessageStrict.from_pydantic_objects(contents).export_message(path)
+        return len(contents)
+
+
+def scale_message(message_dict: dict, scale: int) -> dict:
+    """Make message with scale copies of the objects in schema-compliant message_dict
+
+    Copies get new uuids, and names with a copy number suffix, and link
+    within their copy
+
+    :param message_dict: Schema-compliant JSON message
+    :param scale: Number of copies
+    :return: Schema-compliant JSON message
+    """
+    uids = set()
+    for tag, objdict in message_dict.items():
+        if tag != "version":
+            uids.update(obj["uuid"] for obj in objdict.values() if obj.get("uuid"))
+
+    def convert(value, suffix: str, uuid_map: dict):
+        if isinstance(value, dict):
+            if "$ref" in value:
+                return {"$ref": value["$ref"] + suffix}
+            return dict((key, convert(val, suffix, uuid_map)) for key, val in value.items())
+        elif isinstance(value, list):
+            return list(convert(val, suffix, uuid_map) for val in value)
+        return uuid_map.get(value, value) if isinstance(value, str) else value
+
+    result = {}
+    for copy in range(scale):
+        suffix = f"_{copy}"
+        uuid_map = dict((uid, str(uuid.uuid5(uuid.UUID(uid), suffix))) for uid in uids)
+        for tag, objdict in message_dict.items():
+            if tag == "version":
+                result[tag] = objdict
+            else:
+                target = result.setdefault(tag, {})
+                for name, obj in objdict.items():
+                    target[name + suffix] = convert(obj, suffix, uuid_map)
+    return result
+
+
+def iter_scaled_messages(classes: tuple, scale: int) -> Iterator[tuple]:
+    """Iterate over the valid test messages for classes, scaled up
+
+    :param classes: Message classes, whose test messages to use
+    :param scale: Number of copies of the objects in each test message
+    :return: Iterator of (message class, message file path, scaled message as
+        JSON text)
+    """
+    for cls in classes:
+        for path in sorted((MESSAGE_DIR / cls.__name__ / "valid").glob("*.json")):
+            yield cls, path, json.dumps(
+                scale_message(json.loads(path.read_text()), scale), indent=4
+            )
+
+
+def check_link_index(store: MxlimsStore) -> list[str]:
+    """Compare reverse-link index with index recalculated from object fields
+
+    :param store: MxlimsStore to check
+    :return: List of error messages, empty if the index is correct
+    """
+    expected = {key: {} for key in store.links_to}
+    for basetypename, obj_by_id in store.objects_by_id.items():
+        for uid, obj in obj_by_id.items():
+            for id_field_name in LINK_ID_FIELDS_N1[basetypename]:
+                target_uid = getattr(obj, id_field_name)
+                if target_uid is not None:
+                    dd0 = expected[(basetypename, id_field_name)]
+                    dd0.setdefault(target_uid, set()).add(uid)
+            for id_field_name in LINK_ID_FIELDS_NN[basetypename]:
+                for target_uid in getattr(obj, id_field_name) or ():
+                    dd0 = expected[(basetypename, id_field_name)]
+                    dd0.setdefault(target_uid, set()).add(uid)
+    result = []
+    for key, index in store.links_to.items():
+        found = dict((target_uid, set(dd1)) for target_uid, dd1 in index.items())
+        if found != expected[key]:
+            result.append(f"Reverse-link index mismatch for {key}")
+    return result
@@ -0,0 +1,106 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Benchmark for exporting only the objects changed since a checkpoint
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.incremental_export --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fixtures import benchmark_parser, make_pins_and_sweeps
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.messages.MxlimsMessageStrict import MxlimsMessageStrict
+from mxlims.mxpydantic.objects.MxProcessing import MxProcessing
+
+
+def benchmark_incremental_export(
+    n_objects: int, n_changed: int = 10, seed: int = 0
+) -> dict:
+    """Time exporting a message in full, and only the objects changed since a
+    checkpoint
+
+    Creates n_objects Pins in Pucks, with a CollectionSweep for each and
+    an MxProcessing Job for every ten CollectionSweeps, and changes the
+    job_status of n_changed Jobs after taking a checkpoint.
+    Raises RuntimeError if the incremental export has the wrong objects
+
+    :param n_objects: Number of Pins (and of CollectionSweeps) to create
+    :param n_changed: Number of Jobs to change
+    :param seed: Random number seed
+    :return: Dictionary of timings in seconds, and file sizes in bytes
+    """
+    rng = random.Random(seed)
+    result = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        message_path = Path(tmpdir) / "message.json"
+        with MxlimsStore() as store:
+            pucks, pins, sweeps = make_pins_and_sweeps(n_objects, rng, energy=False)
+            jobs = list(
+                MxProcessing(
+                    job_status="Running",
+                    input_data_ids=list(sweep.uuid for sweep in sweeps[ind:ind + 10]),
+                )
+                for ind in range(0, n_objects, 10)
+            )
+            message = MxlimsMessageStrict.from_pydantic_objects(
+                pucks + pins + sweeps + jobs
+            )
+            checkpoint = store.checkpoint()
+            changed = rng.sample(jobs, min(n_changed, len(jobs)))
+            for job in changed:
+                job.job_status = "Completed"
+            for since in (None, checkpoint):
+                start = time.perf_counter()
+                message.export_message(message_path, since=since, store=store)
+                label = "full" if since is None else "incremental"
+                result[label] = time.perf_counter() - start
+                result[f"{label} size"] = message_path.stat().st_size
+            exported = json.loads(message_path.read_text()).get("MxProcessing", {})
+            if set(obj["uuid"] for obj in exported.values()) != set(
+                str(job.uuid) for job in changed
+            ):
+                raise RuntimeError("Incremental export has the wrong objects")
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "incremental_export",
+        """
+Benchmark for incremental export of MXLIMS messages""",
+    )
+
+    argsobj = parser.parse_args()
+    timings = benchmark_incremental_export(argsobj.objects)
+    print(
+        f"export  objects: {argsobj.objects:8d}\n"
+        f"    full: {timings['full']:8.3f}s  size: {timings['full size']:10d} bytes\n"
+        f"    changed since checkpoint: {timings['incremental']:8.4f}s  "
+        f"size: {timings['incremental size']:10d} bytes"
+    )
@@ -0,0 +1,114 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Benchmark for parsing and loading messages with each available JSON backend
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.json_backends --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import gc
+import io
+import time
+
+from benchmarks.fixtures import benchmark_parser, iter_scaled_messages
+from mxlims.impl import JsonBackend
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.messages.MxlimsMessageStrict import MxlimsMessageStrict
+from mxlims.mxpydantic.messages.ShipmentMessage import ShipmentMessage
+
+
+def benchmark_json_backends(
+    scale: int = 1000, n_repeats: int = 3
+) -> list[tuple[str, int, dict]]:
+    """Time parsing and loading the valid test messages, scaled up,
+    with each available JSON backend
+
+    Raises RuntimeError if the messages loaded with different backends
+    are exported differently
+
+    :param scale: Number of copies of the objects in each test message
+    :param n_repeats: Number of times to run each, keeping the fastest
+    :return: List of (message file name, number of objects, dictionary of
+        timings in seconds, by backend name and operation)
+    """
+    previous = JsonBackend.get_json_backend().name
+    result = []
+    try:
+        for cls, path, text in iter_scaled_messages(
+            (MxlimsMessageStrict, ShipmentMessage), scale
+        ):
+            data = text.encode()
+            timings = {}
+            outputs = set()
+            for _ in range(n_repeats):
+                for name in JsonBackend.BACKENDS:
+                    backend = JsonBackend.set_json_backend(name)
+                    gc.collect()
+                    start = time.perf_counter()
+                    backend.loads(data)
+                    times = {"parse": time.perf_counter() - start}
+                    with MxlimsStore() as store:
+                        start = time.perf_counter()
+                        message = cls.from_message_json(data, store=store)
+                        times["load"] = time.perf_counter() - start
+                        buffer = io.StringIO()
+                        message.write_message(buffer)
+                        n_objects = len(store.objects)
+                    outputs.add(buffer.getvalue())
+                    del message, buffer
+                    for operation, seconds in times.items():
+                        key = f"{name} {operation}"
+                        timings[key] = min(timings.get(key, seconds), seconds)
+            if len(outputs) != 1:
+                raise RuntimeError(f"JSON backends differ in output for {path.name}")
+            result.append((f"{cls.__name__}/{path.name}", n_objects, timings))
+    finally:
+        JsonBackend.set_json_backend(previous)
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "json_backends",
+        """
+Benchmark for the MXLIMS JSON parsing backends""",
+        objects=None,
+    )
+    parser.add_argument(
+        "--scale",
+        metavar="scale",
+        type=int,
+        default=1000,
+        help="Number of copies of the objects in each test message",
+    )
+
+    argsobj = parser.parse_args()
+    print(f"JSON backends, test messages scaled up {argsobj.scale} times")
+    for name, n_objects, timings in benchmark_json_backends(argsobj.scale):
+        print(f"    {name}  objects: {n_objects:8d}")
+        for backend in JsonBackend.BACKENDS:
+            print(
+                f"        {backend:8s}  parse: {timings[backend + ' parse']:8.3f}s  "
+                f"load: {timings[backend + ' load']:8.3f}s"
+            )
@@ -0,0 +1,120 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Benchmark for loading a message eagerly and lazily
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.lazy_loading --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.fixtures import benchmark_parser, make_pins_and_sweeps
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.messages.MxlimsMessageStrict import MxlimsMessageStrict
+from mxlims.mxpydantic.objects.MxProcessing import MxProcessing
+
+
+def benchmark_lazy(n_objects: int, n_jobs: int = 10, seed: int = 0) -> dict:
+    """Time loading a message eagerly and lazily, and using a few objects from it
+
+    Creates n_objects Pins in Pucks, with a CollectionSweep for each, and
+    n_jobs MxProcessing Jobs with ten input CollectionSweeps each, and saves
+    them as an MxlimsMessageStrict message. After loading, the Jobs are read,
+    with their input data and the Pins these were collected on.
+    Raises RuntimeError if the two ways of loading give different results
+
+    :param n_objects: Number of Pins (and of CollectionSweeps) to create
+    :param n_jobs: Number of MxProcessing Jobs to create
+    :param seed: Random number seed
+    :return: Dictionary of timings in seconds, and peak memory use in bytes
+    """
+    rng = random.Random(seed)
+    result = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        message_path = Path(tmpdir) / "message.json"
+        with MxlimsStore():
+            pucks, pins, sweeps = make_pins_and_sweeps(n_objects, rng)
+            jobs = list(
+                MxProcessing(
+                    input_data_ids=list(sweep.uuid for sweep in rng.sample(sweeps, 10))
+                )
+                for _ in range(n_jobs)
+            )
+            job_uids = list(job.uuid for job in jobs)
+            MxlimsMessageStrict.from_pydantic_objects(
+                pucks + pins + sweeps + jobs
+            ).export_message(message_path)
+            del pucks, pins, sweeps, jobs
+        used = []
+        for lazy in (False, True):
+            for measure_memory in (False, True):
+                with MxlimsStore() as store:
+                    if measure_memory:
+                        tracemalloc.start()
+                    start = time.perf_counter()
+                    if lazy:
+                        MxlimsMessageStrict.load_lazy(message_path, store=store)
+                    else:
+                        MxlimsMessageStrict.from_message_file(message_path, store=store)
+                    loaded = time.perf_counter()
+                    barcodes = []
+                    for uid in job_uids:
+                        for sweep in store.get(uid).input_data:
+                            barcodes.append((sweep.energy, sweep.logistical_sample.barcode))
+                    finished = time.perf_counter()
+                    label = "lazy" if lazy else "eager"
+                    if measure_memory:
+                        result[f"{label} memory"] = tracemalloc.get_traced_memory()[1]
+                        tracemalloc.stop()
+                    else:
+                        result[f"{label} load"] = loaded - start
+                        result[f"{label} use"] = finished - loaded
+                        result[f"{label} objects"] = len(store.objects)
+                        used.append(barcodes)
+        if used[0] != used[1]:
+            raise RuntimeError("Objects loaded eagerly and lazily differ")
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "lazy_loading",
+        """
+Benchmark for lazy loading of MXLIMS messages""",
+    )
+
+    argsobj = parser.parse_args()
+    timings = benchmark_lazy(argsobj.objects)
+    print(f"lazy loading  objects: {argsobj.objects:8d}")
+    for label in ("eager", "lazy"):
+        print(
+            f"    {label:5s}  load: {timings[label + ' load']:8.3f}s  "
+            f"use: {timings[label + ' use']:8.4f}s  "
+            f"objects created: {timings[label + ' objects']:8d}  "
+            f"peak memory: {timings[label + ' memory'] / 1e6:8.1f}MB"
+        )
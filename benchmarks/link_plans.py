@@ -0,0 +1,187 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Benchmark for converting message links with the compiled LINK_PLANS
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.link_plans --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import json
+import time
+import uuid
+
+from benchmarks.fixtures import benchmark_parser
+from mxlims.impl.MxlimsBase import snake_to_camel
+from mxlims.impl.MxlimsImplementation import (
+    LINK_SPECIFICATION,
+    export_links,
+    import_links,
+)
+
+
+def _walk_import_links(tag: str, obj: dict, resolve) -> None:
+    """import_links as done before LINK_PLANS, walking LINK_SPECIFICATION"""
+    for linkdict in LINK_SPECIFICATION[tag]["links"].values():
+        link_id_name_orig = linkdict.get("link_id_name")
+        if link_id_name_orig:
+            link_id_name = snake_to_camel(link_id_name_orig)
+            data = obj.pop(linkdict.get("link_ref_name"), None)
+            if data:
+                if linkdict["cardinality"] == "single":
+                    obj[link_id_name] = resolve(data["$ref"])
+                else:
+                    obj[link_id_name] = list(resolve(ddref["$ref"]) for ddref in data)
+
+
+def _walk_export_links(
+    tag: str, obj: dict, uuid_to_id: dict, stub_sections: dict
+) -> None:
+    """export_links as done before LINK_PLANS, walking LINK_SPECIFICATION
+
+    Links to objects outside the message are dropped, as the benchmark has none
+    """
+    for linkdict in LINK_SPECIFICATION[tag]["links"].values():
+        link_id_name_orig = linkdict.get("link_id_name")
+        if link_id_name_orig:
+            link_uid = obj.pop(snake_to_camel(link_id_name_orig), ())
+            if linkdict["cardinality"] == "single":
+                if link_uid:
+                    tpl = uuid_to_id.get(link_uid)
+                    if tpl:
+                        obj[linkdict["link_ref_name"]] = {"$ref": tpl[1]}
+            elif linkdict["cardinality"] == "multiple":
+                if link_uid:
+                    obj[linkdict["link_ref_name"]] = reflist = []
+                    for luid in link_uid:
+                        tpl = uuid_to_id.get(luid)
+                        if tpl:
+                            reflist.append({"$ref": tpl[1]})
+
+
+def benchmark_link_plans(n_objects: int = 100000) -> dict:
+    """Time converting the links of a schema-compliant message to and from '$ref'
+    form, walking LINK_SPECIFICATION for each object, and with LINK_PLANS
+
+    The message has, for every 32 objects, a Puck with 15 Pins, a CollectionSweep
+    for each Pin, and an MxProcessing with the CollectionSweeps as input.
+    Only the link conversion is timed, not validation.
+    Raises RuntimeError if the two give different results
+
+    :param n_objects: Approximate number of objects in the message
+    :return: Dictionary of timings in seconds, and the number of objects
+    """
+    message = {"version": "0.6.13"}
+    for tag in ("Puck", "Pin", "CollectionSweep", "MxProcessing"):
+        message[tag] = {}
+    for block in range(max(n_objects // 32, 1)):
+        puck_name = f"Puck{block}"
+        message["Puck"][puck_name] = {"mxlimsType": "Puck", "uuid": str(uuid.uuid4())}
+        sweep_refs = []
+        for ind in range(block * 15, block * 15 + 15):
+            message["Pin"][f"Pin{ind}"] = {
+                "mxlimsType": "Pin",
+                "uuid": str(uuid.uuid4()),
+                "containerRef": {"$ref": f"#/Puck/{puck_name}"},
+            }
+            message["CollectionSweep"][f"CollectionSweep{ind}"] = {
+                "mxlimsType": "CollectionSweep",
+                "uuid": str(uuid.uuid4()),
+                "logisticalSampleRef": {"$ref": f"#/Pin/Pin{ind}"},
+            }
+            sweep_refs.append({"$ref": f"#/CollectionSweep/CollectionSweep{ind}"})
+        message["MxProcessing"][f"MxProcessing{block}"] = {
+            "mxlimsType": "MxProcessing",
+            "uuid": str(uuid.uuid4()),
+            "inputDataRefs": sweep_refs,
+        }
+    text = json.dumps(message)
+    uuid_to_id = {}
+    for tag, objdict in message.items():
+        if tag != "version":
+            for name, obj in objdict.items():
+                uuid_to_id[obj["uuid"]] = (obj["mxlimsType"], f"#/{tag}/{name}")
+
+    def resolve_split(ref: str) -> str:
+        tags = ref.split("/", 2)[-2:]
+        return message[tags[0]][tags[1]]["uuid"]
+
+    result = {"objects": len(uuid_to_id)}
+    outputs = {}
+    for mode, import_fn, export_fn in (
+        ("walk", _walk_import_links, _walk_export_links),
+        ("plan", import_links, export_links),
+    ):
+        if mode == "walk":
+            resolve = resolve_split
+        else:
+            resolved = {}
+
+            def resolve(ref: str) -> str:
+                uid = resolved.get(ref)
+                if uid is None:
+                    uid = resolved[ref] = resolve_split(ref)
+                return uid
+
+        message_dict = json.loads(text)
+        start = time.perf_counter()
+        for tag, objdict in message_dict.items():
+            if tag != "version":
+                for obj in objdict.values():
+                    import_fn(tag, obj, resolve)
+        result[f"{mode} import"] = time.perf_counter() - start
+        imported = json.dumps(message_dict)
+        start = time.perf_counter()
+        for tag, objdict in message_dict.items():
+            if tag != "version":
+                for obj in objdict.values():
+                    export_fn(tag, obj, uuid_to_id, {})
+        result[f"{mode} export"] = time.perf_counter() - start
+        outputs[mode] = (imported, json.dumps(message_dict))
+    if outputs["walk"] != outputs["plan"]:
+        raise RuntimeError("Link conversion with LINK_PLANS gives different results")
+    if outputs["plan"][1] != text:
+        raise RuntimeError("Link conversion does not round-trip")
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "link_plans",
+        """
+Benchmark for MXLIMS message link conversion""",
+        objects=100000,
+    )
+
+    argsobj = parser.parse_args()
+    timings = benchmark_link_plans(argsobj.objects)
+    print(f"link conversion  objects: {timings['objects']:8d}")
+    for mode in ("walk", "plan"):
+        import_time = timings[mode + " import"]
+        export_time = timings[mode + " export"]
+        print(
+            f"    {mode}  import: {import_time:8.3f}s "
+            f"({import_time / timings['objects'] * 1e6:6.2f}us/object)  "
+            f"export: {export_time:8.3f}s "
+            f"({export_time / timings['objects'] * 1e6:6.2f}us/object)"
+        )
@@ -0,0 +1,100 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Benchmark for loading messages in a single validation pass
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.message_import --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import io
+import json
+import random
+import time
+
+from benchmarks.fixtures import benchmark_parser, make_pins_and_sweeps
+from mxlims.impl.MxlimsImplementation import to_import_json
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.messages.MxlimsMessageStrict import MxlimsMessageStrict
+
+
+def benchmark_import(n_objects: int, n_repeats: int = 3, seed: int = 0) -> dict:
+    """Time loading a message by converting it with to_import_json and then
+    validating it, and with from_message_json, converting during validation
+
+    Creates n_objects Pins in Pucks, with a CollectionSweep for each, and
+    saves them as an MxlimsMessageStrict message. Both ways load from the
+    message bytes into a new store, in a transaction.
+    Raises RuntimeError if the numbers of objects loaded differ
+
+    :param n_objects: Number of Pins (and of CollectionSweeps) to create
+    :param n_repeats: Number of times to load, keeping the fastest
+    :param seed: Random number seed
+    :return: Dictionary of timings in seconds, and the number of objects
+    """
+    rng = random.Random(seed)
+    with MxlimsStore():
+        pucks, pins, sweeps = make_pins_and_sweeps(n_objects, rng)
+        buffer = io.StringIO()
+        MxlimsMessageStrict.from_pydantic_objects(
+            pucks + pins + sweeps
+        ).write_message(buffer)
+        data = buffer.getvalue().encode()
+        del pucks, pins, sweeps, buffer
+    result = {}
+    for mode in ("convert first", "single pass"):
+        times = []
+        for _ in range(n_repeats):
+            with MxlimsStore() as store:
+                start = time.perf_counter()
+                if mode == "single pass":
+                    MxlimsMessageStrict.from_message_json(data, store=store)
+                else:
+                    with store.activate(), store.transaction():
+                        message_dict = json.loads(data)
+                        to_import_json(message_dict)
+                        MxlimsMessageStrict.model_validate(message_dict)
+                times.append(time.perf_counter() - start)
+                count = len(store.objects)
+            result.setdefault("objects", count)
+            if count != result["objects"]:
+                raise RuntimeError(f"{mode} loaded {count} of {result['objects']} objects")
+        result[mode] = min(times)
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "message_import",
+        """
+Benchmark for MXLIMS message import""",
+    )
+
+    argsobj = parser.parse_args()
+    timings = benchmark_import(argsobj.objects)
+    print(f"message import  objects: {timings['objects']:8d}")
+    for mode in ("convert first", "single pass"):
+        print(
+            f"    {mode:13s}  time: {timings[mode]:8.3f}s  "
+            f"({timings[mode] / timings['objects'] * 1e6:6.2f}us/object)"
+        )
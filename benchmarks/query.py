@@ -0,0 +1,105 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Benchmark for MxlimsStore queries, with and without use of indices
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.query --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import random
+import time
+
+from benchmarks.fixtures import benchmark_parser, make_pins_and_sweeps
+from mxlims.impl.MxlimsStore import MxlimsStore
+
+
+def benchmark_query(n_objects: int, seed: int = 0) -> list[tuple[str, str, float, float]]:
+    """Time queries with and without use of indices
+
+    Creates n_objects Pins, with barcodes, in Pucks, and a CollectionSweep
+    with random energy for each Pin. Raises RuntimeError if indexed and
+    scanning queries give different results
+
+    :param n_objects: Number of Pins (and of CollectionSweeps) to create
+    :param seed: Random number seed
+    :return: List of (query description, plan, indexed time, scan time)
+    """
+    rng = random.Random(seed)
+    with MxlimsStore() as store:
+        pucks, pins, sweeps = make_pins_and_sweeps(n_objects, rng)
+        puck = pucks[len(pucks) // 2]
+        queries = (
+            ("Pin by barcode", "Pin", (("barcode", "==", f"P{n_objects // 2}"),)),
+            (
+                "CollectionSweep by energy range and Puck",
+                "CollectionSweep",
+                (
+                    ("energy", "between", (12600.0, 12800.0)),
+                    ("logisticalSample.container", "==", puck),
+                ),
+            ),
+            (
+                "CollectionSweep by Puck barcode",
+                "CollectionSweep",
+                (("logisticalSample.container.barcode", "==", puck.barcode),),
+            ),
+            (
+                "CollectionSweep by energy range",
+                "CollectionSweep",
+                (("energy", "between", (12600.0, 12800.0)),),
+            ),
+        )
+        result = []
+        for description, mxlims_type, conditions in queries:
+            times = []
+            found = []
+            for use_indexes in (True, False):
+                query = store.query(mxlims_type, use_indexes=use_indexes)
+                for condition in conditions:
+                    query = query.where(*condition)
+                start = time.perf_counter()
+                found.append(query.all())
+                times.append(time.perf_counter() - start)
+            if found[0] != found[1]:
+                raise RuntimeError(f"Indexed and scanning results differ for {description}")
+            plan = store.query(mxlims_type)
+            for condition in conditions:
+                plan = plan.where(*condition)
+            result.append((description, plan.plan()[0], times[0], times[1]))
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "query",
+        """
+Benchmark for MXLIMS object store queries""",
+    )
+
+    argsobj = parser.parse_args()
+    for description, plan, indexed, scanned in benchmark_query(argsobj.objects):
+        print(
+            f"query: {description}  objects: {argsobj.objects:8d}\n"
+            f"    indexed: {indexed:8.4f}s  scan: {scanned:8.4f}s  plan: {plan}"
+        )
@@ -0,0 +1,129 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Benchmark for read-only MxlimsStore snapshots, read while another thread writes
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.snapshot --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import random
+import threading
+import time
+
+from benchmarks.fixtures import benchmark_parser, check_link_index, make_pins_and_sweeps
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.Pin import Pin
+
+
+def benchmark_snapshot(n_objects: int, n_snapshots: int = 100, seed: int = 0) -> dict:
+    """Time snapshot creation, and reading from snapshots while another thread writes
+
+    Creates n_objects Pins in Pucks, with a CollectionSweep for each, and
+    then adds as many again from a writer thread, while a reader thread
+    repeatedly takes a snapshot and queries it.
+    Raises RuntimeError if a snapshot has inconsistent indices
+
+    :param n_objects: Number of Pins (and of CollectionSweeps) to create initially
+    :param n_snapshots: Number of snapshots to time
+    :param seed: Random number seed
+    :return: Dictionary of timings in seconds, and count of snapshots read
+    """
+    rng = random.Random(seed)
+    store = MxlimsStore(thread_safe=True)
+    with store.activate():
+        pucks = make_pins_and_sweeps(n_objects, rng, energy=False)[0]
+    result = {}
+    start = time.perf_counter()
+    for _ in range(n_snapshots):
+        store.snapshot()
+    result["snapshot"] = (time.perf_counter() - start) / n_snapshots
+    snapshot = store.snapshot()
+    with store.activate():
+        start = time.perf_counter()
+        pin = Pin(container_id=pucks[0].uuid)
+        result["first write"] = time.perf_counter() - start
+        start = time.perf_counter()
+        Pin(container_id=pucks[0].uuid)
+        result["second write"] = time.perf_counter() - start
+    del snapshot
+    done = threading.Event()
+    messages = []
+    reads = 0
+
+    def read():
+        nonlocal reads
+        while not done.is_set():
+            snapshot = store.snapshot()
+            puck = snapshot.get(rng.choice(pucks).uuid)
+            count = snapshot.query("CollectionSweep").where(
+                "logisticalSample.container", "==", puck
+            ).count()
+            if count != sum(len(pin.datasets) for pin in puck.contents):
+                messages.append("Inconsistent query result in snapshot")
+            reads += 1
+        messages.extend(check_link_index(snapshot))
+
+    def write():
+        with store.activate():
+            for _ in range(n_objects):
+                pin = Pin(container_id=rng.choice(pucks).uuid)
+                CollectionSweep(logistical_sample_id=pin.uuid)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    start = time.perf_counter()
+    write()
+    result["write with reader"] = time.perf_counter() - start
+    done.set()
+    reader.join()
+    result["snapshots read"] = reads
+    start = time.perf_counter()
+    write()
+    result["write alone"] = time.perf_counter() - start
+    store.close()
+    if messages:
+        raise RuntimeError("\n".join(messages))
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "snapshot",
+        """
+Benchmark for read-only MXLIMS object store snapshots""",
+    )
+
+    argsobj = parser.parse_args()
+    timings = benchmark_snapshot(argsobj.objects)
+    print(
+        f"snapshot  objects: {argsobj.objects:8d}  "
+        f"create: {timings['snapshot'] * 1e6:8.1f}us  "
+        f"first write after: {timings['first write']:8.4f}s  "
+        f"next write: {timings['second write'] * 1e6:8.1f}us\n"
+        f"    writing {argsobj.objects} objects  "
+        f"alone: {timings['write alone']:8.3f}s  "
+        f"with snapshot reader: {timings['write with reader']:8.3f}s  "
+        f"snapshots read: {timings['snapshots read']}"
+    )
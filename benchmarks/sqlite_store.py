@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Benchmark for creating, reopening and navigating a SqliteStore
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.sqlite_store --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fixtures import benchmark_parser
+from mxlims.impl.SqliteStore import SqliteStore
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+
+
+def benchmark_sqlite(
+    n_objects: int, cache_size: int = 1000, n_lookups: int = 1000, seed: int = 0
+) -> dict:
+    """Time creating, reopening and navigating a SqliteStore
+
+    Creates n_objects Pins in Pucks, with a CollectionSweep for each,
+    in a SqliteStore with an LRU cache much smaller than the number of
+    objects, and then reopens it and follows links from Pucks found by barcode.
+    Raises RuntimeError if the links read back are inconsistent
+
+    :param n_objects: Number of Pins (and of CollectionSweeps) to create
+    :param cache_size: Number of objects kept in memory
+    :param n_lookups: Number of barcode lookups to time
+    :param seed: Random number seed
+    :return: Dictionary of timings in seconds, and database size in bytes
+    """
+    rng = random.Random(seed)
+    n_pucks = max(n_objects // 16, 1)
+    result = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "store.sqlite"
+        start = time.perf_counter()
+        with SqliteStore(path, cache_size=cache_size) as store:
+            # Keeping only uuids, so that objects can leave the cache
+            puck_uids = list(
+                Puck(barcode=f"K{ind}").uuid for ind in range(n_pucks)
+            )
+            for ind in range(n_objects):
+                pin = Pin(barcode=f"P{ind}", container_id=rng.choice(puck_uids))
+                CollectionSweep(
+                    energy=rng.uniform(12000.0, 13000.0), logistical_sample_id=pin.uuid
+                )
+        result["create"] = time.perf_counter() - start
+        result["database size"] = path.stat().st_size
+        start = time.perf_counter()
+        store = SqliteStore(path, cache_size=cache_size)
+        result["open"] = time.perf_counter() - start
+        barcodes = list(f"K{rng.randrange(n_pucks)}" for _ in range(n_lookups))
+        for label in ("cold", "warm"):
+            start = time.perf_counter()
+            count = 0
+            for barcode in barcodes:
+                for puck in store.lookup("barcode", barcode):
+                    for pin in puck.contents:
+                        count += len(pin.datasets)
+            result[f"navigate {label}"] = (time.perf_counter() - start) / n_lookups
+        start = time.perf_counter()
+        n_found = sum(1 for _ in store.iter_objects("CollectionSweep"))
+        result["scan"] = time.perf_counter() - start
+        store.close()
+        if n_found != n_objects:
+            raise RuntimeError(f"Found {n_found} CollectionSweeps, expected {n_objects}")
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "sqlite_store",
+        """
+Benchmark for the SQLite-backed MXLIMS object store""",
+    )
+
+    argsobj = parser.parse_args()
+    timings = benchmark_sqlite(argsobj.objects)
+    print(
+        f"sqlite  objects: {argsobj.objects:8d}  "
+        f"size: {timings['database size']:10d} bytes\n"
+        f"    create: {timings['create']:8.3f}s  open: {timings['open']:8.4f}s  "
+        f"scan sweeps: {timings['scan']:8.3f}s\n"
+        f"    puck navigation  cold: {timings['navigate cold'] * 1e3:8.3f}ms  "
+        f"warm: {timings['navigate warm'] * 1e3:8.3f}ms"
+    )
@@ -0,0 +1,107 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Benchmark for loading a message in one go and incrementally
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.streaming --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.fixtures import benchmark_parser, write_pins_and_sweeps
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.impl.SqliteStore import SqliteStore
+from mxlims.mxpydantic.messages.MxlimsMessageStrict import MxlimsMessageStrict
+
+
+def benchmark_streaming(n_objects: int, seed: int = 0) -> dict:
+    """Time loading a message in one go and incrementally, and their peak memory use
+
+    Creates n_objects Pins in Pucks, with a CollectionSweep for each, and saves
+    them as an MxlimsMessageStrict message. This is loaded with
+    from_message_file into a normal store, and with iter_message_file into
+    a weak store, keeping no objects, and into a SqliteStore.
+    Raises RuntimeError if the numbers of objects loaded differ
+
+    :param n_objects: Number of Pins (and of CollectionSweeps) to create
+    :param seed: Random number seed
+    :return: Dictionary of timings in seconds, and peak memory use in bytes
+    """
+    rng = random.Random(seed)
+    result = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        message_path = Path(tmpdir) / "message.json"
+        n_contents = write_pins_and_sweeps(message_path, n_objects, rng)
+        result["message size"] = message_path.stat().st_size
+        for mode in ("whole", "stream weak", "stream sqlite"):
+            for measure_memory in (False, True):
+                if mode == "stream sqlite":
+                    store = SqliteStore(Path(tmpdir) / f"{measure_memory}.db")
+                else:
+                    store = MxlimsStore(weak=(mode == "stream weak"))
+                if measure_memory:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                if mode == "whole":
+                    MxlimsMessageStrict.from_message_file(message_path, store=store)
+                    count = len(store.objects)
+                else:
+                    count = 0
+                    for _ in MxlimsMessageStrict.iter_message_file(
+                        message_path, store=store
+                    ):
+                        count += 1
+                if measure_memory:
+                    result[f"{mode} memory"] = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                else:
+                    result[mode] = time.perf_counter() - start
+                store.close()
+                if count != n_contents:
+                    raise RuntimeError(f"{mode} loaded {count} of {n_contents} objects")
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "streaming",
+        """
+Benchmark for streaming load of MXLIMS messages""",
+    )
+
+    argsobj = parser.parse_args()
+    timings = benchmark_streaming(argsobj.objects)
+    print(
+        f"streaming load  objects: {argsobj.objects:8d}  "
+        f"message: {timings['message size']:10d} bytes"
+    )
+    for mode in ("whole", "stream weak", "stream sqlite"):
+        print(
+            f"    {mode:13s}  load: {timings[mode]:8.3f}s  "
+            f"peak memory: {timings[mode + ' memory'] / 1e6:8.1f}MB"
+        )
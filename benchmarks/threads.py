@@ -0,0 +1,214 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Stress tests for thread-safe MxlimsStores, shared between threads
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.threads --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import json
+import random
+import threading
+import time
+import uuid
+
+from benchmarks.fixtures import (
+    MESSAGE_DIR,
+    benchmark_parser,
+    check_link_index,
+    scale_message,
+)
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.messages.ShipmentMessage import ShipmentMessage
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.MxProcessing import MxProcessing
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+
+
+def stress_threads(
+        n_threads: int, n_objects: int, n_containers: int = 16, seed: int = 0
+) -> float:
+    """Create and relink objects from n_threads threads in a shared store
+
+    Each thread creates its share of n_objects Pins and CollectionSweeps,
+    linking them to shared Pucks and MxProcessing Jobs, and then moves them
+    around at random. Raises RuntimeError if the indices end up inconsistent
+
+    :param n_threads: Number of worker threads
+    :param n_objects: Total number of Pins (and of CollectionSweeps) to create
+    :param n_containers: Number of shared Pucks and of shared Jobs
+    :param seed: Random number seed
+    :return: Elapsed time in seconds
+    """
+    store = MxlimsStore(thread_safe=True)
+    with store.activate():
+        pucks = list(Puck() for _ in range(n_containers))
+        jobs = list(MxProcessing() for _ in range(n_containers))
+    per_thread = n_objects // n_threads
+    errors = []
+
+    def work(ind: int):
+        rng = random.Random(seed + ind)
+        try:
+            with store.activate():
+                pins = []
+                for _ in range(per_thread):
+                    pin = Pin(container_id=rng.choice(pucks).uuid)
+                    sweep = CollectionSweep(logistical_sample_id=pin.uuid)
+                    rng.choice(jobs).append_input_data(sweep)
+                    pins.append(pin)
+                for pin in pins:
+                    pin.container = rng.choice(pucks)
+                    for sweep in pin.datasets:
+                        for job in sweep.input_for:
+                            job.remove_input_data(sweep)
+                        rng.choice(jobs).append_input_data(sweep)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = list(threading.Thread(target=work, args=(ind,)) for ind in range(n_threads))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise RuntimeError(f"Errors in worker threads: {errors}")
+    messages = check_link_index(store)
+    count = sum(len(puck.contents) for puck in pucks)
+    if count != per_thread * n_threads:
+        messages.append(f"Found {count} Pins in Pucks, expected {per_thread * n_threads}")
+    if messages:
+        raise RuntimeError("\n".join(messages))
+    store.close()
+    return elapsed
+
+
+def stress_threaded_load(n_threads: int, n_messages: int = 400) -> float:
+    """Load messages from n_threads threads into a shared thread-safe store
+
+    The messages are copies, with new uuids, of the valid ShipmentMessage
+    test messages. Raises RuntimeError if objects are missing or the
+    indices end up inconsistent
+
+    :param n_threads: Number of worker threads
+    :param n_messages: Total number of messages to load
+    :return: Elapsed time in seconds
+    """
+    paths = sorted((MESSAGE_DIR / "ShipmentMessage" / "valid").glob("*.json"))
+    per_path = -(-n_messages // len(paths))
+    messages = []
+    for path in paths:
+        # New uuids, as the test messages share some
+        text = path.read_text()
+        for tag, objdict in json.loads(text).items():
+            if tag != "version":
+                for obj in objdict.values():
+                    uid = obj.get("uuid")
+                    if uid:
+                        text = text.replace(uid, str(uuid.uuid5(uuid.UUID(uid), path.name)))
+        message_dict = json.loads(text)
+        # Split the scaled message into its copies, which link only within
+        # themselves, by the copy number suffix of the object names
+        copies = {}
+        for tag, objdict in scale_message(message_dict, per_path).items():
+            if tag == "version":
+                continue
+            for name, obj in objdict.items():
+                message = copies.setdefault(
+                    name.rsplit("_", 1)[1], {"version": message_dict["version"]}
+                )
+                message.setdefault(tag, {})[name] = obj
+        messages.extend(json.dumps(message).encode() for message in copies.values())
+    messages = messages[:n_messages]
+    n_objects = sum(
+        len(objdict)
+        for message in messages
+        for tag, objdict in json.loads(message).items()
+        if tag not in ("version", "Job", "Dataset", "LogisticalSample", "Sample")
+    )
+    store = MxlimsStore(thread_safe=True)
+    errors = []
+
+    def work(ind: int):
+        try:
+            for data in messages[ind::n_threads]:
+                ShipmentMessage.from_message_json(data, store=store)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = list(threading.Thread(target=work, args=(ind,)) for ind in range(n_threads))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise RuntimeError(f"Errors in worker threads: {errors}")
+    messages = check_link_index(store)
+    if len(store.objects) != n_objects:
+        messages.append(f"Found {len(store.objects)} objects, expected {n_objects}")
+    if messages:
+        raise RuntimeError("\n".join(messages))
+    store.close()
+    return elapsed
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "threads",
+        """
+Stress tests for thread-safe MXLIMS object stores""",
+    )
+    parser.add_argument(
+        "--threads",
+        metavar="threads",
+        default="1,2,4,8",
+        help="Comma-separated thread counts",
+    )
+    parser.add_argument(
+        "--messages",
+        metavar="messages",
+        type=int,
+        default=400,
+        help="Number of messages to load",
+    )
+
+    argsobj = parser.parse_args()
+    thread_counts = list(int(txt) for txt in argsobj.threads.split(","))
+    for nthreads in thread_counts:
+        seconds = stress_threads(nthreads, argsobj.objects)
+        print(
+            f"threads: {nthreads:3d}  objects: {argsobj.objects:8d}  "
+            f"time: {seconds:8.3f}s  indices consistent"
+        )
+    for nthreads in thread_counts:
+        seconds = stress_threaded_load(nthreads, argsobj.messages)
+        print(
+            f"threaded load: {nthreads:3d} threads  messages: {argsobj.messages:8d}  "
+            f"time: {seconds:8.3f}s  indices consistent"
+        )
@@ -0,0 +1,89 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Benchmark for relinking objects with and without an MxlimsStore transaction
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.transaction --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import random
+import time
+
+from benchmarks.fixtures import benchmark_parser, check_link_index
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.MxProcessing import MxProcessing
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+
+
+def benchmark_transaction(
+    n_objects: int, n_passes: int = 3, seed: int = 0
+) -> tuple[float, float]:
+    """Time repeated relinking with and without a transaction
+
+    Moves n_objects Pins between Pucks n_passes times, and appends
+    n_objects CollectionSweeps to a single MxProcessing Job.
+    Raises RuntimeError if the indices end up inconsistent
+
+    :param n_objects: Number of Pins (and of CollectionSweeps) to create
+    :param n_passes: Number of times each Pin is moved
+    :param seed: Random number seed
+    :return: (time without transaction, time with transaction) in seconds
+    """
+    result = []
+    for use_transaction in (False, True):
+        rng = random.Random(seed)
+        with MxlimsStore() as store:
+            pucks = list(Puck() for _ in range(max(n_objects // 16, 1)))
+            pins = list(Pin(container_id=pucks[0].uuid) for _ in range(n_objects))
+            sweeps = list(CollectionSweep() for _ in range(n_objects))
+            job = MxProcessing()
+            start = time.perf_counter()
+            with store.transaction() if use_transaction else store.activate():
+                for _ in range(n_passes):
+                    for pin in pins:
+                        pin.container_id = rng.choice(pucks).uuid
+                for sweep in sweeps:
+                    job.append_input_data(sweep)
+            result.append(time.perf_counter() - start)
+            messages = check_link_index(store)
+            if messages:
+                raise RuntimeError("\n".join(messages))
+    return result[0], result[1]
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "transaction",
+        """
+Benchmark for MXLIMS object store transactions""",
+    )
+
+    argsobj = parser.parse_args()
+    plain, transactional = benchmark_transaction(argsobj.objects)
+    print(
+        f"relinking  objects: {argsobj.objects:8d}  "
+        f"plain: {plain:8.3f}s  in transaction: {transactional:8.3f}s"
+    )
@@ -0,0 +1,107 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Benchmark for loading an MxlimsStore from a JSON message and from a binary
+snapshot file
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.warm_start --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fixtures import benchmark_parser, check_link_index, make_pins_and_sweeps
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.messages.MxlimsMessageStrict import MxlimsMessageStrict
+
+
+def benchmark_warm_start(n_objects: int, seed: int = 0) -> dict:
+    """Time loading a store from a JSON message and from a binary snapshot file
+
+    Creates n_objects Pins in Pucks, with a CollectionSweep for each, and
+    saves them both as an MxlimsMessageStrict message and with save_snapshot.
+    Raises RuntimeError if the two ways of loading give different results
+
+    :param n_objects: Number of Pins (and of CollectionSweeps) to create
+    :param seed: Random number seed
+    :return: Dictionary of timings in seconds, and file sizes in bytes
+    """
+    rng = random.Random(seed)
+    result = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        message_path = Path(tmpdir) / "message.json"
+        snapshot_path = Path(tmpdir) / "store.snapshot"
+        with MxlimsStore() as store:
+            pucks, pins, sweeps = make_pins_and_sweeps(n_objects, rng)
+            MxlimsMessageStrict.from_pydantic_objects(
+                pucks + pins + sweeps
+            ).export_message(message_path)
+            start = time.perf_counter()
+            store.save_snapshot(snapshot_path)
+            result["save snapshot"] = time.perf_counter() - start
+        result["message size"] = message_path.stat().st_size
+        result["snapshot size"] = snapshot_path.stat().st_size
+        dumps = []
+        for use_snapshot in (False, True):
+            with MxlimsStore() as store:
+                start = time.perf_counter()
+                if use_snapshot:
+                    store.load_snapshot(snapshot_path)
+                    result["load snapshot"] = time.perf_counter() - start
+                else:
+                    MxlimsMessageStrict.from_message_file(message_path, store=store)
+                    result["load message"] = time.perf_counter() - start
+                messages = check_link_index(store)
+                if messages:
+                    raise RuntimeError("\n".join(messages))
+                dumps.append(
+                    dict(
+                        (obj.uuid, obj.model_dump())
+                        for obj in store.objects.values()
+                    )
+                )
+        if dumps[0] != dumps[1]:
+            raise RuntimeError("Objects loaded from message and snapshot differ")
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "warm_start",
+        """
+Benchmark for loading MXLIMS object stores from messages and snapshot files""",
+    )
+
+    argsobj = parser.parse_args()
+    timings = benchmark_warm_start(argsobj.objects)
+    print(
+        f"warm start  objects: {argsobj.objects:8d}\n"
+        f"    message: {timings['message size']:10d} bytes  "
+        f"load: {timings['load message']:8.3f}s\n"
+        f"    snapshot: {timings['snapshot size']:9d} bytes  "
+        f"load: {timings['load snapshot']:8.3f}s  "
+        f"save: {timings['save snapshot']:8.3f}s"
+    )
@@ -0,0 +1,120 @@
+#! /usr/bin/env python
+# encoding: utf-8
+""" Benchmark for the single-pass message writer
+
+Run from the top directory of the repository, or with mxlims installed:
+
+    python -m benchmarks.writer --help
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.fixtures import benchmark_parser, iter_scaled_messages
+from mxlims.impl.MxlimsImplementation import to_export_json
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.messages.MxlimsMessage import MxlimsMessage
+from mxlims.mxpydantic.messages.MxlimsMessageStrict import MxlimsMessageStrict
+from mxlims.mxpydantic.messages.ShipmentMessage import ShipmentMessage
+
+
+def benchmark_writer(scale: int = 1000) -> list[tuple[str, int, dict]]:
+    """Time exporting the valid test messages, scaled up, with write_message and
+    with the earlier dump - convert - dump path, and their peak memory use
+
+    Raises RuntimeError if the two give different output
+
+    :param scale: Number of copies of the objects in each test message
+    :return: List of (message file name, number of objects, dictionary of
+        timings in seconds and peak memory use in bytes)
+    """
+    result = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        scaled_path = Path(tmpdir) / "scaled.json"
+        output_paths = {"dump": Path(tmpdir) / "dump.json", "write": Path(tmpdir) / "write.json"}
+        for cls, path, text in iter_scaled_messages(
+            (MxlimsMessageStrict, ShipmentMessage, MxlimsMessage), scale
+        ):
+            scaled_path.write_text(text)
+            timings = {}
+            with MxlimsStore() as store:
+                message = cls.from_message_file(scaled_path, store=store)
+                for mode, output_path in output_paths.items():
+                    for measure_memory in (False, True):
+                        if measure_memory:
+                            tracemalloc.start()
+                        start = time.perf_counter()
+                        if mode == "write":
+                            message.export_message(output_path)
+                        else:
+                            message_json = json.loads(
+                                message.model_dump_json(
+                                    indent=4,
+                                    by_alias=True,
+                                    exclude_none=True,
+                                    serialize_as_any=True,
+                                )
+                            )
+                            to_export_json(message_json)
+                            output_path.write_text(json.dumps(message_json, indent=4))
+                            del message_json
+                        if measure_memory:
+                            timings[f"{mode} memory"] = tracemalloc.get_traced_memory()[1]
+                            tracemalloc.stop()
+                        else:
+                            timings[mode] = time.perf_counter() - start
+                n_objects = len(store.objects)
+            if output_paths["dump"].read_bytes() != output_paths["write"].read_bytes():
+                raise RuntimeError(f"Output differs for {path.name}")
+            result.append((f"{cls.__name__}/{path.name}", n_objects, timings))
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = benchmark_parser(
+        "writer",
+        """
+Benchmark for the MXLIMS message writer""",
+        objects=None,
+    )
+    parser.add_argument(
+        "--scale",
+        metavar="scale",
+        type=int,
+        default=1000,
+        help="Number of copies of the objects in each test message",
+    )
+
+    argsobj = parser.parse_args()
+    print(f"message export, test messages scaled up {argsobj.scale} times")
+    for name, n_objects, timings in benchmark_writer(argsobj.scale):
+        print(
+            f"    {name}  objects: {n_objects:8d}\n"
+            f"        dump and convert: {timings['dump']:8.3f}s  "
+            f"peak memory: {timings['dump memory'] / 1e6:8.1f}MB\n"
+            f"        write_message:    {timings['write']:8.3f}s  "
+            f"peak memory: {timings['write memory'] / 1e6:8.1f}MB"
+        )
@@ -34,6 +34,7 @@ from typing import List
 
 from mxlims.core.typemap import typemap
 from mxlims.impl.MxlimsBase import camel_to_snake
+from mxlims.impl.MxlimsImplementation import LINK_SPECIFICATION
 from mxlims.mxpydantic.messages.MxlimsMessageStrict import MxlimsMessageStrict
 
 from mxlims.core.MxlimsObject import MxlimsObject
@@ -214,9 +215,6 @@ def link_mxlims_objects(result: Dict[str, MxlimsObject], result_mode:bool= False
     :param result_mode: Determines if Datasets are treated as results (if True) or input templates
     :return:
     """
-    mxlims_dir = Path(__file__).resolve().parent.parent
-    link_refs = yaml.load(mxlims_dir / "impl" / "link_specification.yaml")
-
     # Set up samples:
     sample = result.get("MacromoleculeSample")
     if sample:
@@ -228,7 +226,7 @@ def link_mxlims_objects(result: Dict[str, MxlimsObject], result_mode:bool= False
         obj for obj in result.values() if obj.mxlims_base_type == "LogisticalSample"
     )
     for obj in logistical_samples:
-        container_link = link_refs[obj.mxlims_type]["links"].get("container")
+        container_link = LINK_SPECIFICATION[obj.mxlims_type]["links"].get("container")
         if container_link:
             for ctype in container_link["typenames"]:
                 container = result.get(ctype)
@@ -479,13 +477,11 @@ def expand_logistical_sample(source: LogisticalSample) -> dict[str, MxlimsObject
     :param source:  object to expand
     """
     result = {}
-    logistical_sample = source
     sample = None
-    while logistical_sample:
+    for logistical_sample in [source] + source.ancestors():
         result[logistical_sample.mxlims_type] = logistical_sample
         if not sample:
             sample = logistical_sample.sample
-        logistical_sample = logistical_sample.container
     if sample:
         result.update(expand_sample(sample))
     #
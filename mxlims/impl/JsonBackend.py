@@ -0,0 +1,129 @@
+# encoding: utf-8
+""" Selectable JSON backends for parsing messages
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import json
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+# Integers beyond 64 bits, which orjson reads as floats, have at least 19 digits.
+# Found by mapping all digits to 0 and all else to space, which is much
+# faster than a regular expression. May also match inside strings or long
+# decimal fractions, which is harmless
+_LONG_DIGITS = b"0" * 19
+_DIGITS_ONLY = bytes(48 if 48 <= ind < 58 else 32 for ind in range(256))
+
+
+class JsonBackend(object):
+    """JSON backend using the standard library json module
+
+    Subclasses use faster libraries, giving the same results for valid JSON.
+    Where a library cannot (e.g. for numbers out of its range, or NaN),
+    they fall back on the standard library. Messages are always written with
+    the standard library formatting (see MessageStream.write_message), as the
+    faster libraries format numbers differently, and gain little there
+    """
+
+    name = "json"
+
+    def loads(self, data: bytes | str) -> Any:
+        """Parse JSON text
+
+        :param data: JSON text, as UTF-8 bytes or str
+        :return: Parsed value
+        """
+        return json.loads(data)
+
+
+class OrjsonBackend(JsonBackend):
+    """JSON backend using orjson"""
+
+    name = "orjson"
+
+    def loads(self, data: bytes | str) -> Any:
+        text = data.encode() if isinstance(data, str) else data
+        if _LONG_DIGITS in text.translate(_DIGITS_ONLY):
+            return json.loads(data)
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # e.g. NaN, or text not in UTF-8
+            return json.loads(data)
+
+
+class MsgspecBackend(JsonBackend):
+    """JSON backend using msgspec"""
+
+    name = "msgspec"
+
+    def loads(self, data: bytes | str) -> Any:
+        try:
+            return msgspec.json.decode(data)
+        except msgspec.DecodeError:
+            # e.g. NaN, or integers out of range
+            return json.loads(data)
+
+
+# Available backend classes by name, fastest first
+BACKENDS: dict[str, type[JsonBackend]] = {}
+if orjson is not None:
+    BACKENDS[OrjsonBackend.name] = OrjsonBackend
+if msgspec is not None:
+    BACKENDS[MsgspecBackend.name] = MsgspecBackend
+BACKENDS[JsonBackend.name] = JsonBackend
+
+_backend: JsonBackend = next(iter(BACKENDS.values()))()
+
+
+def get_json_backend() -> JsonBackend:
+    """Get the JSON backend used for parsing messages"""
+    return _backend
+
+
+def set_json_backend(name: Optional[str] = None) -> JsonBackend:
+    """Select JSON backend for parsing messages
+
+    :param name: Backend name, one of BACKENDS, e.g. 'orjson' or 'json'.
+        Defaults to the fastest available
+    :return: The backend selected
+    """
+    global _backend
+    if name is None:
+        name = next(iter(BACKENDS))
+    cls = BACKENDS.get(name)
+    if cls is None:
+        raise ValueError(
+            f"JSON backend {name!r} is not available. Available: {', '.join(BACKENDS)}"
+        )
+    _backend = cls()
+    return _backend
@@ -0,0 +1,291 @@
+# encoding: utf-8
+""" Link integrity checking for the objects in an MxlimsStore
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+from typing import Any, Iterable, NamedTuple, Optional, TYPE_CHECKING
+
+from .LinkSpecification import LINK_ID_FIELDS_NN, LINK_SPECIFICATION
+
+if TYPE_CHECKING:
+    from .MxlimsImplementation import MxlimsImplementation
+    from .MxlimsStore import MxlimsStore
+
+# {mxlims_type: ((id_field_name, is_multiple, allowed target type names), ...)}
+# Filled in as types are encountered
+_LINK_CHECKS: dict[str, tuple[tuple[str, bool, frozenset], ...]] = {}
+
+
+class LinkError(NamedTuple):
+    """Broken foreign-key link found by check_integrity"""
+
+    # mxlims_type of object holding the link
+    mxlims_type: str
+    # uuid of object holding the link
+    uuid: Any
+    # Name of foreign-key field, e.g. 'container_id'
+    id_field_name: str
+    # uuid the link points to
+    target_uuid: Any
+    # mxlims_type of the linked-to object, or None if it is missing
+    target_type: Optional[str]
+
+    def __str__(self) -> str:
+        if self.target_type is None:
+            problem = "missing object"
+        else:
+            problem = f"object of wrong type {self.target_type}"
+        return (
+            f"{self.mxlims_type} {self.uuid}: {self.id_field_name} "
+            f"links to {problem} {self.target_uuid}"
+        )
+
+
+class IndexMismatch(NamedTuple):
+    """Reverse-link index entry or link set inconsistent with the link fields,
+    found by check_integrity"""
+
+    # Name of core type of object holding the link
+    basetypename: str
+    # uuid of object holding the link
+    uuid: Any
+    # Name of foreign-key field, e.g. 'container_id'
+    id_field_name: str
+    # uuid the link points to, or None for a detached link set
+    target_uuid: Any
+    # 'unindexed' for a link missing from the reverse-link index,
+    # 'stale' for an index entry with no matching link, and
+    # 'detached' for an n..n link set not attached to the object holding it
+    kind: str
+
+    def __str__(self) -> str:
+        if self.kind == "unindexed":
+            problem = f"link to {self.target_uuid} missing from reverse-link index"
+        elif self.kind == "stale":
+            problem = f"reverse-link index entry for {self.target_uuid} without link"
+        else:
+            problem = "link set not attached to object"
+        return f"{self.basetypename} {self.uuid}: {self.id_field_name} {problem}"
+
+
+class IntegrityReport(object):
+    """Result of link integrity check. True if no errors were found"""
+
+    def __init__(self) -> None:
+        self.object_count = 0
+        self.link_count = 0
+        # Links to objects not in the store
+        self.missing: list[LinkError] = []
+        # Links to objects of types not allowed for the link
+        self.wrong_type: list[LinkError] = []
+        # Reverse-link index and link set inconsistencies
+        self.index_errors: list[IndexMismatch] = []
+
+    def __bool__(self) -> bool:
+        return not (self.missing or self.wrong_type or self.index_errors)
+
+    def __repr__(self) -> str:
+        return (
+            f"<IntegrityReport: {self.link_count} links from {self.object_count} "
+            f"objects, {len(self.missing)} missing, {len(self.wrong_type)} "
+            f"wrong type, {len(self.index_errors)} index errors>"
+        )
+
+    @property
+    def errors(self) -> list[LinkError | IndexMismatch]:
+        """All errors found"""
+        return self.missing + self.wrong_type + self.index_errors
+
+    def summary(self) -> str:
+        """Human-readable summary, with one line per error"""
+        lines = [
+            f"Checked {self.link_count} links from {self.object_count} objects: "
+            f"{len(self.missing)} missing targets, "
+            f"{len(self.wrong_type)} targets of wrong type, "
+            f"{len(self.index_errors)} index errors"
+        ]
+        lines.extend(str(error) for error in self.errors)
+        return "\n".join(lines)
+
+
+def _get_link_checks(mxlims_type: str) -> tuple[tuple[str, bool, frozenset], ...]:
+    """Get link checks for mxlims_type from LINK_SPECIFICATION"""
+    result = _LINK_CHECKS.get(mxlims_type)
+    if result is None:
+        typedict = LINK_SPECIFICATION.get(mxlims_type)
+        if typedict is None:
+            result = ()
+        else:
+            multiple_fields = LINK_ID_FIELDS_NN[typedict["corename"]]
+            ll0 = []
+            for linkdict in typedict["links"].values():
+                id_field_name = linkdict.get("link_id_name")
+                if id_field_name:
+                    if linkdict["cardinality"] is None:
+                        # Link not allowed for this type - any target is wrong
+                        allowed = frozenset()
+                    else:
+                        allowed = frozenset(linkdict["typenames"]) | {
+                            linkdict["basetypename"]
+                        }
+                    ll0.append(
+                        (id_field_name, id_field_name in multiple_fields, allowed)
+                    )
+            result = tuple(ll0)
+        _LINK_CHECKS[mxlims_type] = result
+    return result
+
+
+def check_integrity(
+    store: MxlimsStore,
+    objects: Optional[Iterable[MxlimsImplementation]] = None,
+    check_index: bool = True,
+) -> IntegrityReport:
+    """Check that foreign-key links resolve to objects of allowed types,
+    and agree with the reverse-link index
+
+    Runs in a single pass, with one uuid lookup and one index lookup per link.
+    When checking all objects, index entries without a link are searched for
+    only if the index holds more entries than the links found in it.
+    A target type is allowed if it is among the link typenames in
+    LINK_SPECIFICATION, or if the target is of the core (abstract) type
+    of the link. Links that are disabled for the type (cardinality None)
+    must be empty. n..n link sets must be attached to the object holding them.
+
+    :param store: MxlimsStore holding the objects and their link targets
+    :param objects: Objects to check links from. Defaults to all objects in store
+    :param check_index: Check the reverse-link index and link sets
+    :return: IntegrityReport
+    """
+    report = IntegrityReport()
+    all_objects = store.objects
+    lazy = store._lazy
+    links_to = store.links_to
+    check_all = objects is None
+    if check_all:
+        objects = all_objects.values()
+    missing = report.missing
+    wrong_type = report.wrong_type
+    index_errors = report.index_errors
+    # {mxlims_type: ((id_field_name, is_multiple, allowed, reverse-link index),)},
+    # with no index for unindexed fields, or if not checking the index
+    type_checks = {}
+    object_count = link_count = indexed_count = 0
+    for obj in objects:
+        object_count += 1
+        values = obj.__dict__
+        mxlims_type = obj.mxlims_type
+        checks = type_checks.get(mxlims_type)
+        if checks is None:
+            basetypename = obj.mxlims_base_type
+            checks = type_checks[mxlims_type] = tuple(
+                (
+                    id_field_name,
+                    is_multiple,
+                    allowed,
+                    links_to.get((basetypename, id_field_name)) if check_index else None,
+                )
+                for id_field_name, is_multiple, allowed in _get_link_checks(
+                    mxlims_type
+                )
+            )
+        for id_field_name, is_multiple, allowed, index in checks:
+            value = values.get(id_field_name)
+            if value is None:
+                continue
+            if is_multiple and index is not None:
+                owner = getattr(value, "_owner", None)
+                if owner is None or owner[0]() is not obj or owner[1] != id_field_name:
+                    index_errors.append(
+                        IndexMismatch(
+                            obj.mxlims_base_type,
+                            obj.uuid,
+                            id_field_name,
+                            None,
+                            "detached",
+                        )
+                    )
+            for target_uid in value if is_multiple else (value,):
+                link_count += 1
+                target = all_objects.get(target_uid)
+                if target is not None:
+                    target_type = target.mxlims_type
+                else:
+                    # Lazily registered targets are checked without creating them
+                    entry = lazy.get(target_uid)
+                    target_type = None if entry is None else entry[1]
+                if target_type is None:
+                    missing.append(
+                        LinkError(mxlims_type, obj.uuid, id_field_name, target_uid, None)
+                    )
+                elif target_type not in allowed:
+                    wrong_type.append(
+                        LinkError(
+                            mxlims_type, obj.uuid, id_field_name, target_uid, target_type
+                        )
+                    )
+                if index is not None:
+                    if obj.uuid in index.get(target_uid, ()):
+                        indexed_count += 1
+                    else:
+                        index_errors.append(
+                            IndexMismatch(
+                                obj.mxlims_base_type,
+                                obj.uuid,
+                                id_field_name,
+                                target_uid,
+                                "unindexed",
+                            )
+                        )
+    if check_index and check_all:
+        # Each link found is one index entry, so only if there are more entries
+        # (or links from lazily registered objects) must the index be searched
+        entry_count = sum(
+            len(referrers) for index in links_to.values() for referrers in index.values()
+        )
+        if lazy or entry_count != indexed_count:
+            _check_stale_index_entries(store, index_errors)
+    report.object_count = object_count
+    report.link_count = link_count
+    return report
+
+
+def _check_stale_index_entries(store: MxlimsStore, index_errors: list) -> None:
+    """Add reverse-link index entries without a matching link to index_errors"""
+    all_objects = store.objects
+    lazy = store._lazy
+    for (basetypename, id_field_name), index in store.links_to.items():
+        is_multiple = id_field_name in LINK_ID_FIELDS_NN[basetypename]
+        for target_uid, referrers in index.items():
+            for uid in referrers:
+                obj = all_objects.get(uid)
+                if obj is not None and obj.mxlims_base_type == basetypename:
+                    value = obj.__dict__.get(id_field_name)
+                else:
+                    entry = lazy.get(uid)
+                    value = None if entry is None else entry[4].get(id_field_name)
+                if value is None or not (
+                    target_uid in value if is_multiple else target_uid == value
+                ):
+                    index_errors.append(
+                        IndexMismatch(basetypename, uid, id_field_name, target_uid, "stale")
+                    )
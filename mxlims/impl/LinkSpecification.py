@@ -0,0 +1,95 @@
+# encoding: utf-8
+""" Link specification for the MXLIMS model, and tables of foreign-key fields
+derived from it
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+from pathlib import Path
+
+from ruamel.yaml import YAML
+
+from .MxlimsBase import snake_to_camel
+
+yaml = YAML(typ="safe", pure=True)
+# The following are not needed for load, but define the default style.
+yaml.default_flow_style = False
+yaml.indent(mapping=4, sequence=4, offset=2)
+
+# Names of core *(basic abstract) classes
+CORETYPES = ("Job", "Dataset", "LogisticalSample", "Sample")
+
+with (Path(__file__).parent / "link_specification.yaml").open(encoding="utf-8") as fp0:
+    LINK_SPECIFICATION = yaml.load(fp0)
+
+# Foreign-key fields, by core type, covered by the reverse-link index
+# Single-valued (n..1) links
+LINK_ID_FIELDS_N1 = {
+    tag: frozenset(
+        linkdict["link_id_name"]
+        for linkdict in LINK_SPECIFICATION[tag]["links"].values()
+        if linkdict.get("link_id_name") and linkdict["cardinality"] == "single"
+    )
+    for tag in CORETYPES
+}
+# Multi-valued (n..n) links
+LINK_ID_FIELDS_NN = {
+    tag: frozenset(
+        linkdict["link_id_name"]
+        for linkdict in LINK_SPECIFICATION[tag]["links"].values()
+        if linkdict.get("link_id_name") and linkdict["cardinality"] == "multiple"
+    )
+    for tag in CORETYPES
+}
+# (id_field_name, camelCase JSON name) for the foreign-key fields, by core type
+LINK_JSON_NAMES_N1 = {
+    tag: tuple((name, snake_to_camel(name)) for name in sorted(LINK_ID_FIELDS_N1[tag]))
+    for tag in CORETYPES
+}
+LINK_JSON_NAMES_NN = {
+    tag: tuple((name, snake_to_camel(name)) for name in sorted(LINK_ID_FIELDS_NN[tag]))
+    for tag in CORETYPES
+}
+# Foreign-key fields pointing to each core type, as (basetypename, id_field_name)
+LINK_ID_FIELDS_TO = {
+    tag: tuple(
+        (tag2, linkdict["link_id_name"])
+        for tag2 in CORETYPES
+        for linkdict in LINK_SPECIFICATION[tag2]["links"].values()
+        if linkdict.get("link_id_name") and linkdict["basetypename"] == tag
+    )
+    for tag in CORETYPES
+}
+# Links with a foreign key, by mxlims type, as used for message import and export:
+# (link_ref_name, camelCase link_id_name, cardinality, basetypename)
+# cardinality is None for links that are not exported, e.g. MxExperiment.input_data
+LINK_PLANS = {
+    tag: tuple(
+        (
+            linkdict.get("link_ref_name"),
+            snake_to_camel(linkdict["link_id_name"]),
+            linkdict["cardinality"],
+            linkdict["basetypename"],
+        )
+        for linkdict in typedict["links"].values()
+        if linkdict.get("link_id_name")
+    )
+    for tag, typedict in LINK_SPECIFICATION.items()
+}
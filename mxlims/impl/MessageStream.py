@@ -0,0 +1,352 @@
+# encoding: utf-8
+""" Incremental reading and writing of schema-compliant JSON messages
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import importlib
+import io
+import json
+import re
+import uuid
+from json.encoder import encode_basestring_ascii
+from pathlib import Path
+from typing import Any, IO, Iterator, Optional, TYPE_CHECKING
+
+from .LinkSpecification import CORETYPES
+from .MxlimsBase import camel_to_snake
+from .MxlimsImplementation import (
+    UuidClashMode,
+    export_links,
+    import_links,
+    resolve_uuid_clash,
+)
+from .MxlimsStore import MxlimsStore
+
+if TYPE_CHECKING:
+    from .MxlimsImplementation import BaseMessage, MxlimsImplementation
+
+# Size of blocks read from message files
+CHUNK_SIZE = 1 << 16
+
+# Line break and indentation for objects inside message sections
+_OBJECT_NEWLINE = "\n" + 8 * " "
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _JsonReader(object):
+    """Reads JSON tokens and values from a text file, a block at a time
+
+    Only the text of the value being read is held in memory
+    """
+
+    def __init__(self, fp0: IO[str], chunk_size: int = CHUNK_SIZE) -> None:
+        self.fp0 = fp0
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size: int) -> bool:
+        """Read at least size more characters, dropping those already consumed
+
+        :return: False at end of file
+        """
+        data = self.fp0.read(max(size, self.chunk_size))
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return bool(data)
+
+    def peek(self) -> str:
+        """Skip whitespace, and get the next character, or '' at end of file"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill(self.chunk_size):
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Read the next character, which must be one of chars"""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(
+                f"Expected one of {chars!r} in JSON message, found {char!r}"
+            )
+        self.pos += 1
+        return char
+
+    def read_value(self) -> Any:
+        """Read the next JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as exc:
+                # Incomplete value, or a syntax error if there is no more text.
+                # Reading as much again as is held keeps re-parsing linear
+                if not self._fill(len(self.buffer) - self.pos):
+                    raise ValueError(f"Invalid JSON message: {exc}") from exc
+            else:
+                if end < len(self.buffer) or isinstance(value, (dict, list, str)):
+                    self.pos = end
+                    return value
+                # A number or literal may continue in the next block
+                if not self._fill(self.chunk_size):
+                    self.pos = end
+                    return value
+
+
+def iter_message_json(
+    message_path: Path | str, chunk_size: int = CHUNK_SIZE
+) -> Iterator[tuple[str, Optional[str], Any]]:
+    """Iterate over the contents of a schema-compliant JSON message, reading
+    the file incrementally
+
+    :param message_path: Path to message JSON file
+    :param chunk_size: Number of characters to read at a time
+    :return: Iterator over (type name, object name, object JSON dictionary),
+        in file order, with (version, None, version string) for the version
+    """
+    with Path(message_path).open() as fp0:
+        reader = _JsonReader(fp0, chunk_size)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            tag = reader.read_value()
+            reader.expect(":")
+            if tag == "version":
+                yield tag, None, reader.read_value()
+            else:
+                reader.expect("{")
+                if reader.peek() == "}":
+                    reader.pos += 1
+                else:
+                    while True:
+                        name = reader.read_value()
+                        reader.expect(":")
+                        yield tag, name, reader.read_value()
+                        if reader.expect(",}") == "}":
+                            break
+            if reader.expect(",}") == "}":
+                break
+
+
+def iter_message_objects(
+    message_cls: type[BaseMessage],
+    message_path: Path | str,
+    uuid_clash_mode: UuidClashMode = UuidClashMode.reject_new,
+    store: Optional[MxlimsStore] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[MxlimsImplementation]:
+    """Load objects from schema-compliant JSON message, one at a time
+
+    The file is read twice. The first pass records the uuid of each object,
+    by type and name, and the second resolves the '$ref' links through these,
+    and validates, registers, and yields each object as it is read.
+    Memory use is that of the uuid map plus one object, apart from the objects
+    kept by the store (which may be weak, or a SqliteStore).
+    Unlike from_message_file, loading is not done in a transaction, so
+    objects loaded before an error remain in the store, and the message is
+    not validated as a whole, only the version and each object.
+
+    :param message_cls: Message class, e.g. MxlimsMessageStrict, for checking
+        the version and the object types
+    :param message_path: Path to message JSON file
+    :param uuid_clash_mode: In case of uuid clash should incoming objects
+        replace or defer to existing
+    :param store: MxlimsStore to load objects into. Defaults to the current store
+    :param chunk_size: Number of characters to read at a time
+    :return: Iterator over the new objects, in file order
+    """
+    if store is None:
+        store = MxlimsStore.current()
+    uuid_clash_mode = UuidClashMode(uuid_clash_mode)
+    # {(type name, object name): uuid string}
+    uuid_map = {}
+    tags = set()
+    for tag, name, obj in iter_message_json(message_path, chunk_size):
+        if tag == "version":
+            message_cls.__pydantic_validator__.validate_assignment(
+                message_cls.model_construct(), "version", obj
+            )
+            continue
+        if tag not in tags:
+            if camel_to_snake(tag) not in message_cls.model_fields:
+                raise ValueError(
+                    f"class {message_cls.__name__} does not have attribute "
+                    f"{camel_to_snake(tag)}"
+                )
+            tags.add(tag)
+        uid = obj.get("uuid")
+        if not uid:
+            if tag in CORETYPES:
+                raise ValueError(f"{tag} stub lacks uuid")
+            uid = str(uuid.uuid1())
+        uuid_map[(tag, name)] = uid
+
+    # {'$ref' value: uuid}, as many links point to the same few objects
+    resolved = {}
+
+    def resolve(ref: str) -> str:
+        uid = resolved.get(ref)
+        if uid is None:
+            uid = uuid_map.get(tuple(ref.split("/", 2)[-2:]))
+            if uid is None:
+                raise ValueError(f"Link {ref} in {message_path} does not resolve")
+            resolved[ref] = uid
+        return uid
+
+    classes = {}
+    for tag, name, obj in iter_message_json(message_path, chunk_size):
+        if tag == "version" or tag in CORETYPES:
+            # Stub objects are needed only to resolve links
+            continue
+        obj["uuid"] = uuid_map[(tag, name)]
+        import_links(tag, obj, resolve)
+        cls = classes.get(tag)
+        if cls is None:
+            cls = classes[tag] = getattr(
+                importlib.import_module(f"..mxpydantic.objects.{tag}", __package__),
+                tag,
+            )
+        # Activated per object, as the consumer runs between objects
+        with store.activate():
+            if not resolve_uuid_clash(obj, uuid_clash_mode):
+                continue
+            new_obj = cls.model_validate(obj)
+        yield new_obj
+
+
+def _to_json(value: Any, newline: str) -> str:
+    """Format value as done by json.dumps(indent=4), at the indentation of newline
+
+    Faster than json.dumps for small values, as that sets up a new encoder
+    for each call when indenting
+
+    :param value: JSON-compatible value
+    :param newline: Line break and indentation of the line holding value
+    :return: JSON text
+    """
+    value_type = type(value)
+    if value_type is str:
+        return encode_basestring_ascii(value)
+    elif value_type is dict:
+        if not value:
+            return "{}"
+        inner = newline + "    "
+        parts = []
+        for key, val in value.items():
+            if type(key) is not str:
+                break
+            if type(val) is str:
+                text = encode_basestring_ascii(val)
+            else:
+                text = _to_json(val, inner)
+            parts.append(f"{encode_basestring_ascii(key)}: {text}")
+        else:
+            return f"{{{inner}{(',' + inner).join(parts)}{newline}}}"
+    elif value_type is list:
+        if not value:
+            return "[]"
+        inner = newline + "    "
+        parts = list(_to_json(val, inner) for val in value)
+        return f"[{inner}{(',' + inner).join(parts)}{newline}]"
+    elif value is None:
+        return "null"
+    elif value is True:
+        return "true"
+    elif value is False:
+        return "false"
+    elif value_type is int:
+        return int.__repr__(value)
+    elif value_type is float and value == value and value not in _INFINITIES:
+        return float.__repr__(value)
+    # Anything else (e.g. NaN, or non-string keys) as done by json itself
+    return json.dumps(value, indent=4).replace("\n", newline)
+
+
+_INFINITIES = (float("inf"), float("-inf"))
+
+
+def write_message(message: BaseMessage, fp0: IO) -> None:
+    """Write message as schema-compliant JSON, converting links to '$ref' form
+
+    Objects are serialised and written one at a time, so that the message
+    is never held as a single string or dictionary. The output is the same,
+    byte for byte, as from dumping the whole message with model_dump_json,
+    converting it with to_export_json, and writing it with json.dumps(indent=4).
+
+    :param message: Message to write
+    :param fp0: Text or binary file object to write to
+    :return: None
+    """
+    if isinstance(fp0, io.TextIOBase):
+        write = fp0.write
+    else:
+
+        def write(text: str) -> None:
+            # Output is ASCII, as json.dumps escapes other characters
+            fp0.write(text.encode("ascii"))
+
+    # [(JSON name, value)] for the message fields, as dumped with exclude_none
+    sections = []
+    for name, field in type(message).model_fields.items():
+        value = getattr(message, name)
+        if value is not None:
+            sections.append((field.serialization_alias or field.alias or name, value))
+    # As made by to_export_json
+    uuid_to_id = {}
+    # {core type name: {name: stub dictionary, or None for the objects present}}
+    stub_sections = {}
+    for tag, objdict in sections:
+        if tag != "version":
+            for name, obj in objdict.items():
+                uuid_to_id[str(obj.uuid)] = (obj.mxlims_type, f"#/{tag}/{name}")
+            if tag in CORETYPES:
+                stub_sections[tag] = dict.fromkeys(objdict)
+    separator = "{\n    "
+    for tag, value in sections:
+        if tag == "version":
+            write(f"{separator}{json.dumps(tag)}: {json.dumps(value)}")
+            separator = ",\n    "
+            continue
+        stubs = stub_sections.get(tag)
+        if not (value if stubs is None else stubs):
+            # Empty sections are left out, as by to_export_json
+            continue
+        write(f"{separator}{json.dumps(tag)}: {{")
+        separator = ",\n    "
+        item_separator = "\n        "
+        for name in list(value if stubs is None else stubs):
+            objdict = None if stubs is None else stubs[name]
+            if objdict is None:
+                objdict = value[name].model_dump(
+                    mode="json", by_alias=True, exclude_none=True, serialize_as_any=True
+                )
+                export_links(tag, objdict, uuid_to_id, stub_sections)
+            text = _to_json(objdict, _OBJECT_NEWLINE)
+            write(f"{item_separator}{encode_basestring_ascii(name)}: {text}")
+            item_separator = ",\n        "
+        write("\n    }")
+    write("{}" if separator == "{\n    " else "\n}")
@@ -23,31 +23,39 @@ __license__ = "LGPLv3+"
 __author__ = "Rasmus H Fogh"
 
 import enum
-import json
 import uuid
 from pathlib import Path
-from typing import ClassVar, List, Optional, Sequence, TYPE_CHECKING
-
-from ruamel.yaml import YAML
-
-from .MxlimsBase import BaseModel, camel_to_snake, snake_to_camel
+from typing import (
+    Any, Callable, IO, Iterator, List, Optional, Sequence, TYPE_CHECKING
+)
+
+from pydantic import ValidationInfo, model_validator
+from pydantic_core import PydanticOmit
+
+from .MxlimsBase import BaseModel, camel_to_snake
+from .StoreEvents import EventKind
+from .UuidSet import UuidSet
+# The link tables and MxlimsStore are also imported from here by other modules
+from .LinkSpecification import (
+    CORETYPES,
+    LINK_ID_FIELDS_N1,
+    LINK_ID_FIELDS_NN,
+    LINK_ID_FIELDS_TO,
+    LINK_JSON_NAMES_N1,
+    LINK_JSON_NAMES_NN,
+    LINK_PLANS,
+    LINK_SPECIFICATION,
+    yaml,
+)
+from .MxlimsStore import CascadeMode, MxlimsStore
 
 if TYPE_CHECKING:
+    from .MxlimsQuery import Query
     from ..mxpydantic.objects.Dataset import Dataset
     from ..mxpydantic.objects.Job import Job
     from ..mxpydantic.objects.LogisticalSample import LogisticalSample
     from ..mxpydantic.objects.Sample import Sample
 
-yaml = YAML(typ="safe", pure=True)
-# The following are not needed for load, but define the default style.
-yaml.default_flow_style = False
-yaml.indent(mapping=4, sequence=4, offset=2)
-
-# Names of core *(basic abstract) classes
-CORETYPES = ("Job", "Dataset", "LogisticalSample", "Sample")
-
-with (Path(__file__).parent / "link_specification.yaml").open(encoding="utf-8") as fp0:
-    LINK_SPECIFICATION = yaml.load(fp0)
 
 class UuidClashMode(enum.Enum):
     """Enumeration for how to handle uuid clashes between input and existing objects
@@ -62,52 +70,170 @@ class UuidClashMode(enum.Enum):
     reject_new = "reject_new"
     error = "error"
 
+
 class MxlimsImplementation(object):
 
-    # Class-level container for implementation of access-object-by-id
-    _objects_by_id: ClassVar[dict] = {
-        "Dataset": dict(),
-        "Job": dict(),
-        "Sample": dict(),
-        "LogisticalSample": dict(),
-    }
-
-    # 'backup' dummy attributes, to avoid warnings and compensate for the fact that
-    # the attributes are defined in MxlimsObjectData,
-    # which we do nto want to import here to acvoid circularity
-    uuid = uuid.UUID(int=0)
-    mxlims_base_type = "MxlimsObject"
-
-    def __init__(self, **data) -> None:
-        super().__init__(**data)
-        obj_by_id = self._objects_by_id[self.mxlims_base_type]
-        myuid = self.uuid
-        if myuid in obj_by_id:
-            raise ValueError(
-                f"{self.mxlims_base_type} with uuid '{myuid}' already exists"
-            )
+    @model_validator(mode="before")
+    @classmethod
+    def _import_message_json(cls, data: Any, info: ValidationInfo) -> Any:
+        """Convert schema-compliant JSON for object to pydantic-compliant,
+        when validating a message with a MessageImportContext"""
+        context = info.context
+        if type(context) is MessageImportContext:
+            return context.convert(cls.__name__, data)
+        return data
+
+    def model_post_init(self, context: Any, /) -> None:
+        """Register new object, and its links, in the current MxlimsStore
+
+        Called by pydantic after validation, also for objects nested in messages"""
+        super().model_post_init(context)
+        self._attach_link_sets()
+        MxlimsStore.current().register(self)
+
+    def _attach_link_sets(self) -> None:
+        """Attach the UuidSets in the n..n link id fields, so that changes
+        to them are made through the object"""
+        values = self.__dict__
+        for name in LINK_ID_FIELDS_NN[self.mxlims_base_type]:
+            value = values.get(name)
+            if value is not None:
+                value._attach(self, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Set attribute, keeping the reverse-link and secondary indices up to date"""
+        basetypename = self.mxlims_base_type
+        store = self.__dict__.get("_mxlims_store")
+        if store is not None and store._transaction is not None:
+            if self._setattr_in_transaction(store, name, value):
+                return
+        if name in LINK_ID_FIELDS_N1[basetypename]:
+            self._setattr_link_n1(name, value)
+        elif name in LINK_ID_FIELDS_NN[basetypename]:
+            self._setattr_link_nn(name, value)
+        elif store is not None and (
+            store._snapshots
+            or store._write_back
+            or store._subscribers
+            or name in store._indexes_by_field
+        ):
+            self._setattr_tracked(store, name, value)
         else:
-            obj_by_id[myuid] = self
+            super().__setattr__(name, value)
+
+    def _setattr_in_transaction(
+        self, store: MxlimsStore, name: str, value: Any
+    ) -> bool:
+        """Set attribute inside a transaction, recording the old value
+
+        Link indices are updated when the transaction is committed.
+
+        :param store: MxlimsStore holding this object
+        :param name: Attribute name
+        :param value: New value
+        :return: False if the transaction ended before the lock was acquired,
+            so that the attribute has not been set
+        """
+        basetypename = self.mxlims_base_type
+        if value is not None and name in LINK_ID_FIELDS_NN[basetypename]:
+            value = UuidSet(value)
+            value._attach(self, name)
+        with store.lock(basetypename):
+            # Recheck, as another thread may have held the lock till now
+            transaction = store._transaction
+            if transaction is None:
+                return False
+            if store._snapshots:
+                store._preserve(self)
+            values = self.__dict__
+            # Fields are held in __dict__, link properties are not.
+            # Properties set the underlying fields in turn
+            is_field = name in values
+            old_value = values.get(name)
+            super().__setattr__(name, value)
+            if is_field:
+                transaction.record(self, name, old_value)
+                if store._subscribers:
+                    store._emit_change(self, name, old_value)
+            if store._write_back:
+                store._mark_changed(self)
+        return True
+
+    def _setattr_link_n1(self, name: str, value: Any) -> None:
+        """Set n..1 link id field, updating the reverse-link index"""
+        store = self.mxlims_store
+        with store.lock(self.mxlims_base_type):
+            if store._snapshots:
+                store._preserve(self)
+            old_value = getattr(self, name)
+            super().__setattr__(name, value)
+            if store._write_back:
+                store._mark_changed(self)
+            store.remove_link(self, name, old_value)
+            store.add_link(self, name, getattr(self, name))
+            if store._subscribers:
+                store._emit_change(self, name, old_value)
+
+    def _setattr_link_nn(self, name: str, value: Any) -> None:
+        """Set n..n link id field, updating the reverse-link index"""
+        if value is not None:
+            # Always copy, so that the field value is not shared
+            value = UuidSet(value)
+            value._attach(self, name)
+        store = self.mxlims_store
+        with store.lock(self.mxlims_base_type):
+            if store._snapshots:
+                store._preserve(self)
+            old_values = getattr(self, name) or ()
+            super().__setattr__(name, value)
+            if store._write_back:
+                store._mark_changed(self)
+            for uid in old_values:
+                store.remove_link(self, name, uid)
+            for uid in getattr(self, name) or ():
+                store.add_link(self, name, uid)
+            if store._subscribers:
+                store._emit_change(self, name, old_values)
+
+    def _setattr_tracked(self, store: MxlimsStore, name: str, value: Any) -> None:
+        """Set other attribute, for a store that has snapshots, write-back,
+        subscribers or a secondary index on the attribute"""
+        with store.lock(self.mxlims_base_type):
+            if store._snapshots:
+                store._preserve(self)
+            super().__setattr__(name, value)
+            if store._write_back:
+                store._mark_changed(self)
+            if name in store._indexes_by_field:
+                store.reindex(self, name)
+            if store._subscribers and name in self.__dict__:
+                # Link properties set the underlying fields, and are not fields
+                store._emit_change(self, name, None)
+
+    @property
+    def mxlims_store(self) -> MxlimsStore:
+        """The MxlimsStore holding this object"""
+        return self._mxlims_store
 
     @classmethod
     def get_all_jobs(cls) -> list[Job]:
-        """Get list of all Jobs"""
-        return list(cls._objects_by_id["Job"].values())
+        """Get list of all Jobs in the current store"""
+        return MxlimsStore.current().get_all("Job")
 
     @classmethod
     def get_all_datasets(cls) -> list[Dataset]:
-        """Get list of all Datasets"""
-        return list(cls._objects_by_id["Dataset"].values())
+        """Get list of all Datasets in the current store"""
+        return MxlimsStore.current().get_all("Dataset")
 
     @classmethod
     def get_all_samples(cls) -> list[Sample]:
-        """Get list of all Samples"""
-        return list(cls._objects_by_id["Sample"].values())
+        """Get list of all Samples in the current store"""
+        return MxlimsStore.current().get_all("Sample")
 
     @classmethod
     def get_all_logistical_samples(cls) -> list[LogisticalSample]:
-        """Get list of all Jobs"""
-        return list(cls._objects_by_id["LogisticalSample"].values())
+        """Get list of all LogisticalSamples in the current store"""
+        return MxlimsStore.current().get_all("LogisticalSample")
 
     @classmethod
     def get_object_by_uuid(
@@ -116,21 +242,41 @@ class MxlimsImplementation(object):
         basetypename: Optional[str] = None,
     ) -> Optional["MxlimsImplementation"]:
         """
-        Get MXLIMS object from basetypename and (foreign key) uuid
+        Get MXLIMS object from basetypename and (foreign key) uuid, in current store
 
         :param basetypename:
         :param uuid:
         :return:
         """
-        result = None
-        if basetypename is None:
-            for dd1 in  cls._objects_by_id.values():
-                result = dd1.get(uuid)
-                if result is not None:
-                    break
-        else:
-            result = cls._objects_by_id[basetypename].get(uuid)
-        return result
+        return MxlimsStore.current().get(uuid, basetypename)
+
+    @classmethod
+    def iter_objects(
+        cls,
+        mxlims_type: Optional[str] = None,
+        basetypename: Optional[str] = None,
+    ) -> Iterator["MxlimsImplementation"]:
+        """Iterate over objects of a given type in the current store, without copying
+
+        :param mxlims_type: Type name of objects, e.g. 'Pin'
+        :param basetypename: Name of core type of objects, e.g. 'LogisticalSample'
+        :return: Iterator over objects
+        """
+        return MxlimsStore.current().iter_objects(mxlims_type, basetypename)
+
+    @classmethod
+    def query(
+        cls,
+        mxlims_type: Optional[str] = None,
+        basetypename: Optional[str] = None,
+    ) -> Query:
+        """Start a query over objects in the current store
+
+        :param mxlims_type: Type name of objects, e.g. 'CollectionSweep'
+        :param basetypename: Name of core type of objects, e.g. 'Dataset'
+        :return: Query, matching all objects of the type
+        """
+        return MxlimsStore.current().query(mxlims_type, basetypename)
 
     def _get_link_n1(
             self,
@@ -144,7 +290,7 @@ class MxlimsImplementation(object):
         :param id_field_name: Name of (forward-direction) link
         :return MxlimsImplementation: Linked-to object
         """
-        return self._objects_by_id[basetypename].get(getattr(self, id_field_name))
+        return self.mxlims_store.get(getattr(self, id_field_name), basetypename)
 
     def _set_link_n1(
         self,
@@ -178,8 +324,9 @@ class MxlimsImplementation(object):
         :return:
         """
         result = []
-        for uid in getattr(self, id_field_name):
-            obj = self._objects_by_id[basetypename].get(uid)
+        store = self.mxlims_store
+        for uid in getattr(self, id_field_name) or ():
+            obj = store.get(uid, basetypename)
             if obj:
                 result.append(obj)
         return result
@@ -207,12 +354,46 @@ class MxlimsImplementation(object):
         :param value:
         :return:
         """
-        uid = value.uuid
-        uids = getattr(self, id_field_name)
-        if uid in uids:
-            raise ValueError("Cannot append - object is already in link")
-        else:
-            uids.append(uid)
+        self._append_link_uid(id_field_name, value.uuid)
+
+    def _append_link_uid(self, id_field_name: str, uid: Any) -> None:
+        """Append uuid to n..n link id field, updating the store
+
+        :param id_field_name: Name of link id field, e.g. 'input_data_ids'
+        :param uid: uuid of linked-to object
+        :return:
+        """
+        store = self.mxlims_store
+        with store.lock(self.mxlims_base_type):
+            if store._snapshots:
+                store._preserve(self)
+            uids = getattr(self, id_field_name)
+            if uids is None:
+                setattr(self, id_field_name, (uid,))
+            elif uid in uids:
+                raise ValueError("Cannot append - object is already in link")
+            else:
+                transaction = store._transaction
+                if transaction is None:
+                    uids._add(uid)
+                    store.add_link(self, id_field_name, uid)
+                else:
+                    if transaction.needs_record(self, id_field_name):
+                        old_uids = uids.copy()
+                        uids._add(uid)
+                        transaction.record(self, id_field_name, old_uids)
+                    else:
+                        uids._add(uid)
+                if store._write_back:
+                    store._mark_changed(self)
+                if store._subscribers and store.is_registered(self):
+                    store._emit(
+                        EventKind.linked,
+                        self.mxlims_base_type,
+                        self.uuid,
+                        (id_field_name,),
+                        uid,
+                    )
 
     def _remove_link_nn(self, id_field_name: str, value: "MxlimsImplementation"):
         """Remove for n..n forward link
@@ -221,12 +402,44 @@ class MxlimsImplementation(object):
         :param value:
         :return:
         """
-        uid = value.uuid
-        uids = getattr(self, id_field_name)
-        if uid in uids:
-            uids.remove(uid)
-        else:
-            raise ValueError("Cannot remove - object not found")
+        self._remove_link_uid(id_field_name, value.uuid)
+
+    def _remove_link_uid(self, id_field_name: str, uid: Any) -> None:
+        """Remove uuid from n..n link id field, updating the store
+
+        :param id_field_name: Name of link id field, e.g. 'input_data_ids'
+        :param uid: uuid of linked-to object
+        :return:
+        """
+        store = self.mxlims_store
+        with store.lock(self.mxlims_base_type):
+            if store._snapshots:
+                store._preserve(self)
+            uids = getattr(self, id_field_name)
+            if uids and uid in uids:
+                transaction = store._transaction
+                if transaction is None:
+                    uids._discard(uid)
+                    store.remove_link(self, id_field_name, uid)
+                else:
+                    if transaction.needs_record(self, id_field_name):
+                        old_uids = uids.copy()
+                        uids._discard(uid)
+                        transaction.record(self, id_field_name, old_uids)
+                    else:
+                        uids._discard(uid)
+                if store._write_back:
+                    store._mark_changed(self)
+                if store._subscribers and store.is_registered(self):
+                    store._emit(
+                        EventKind.unlinked,
+                        self.mxlims_base_type,
+                        self.uuid,
+                        (id_field_name,),
+                        uid,
+                    )
+            else:
+                raise ValueError("Cannot remove - object not found")
 
     def _get_link_1n(
             self, basetypename: str, id_field_name: str
@@ -237,13 +450,7 @@ class MxlimsImplementation(object):
         :param id_field_name:
         :return:
         """
-        myuid = self.uuid
-        result = list(
-            obj
-            for obj in self._objects_by_id[basetypename].values()
-            if myuid == getattr(obj, id_field_name)
-        )
-        return result
+        return self.mxlims_store.get_referrers(basetypename, id_field_name, self.uuid)
 
     def _get_link_nn_rev(
         self, basetypename: str, id_field_name: str
@@ -254,13 +461,7 @@ class MxlimsImplementation(object):
         :param id_field_name:
         :return:
         """
-        myuid = self.uuid
-        result = list(
-            obj
-            for obj in self._objects_by_id[basetypename].values()
-            if myuid in getattr(obj, id_field_name)
-        )
-        return result
+        return self.mxlims_store.get_referrers(basetypename, id_field_name, self.uuid)
 
     def _set_link_1n_rev(
         self,
@@ -277,12 +478,15 @@ class MxlimsImplementation(object):
         :return:
         """
         myuid = self.uuid
-        uids = list(obj.uuid for obj in values)
-        for obj in self._objects_by_id[basetypename].values():
-            if getattr(obj, id_field_name) == myuid and obj.uuid not in uids:
-                setattr(obj, id_field_name, None)
-            elif obj.uuid in uids:
-                setattr(obj, id_field_name, myuid)
+        uids = set(obj.uuid for obj in values)
+        store = self.mxlims_store
+        with store.lock(basetypename):
+            for obj in store.get_referrers(basetypename, id_field_name, myuid):
+                if obj.uuid not in uids:
+                    setattr(obj, id_field_name, None)
+            for obj in values:
+                if getattr(obj, id_field_name) != myuid:
+                    setattr(obj, id_field_name, myuid)
 
     def _set_link_nn_rev(
         self,
@@ -298,14 +502,17 @@ class MxlimsImplementation(object):
         :param values:
         :return:
         """
-        myuid = self.uuid
-        uids = list(obj.uuid for obj in values)
-        for obj in self._objects_by_id[basetypename].values():
-            revuids = getattr(obj, id_field_name)
-            if myuid in revuids and obj.uuid not in uids:
-                revuids.remove(myuid)
-            elif obj.uuid in uids:
-                revuids.add(myuid)
+        uids = set(obj.uuid for obj in values)
+        old_uids = set()
+        store = self.mxlims_store
+        with store.lock(basetypename):
+            for obj in store.get_referrers(basetypename, id_field_name, self.uuid):
+                old_uids.add(obj.uuid)
+                if obj.uuid not in uids:
+                    obj._remove_link_nn(id_field_name, self)
+            for obj in values:
+                if obj.uuid not in old_uids:
+                    obj._append_link_nn(id_field_name, self)
 
 class BaseMessage(BaseModel):
     """Class for basic MxlimsMessage holding message implementation"""
@@ -338,46 +545,235 @@ class BaseMessage(BaseModel):
             cls,
             message_path: Path,
             uuid_clash_mode: UuidClashMode = UuidClashMode.reject_new,
-            merge_links: bool = True
+            merge_links: bool = True,
+            store: Optional[MxlimsStore] = None,
+            check_links: bool = False,
     ) -> "BaseMessage":
         """Load schema-compliant JSON message into main implementation
 
+        The message is loaded in a single validation pass, as by from_message_json
+
         Args:
             message_path: Path to message JSON file
             uuid_clash_mode: In case of uuid clash should incoming objects replace or defer to existing
             merge_links: Should -to-many links be merged between incoming and existing objects
                          Relevant only for Job,inputData, job,referenceData, and Job,templateData
+            store: MxlimsStore to load objects into. Defaults to the current store
+            check_links: Check links from the loaded objects with
+                         MxlimsStore.check_integrity, and raise ValueError
+                         (undoing the load) if any are broken
+
+        Returns:
+
+        """
+        return cls._load_json(
+            Path(message_path).read_bytes(),
+            uuid_clash_mode=uuid_clash_mode,
+            store=store,
+            check_links=check_links,
+            source=str(message_path),
+        )
+
+    @classmethod
+    def from_message_json(
+            cls,
+            data: bytes | str,
+            uuid_clash_mode: UuidClashMode = UuidClashMode.reject_new,
+            store: Optional[MxlimsStore] = None,
+            check_links: bool = False,
+    ) -> "BaseMessage":
+        """Load schema-compliant JSON message text into main implementation
+
+        Links are converted, uuid clashes handled, and objects registered in
+        a single pass, as pydantic validates the message with a
+        MessageImportContext, instead of converting the whole message with
+        to_import_json beforehand.
+
+        Args:
+            data: JSON message, as bytes or str
+            uuid_clash_mode: In case of uuid clash should incoming objects replace or defer to existing
+            store: MxlimsStore to load objects into. Defaults to the current store
+            check_links: Check links from the loaded objects with
+                         MxlimsStore.check_integrity, and raise ValueError
+                         (undoing the load) if any are broken
 
         Returns:
 
         """
-        temp_message = cls()
-        message_dict = json.loads(message_path.read_text())
-        to_import_json(message_dict, uuid_clash_mode=uuid_clash_mode)
+        return cls._load_json(
+            data, uuid_clash_mode=uuid_clash_mode, store=store, check_links=check_links
+        )
+
+    @classmethod
+    def _load_json(
+            cls,
+            data: bytes | str,
+            uuid_clash_mode: UuidClashMode = UuidClashMode.reject_new,
+            store: Optional[MxlimsStore] = None,
+            check_links: bool = False,
+            source: str = "message",
+    ) -> "BaseMessage":
+        """Load JSON message, for from_message_file and from_message_json
+
+        :param source: Description of data, for error messages
+        """
+        from .JsonBackend import get_json_backend
+
+        if store is None:
+            store = MxlimsStore.current()
+        message_dict = get_json_backend().loads(data)
+        context = MessageImportContext(
+            message_dict, UuidClashMode(uuid_clash_mode), store
+        )
+        for tag in CORETYPES:
+            # Remove Stub objects - they are needed only to resolve links
+            message_dict.pop(tag, None)
         for tag in message_dict:
             snaketag = camel_to_snake(tag)
-            if not hasattr(temp_message, snaketag):
+            if snaketag not in cls.model_fields:
                 raise ValueError(
                     f"class {cls.__name__} does not have attribute {snaketag}"
                 )
-        return cls.model_validate(message_dict)
+        # The transaction undoes updates and registrations if loading fails
+        with store.activate(), store.transaction():
+            result = cls.model_validate(message_dict, context=context)
+            if check_links:
+                objects = []
+                for tag in message_dict:
+                    objdict = getattr(result, camel_to_snake(tag))
+                    if isinstance(objdict, dict):
+                        objects.extend(objdict.values())
+                report = store.check_integrity(objects)
+                if not report:
+                    raise ValueError(
+                        f"Broken links in {source}:\n{report.summary()}"
+                    )
+        return result
+
+    @classmethod
+    def load_lazy(
+            cls,
+            message_path: Path,
+            uuid_clash_mode: UuidClashMode = UuidClashMode.reject_new,
+            store: Optional[MxlimsStore] = None,
+    ) -> list[Any]:
+        """Load schema-compliant JSON message, creating objects only on first access
+
+        The message is converted as for from_message_file, but the objects are
+        registered with MxlimsStore.register_lazy, so that load time and memory
+        use depend on the objects actually used. Objects are validated
+        individually when created, and the message as a whole is not validated.
+
+        Args:
+            message_path: Path to message JSON file
+            uuid_clash_mode: In case of uuid clash should incoming objects replace or defer to existing
+            store: MxlimsStore to load objects into. Defaults to the current store
+
+        Returns: List of uuids of the objects loaded
+
+        """
+        import importlib
+
+        from .JsonBackend import get_json_backend
+
+        if store is None:
+            store = MxlimsStore.current()
+        message_dict = get_json_backend().loads(Path(message_path).read_bytes())
+        result = []
+        with store.activate(), store.transaction():
+            to_import_json(message_dict, uuid_clash_mode=uuid_clash_mode)
+            for tag, objdict in message_dict.items():
+                snaketag = camel_to_snake(tag)
+                if snaketag not in cls.model_fields:
+                    raise ValueError(
+                        f"class {cls.__name__} does not have attribute {snaketag}"
+                    )
+                if tag == "version":
+                    continue
+                objcls = getattr(
+                    importlib.import_module(f"..mxpydantic.objects.{tag}", __package__),
+                    tag,
+                )
+                for obj in objdict.values():
+                    result.append(store.register_lazy(objcls, obj))
+        return result
+
+    @classmethod
+    def iter_message_file(
+            cls,
+            message_path: Path,
+            uuid_clash_mode: UuidClashMode = UuidClashMode.reject_new,
+            store: Optional[MxlimsStore] = None,
+    ) -> Iterator[MxlimsImplementation]:
+        """Load schema-compliant JSON message incrementally, yielding each object
+        as it is read
 
-    def export_message(self, message_file: Path):
+        For messages too large to load with from_message_file. Memory use is
+        bounded by the largest object plus a uuid map, apart from the objects
+        kept by the store. Loading is not undone on error.
+        See MessageStream.iter_message_objects
+
+        Args:
+            message_path: Path to message JSON file
+            uuid_clash_mode: In case of uuid clash should incoming objects replace or defer to existing
+            store: MxlimsStore to load objects into. Defaults to the current store
+
+        Returns: Iterator over the objects loaded
+
+        """
+        from .MessageStream import iter_message_objects
+
+        return iter_message_objects(
+            cls, message_path, uuid_clash_mode=uuid_clash_mode, store=store
+        )
+
+    def export_message(
+            self,
+            message_file: Path,
+            since: Optional[int] = None,
+            store: Optional[MxlimsStore] = None,
+    ):
         """ Export message to message_file
 
+        With since given, only the objects in the message that were created or
+        changed after that checkpoint (see MxlimsStore.checkpoint) are exported.
+        Links to the other objects are exported as stubs, where the message
+        type allows it, as for any link to an object outside the message.
+
         :param message_file:
+        :param since: Checkpoint from MxlimsStore.checkpoint
+        :param store: MxlimsStore holding the objects, for since.
+            Defaults to the current store
         :return:
         """
-        # The stringification is needed because model_dump_json required for UUID
-        message_str = self.model_dump_json(
-            indent=4,
-            by_alias=True,
-            exclude_none=True,
-            serialize_as_any=True,
-        )
-        message_json = json.loads(message_str)
-        to_export_json(message_json)
-        message_file.write_text(json.dumps(message_json, indent=4))
+        message = self
+        if since is not None:
+            if store is None:
+                store = MxlimsStore.current()
+            changed = set(id(obj) for obj in store.changed_since(since))
+            update = {}
+            for name in type(self).model_fields:
+                objdict = getattr(self, name)
+                if isinstance(objdict, dict):
+                    update[name] = dict(
+                        (key, obj) for key, obj in objdict.items() if id(obj) in changed
+                    )
+            message = self.model_copy(update=update)
+        with Path(message_file).open("w") as fp0:
+            message.write_message(fp0)
+
+    def write_message(self, fp0: IO) -> None:
+        """Write message as schema-compliant JSON to open file
+
+        Objects are written one at a time, without building the whole message
+        in memory; see MessageStream.write_message
+
+        :param fp0: Text or binary file object
+        :return:
+        """
+        from .MessageStream import write_message
+
+        write_message(self, fp0)
 
 
 def to_export_json(message_dict: dict) -> None:
@@ -399,65 +795,84 @@ def to_export_json(message_dict: dict) -> None:
         elif tag == "version":
             # Special case - the only non-dictionary property
             continue
-        refdict = LINK_SPECIFICATION.get(tag)
-        for uid,obj in objdict.items():
-            for linkdict in refdict["links"].values():
-                link_id_name_orig = linkdict.get("link_id_name")
-                if link_id_name_orig:
-                    link_id_name = snake_to_camel(link_id_name_orig)
-                    link_uid = obj.pop(link_id_name, ())
-                    # This is a link with a foreign key
-                    if linkdict["cardinality"] == "single":
-                        if link_uid:
-                            tpl = uuid_to_id.get(link_uid)
-                            if tpl:
-                                # The linked-to object is in the message
-                                obj[linkdict["link_ref_name"]] = {
-                                    "$ref": tpl[1]
-                                }
-                            else:
-                                base_type = linkdict["basetypename"]
-                                if base_type in message_dict:
-                                    # Object not in message.
-                                    # Put Stub link, if allowed
-                                    target_dict = message_dict[base_type]
-                                    obj[linkdict["link_ref_name"]] = {
-                                        "$ref": f"/{base_type}/{base_type}{len(target_dict)}"
-                                    }
-                                    # And add stub to the message
-                                    target_dict[str(link_uid)] = {
-                                        "mxlimsBaseType": base_type,
-                                        "uuid": str(link_uid)
-                                    }
-                    elif linkdict["cardinality"] == "multiple":
-                        # Multiple link - link_uid is a list
-                        if link_uid:
-                            obj[linkdict["link_ref_name"]] = reflist = []
-                            for luid in link_uid:
-                                tpl = uuid_to_id.get(luid)
-                                if tpl:
-                                    # The linked-to object is in the message
-                                    reflist.append({"$ref": tpl[1]})
-                                else:
-                                    base_type = linkdict["basetypename"]
-                                    if base_type in message_dict:
-                                        # Object not in message.
-                                        # Put Stub link, if allowed
-                                        target_dict = message_dict[base_type]
-                                        reflist.append(
-                                            {
-                                            "$ref":
-                                            f"/{base_type}/{base_type}{len(target_dict)}",
-                                            }
-                                        )
-                                        # And add stub to the message
-                                        target_dict[str(luid)] = {
-                                            "mxlimsBaseType": base_type,
-                                            "uuid": str(luid),
-                                        }
-                    else:
-                        # Link should be skipped - e.g. MxExperiment.inputDataIds
-                        pass
+        for obj in objdict.values():
+            # Stubs are added to the message sections for the core types
+            export_links(tag, obj, uuid_to_id, message_dict)
+
+
+def export_links(tag: str, obj: dict, uuid_to_id: dict, stub_sections: dict) -> None:
+    """Convert ID-type links in JSON object to ref-type links
+
+    Conversion is done in-place. Links to objects not in uuid_to_id are made
+    to stubs, which are added to stub_sections, if it has a section for the
+    core type linked to
+
+    :param tag: Type name of object, e.g. 'Pin'
+    :param obj: JSON dictionary for object
+    :param uuid_to_id: {uuid string: (mxlims_type, '$ref' value)} for the
+        objects in the message
+    :param stub_sections: {core type name: {name: stub JSON dictionary}}
+    :return:
+    """
+    for link_ref_name, link_id_name, cardinality, base_type in LINK_PLANS[tag]:
+        link_uid = obj.pop(link_id_name, ())
+        if not link_uid:
+            continue
+        if cardinality == "single":
+            tpl = uuid_to_id.get(link_uid)
+            if tpl:
+                # The linked-to object is in the message
+                obj[link_ref_name] = {"$ref": tpl[1]}
+            elif base_type in stub_sections:
+                # Object not in message. Put Stub link, if allowed
+                obj[link_ref_name] = {
+                    "$ref": _add_stub(stub_sections[base_type], base_type, link_uid)
+                }
+        elif cardinality == "multiple":
+            # Multiple link - link_uid is a list
+            obj[link_ref_name] = reflist = []
+            for luid in link_uid:
+                tpl = uuid_to_id.get(luid)
+                if tpl:
+                    # The linked-to object is in the message
+                    reflist.append({"$ref": tpl[1]})
+                elif base_type in stub_sections:
+                    # Object not in message. Put Stub link, if allowed
+                    reflist.append(
+                        {"$ref": _add_stub(stub_sections[base_type], base_type, luid)}
+                    )
+        # Otherwise the link should be skipped - e.g. MxExperiment.inputDataIds
+
+
+def _add_stub(target_dict: dict, base_type: str, link_uid: Any) -> str:
+    """Add stub for object link_uid to message section target_dict
+
+    :return: '$ref' value for the stub
+    """
+    ref = f"/{base_type}/{base_type}{len(target_dict)}"
+    target_dict[str(link_uid)] = {"mxlimsBaseType": base_type, "uuid": str(link_uid)}
+    return ref
+
+
+def update_from_json(obj: MxlimsImplementation, objdict: dict) -> None:
+    """Set the fields present in pydantic-compliant JSON objdict on obj
+
+    objdict is validated as an object of the same class, in a scratch store
+
+    :param obj: Object to update
+    :param objdict: JSON dictionary for object with the same uuid and mxlims_type
+    :return:
+    """
+    mxlims_type = objdict.get("mxlimsType", obj.mxlims_type)
+    if mxlims_type != obj.mxlims_type:
+        raise ValueError(
+            f"Cannot update {obj.mxlims_type} {obj.uuid} from {mxlims_type}"
+        )
+    with MxlimsStore():
+        new_obj = type(obj).model_validate(objdict)
+        for name in new_obj.model_fields_set:
+            if name not in ("uuid", "mxlims_type", "mxlims_base_type"):
+                setattr(obj, name, getattr(new_obj, name))
 
 
 def to_import_json(
@@ -470,6 +885,7 @@ def to_import_json(
 
     :param message_dict: schema-compliant JSON message
     :param uuid_clash_mode: Switch for dealing with loaded uid clashing with existing
+        objects in the current MxlimsStore
     :return:
     """
     for tag, objdict in list(message_dict.items()):
@@ -481,32 +897,22 @@ def to_import_json(
                 if tag in CORETYPES:
                     raise ValueError(f"{tag} stub lacks uuid")
                 obj["uuid"] = str(uuid.uuid1())
+
+    # {'$ref' value: uuid}, as many links point to the same few objects
+    resolved = {}
+
+    def resolve(ref: str) -> str:
+        uid = resolved.get(ref)
+        if uid is None:
+            tags = ref.split("/", 2)[-2:]
+            uid = resolved[ref] = message_dict[tags[0]][tags[1]]["uuid"]
+        return uid
+
     for tag, objdict in list(message_dict.items()):
         if tag == "version":
             continue
-        refdict = LINK_SPECIFICATION.get(tag)
         for obj in objdict.values():
-            # Convert link references to foreign-key uuid values
-            for linkdict in refdict["links"].values():
-                link_id_name_orig = linkdict.get("link_id_name")
-                link_ref_name = linkdict.get("link_ref_name")
-                if link_id_name_orig:
-                    # This is a link with a foreign key
-                    link_id_name = snake_to_camel(link_id_name_orig)
-                    data = obj.pop(link_ref_name, None)
-                    if data:
-                        if linkdict["cardinality"] == "single":
-                            tags = data["$ref"].split("/", 2)[-2:]
-                            obj[link_id_name] = (
-                                message_dict[tags[0]][tags[1]]["uuid"]
-                            )
-                        else:
-                            uids = obj[link_id_name] = []
-                            for ddref in data:
-                                tags = ddref["$ref"].split("/", 2)[-2:]
-                                uids.append(
-                                    message_dict[tags[0]][tags[1]]["uuid"]
-                                )
+            import_links(tag, obj, resolve)
     for tag in CORETYPES:
         # Remove Stub objects - we no longer need them to disambiguate links
         message_dict.pop(tag, None)
@@ -515,17 +921,126 @@ def to_import_json(
         # handle uuid clashes between new and existing objects
         if tag == "version":
             continue
-        for tag2, new_obj in objdict.items():
-            old_obj = MxlimsImplementation.get_object_by_uuid(new_obj["uuid"])
-            if old_obj is not None:
-                if uuid_clash_mode == UuidClashMode.reject_new:
-                    print(f"Uuid clash for {new_obj['uuid']}, ignore new object")
-                    del objdict[tag2]
-                elif uuid_clash_mode == UuidClashMode.update_old:
-                    print(f"Uuid clash for {new_obj['uuid']}, update old object")
-                    for tag3, val in new_obj.items():
-                        setattr(old_obj, tag3, val)
-                else:
-                    # we must have an error
-                    raise ValueError(f"Uuid clash for {new_obj['uuid']}")
+        for tag2, new_obj in list(objdict.items()):
+            if not resolve_uuid_clash(new_obj, uuid_clash_mode):
+                del objdict[tag2]
 
+
+def import_links(tag: str, obj: dict, resolve: Callable[[str], Any]) -> None:
+    """Convert ref-type links in schema-compliant JSON object to ID-type links
+
+    Conversion is done in-place
+
+    :param tag: Type name of object, e.g. 'Pin'
+    :param obj: Schema-compliant JSON dictionary for object
+    :param resolve: Function returning the uuid for a '$ref' value
+    :return:
+    """
+    # Convert link references to foreign-key uuid values
+    for link_ref_name, link_id_name, cardinality, _ in LINK_PLANS[tag]:
+        data = obj.pop(link_ref_name, None)
+        if data:
+            if cardinality == "single":
+                obj[link_id_name] = resolve(data["$ref"])
+            else:
+                obj[link_id_name] = list(resolve(ddref["$ref"]) for ddref in data)
+
+
+class MessageImportContext(object):
+    """Validation context for loading a schema-compliant JSON message in a
+    single pass
+
+    Passed to model_validate for a message, so that each object converts
+    its links, and has uuid clashes handled, as pydantic validates it
+    (see MxlimsImplementation._import_message_json), rather than in separate
+    passes over the message beforehand, as by to_import_json.
+    Objects that are not to be loaded are left out of the message.
+    """
+
+    def __init__(
+        self,
+        message_dict: dict,
+        uuid_clash_mode: UuidClashMode,
+        store: MxlimsStore,
+    ) -> None:
+        """Add uuids to the objects in message_dict that lack them
+
+        :param message_dict: Schema-compliant JSON message, including any stubs
+        :param uuid_clash_mode: Switch for dealing with uuid clashes
+        :param store: MxlimsStore the message is loaded into
+        """
+        # {type name: section}, kept as stubs are removed from message_dict
+        self.sections = dict(message_dict)
+        self.uuid_clash_mode = uuid_clash_mode
+        # uuid strings of the objects already in the store, found before loading
+        # as by to_import_json. There are none when loading into an empty store
+        self.clashes = set()
+        check_clashes = bool(len(store.objects) or store._lazy)
+        for tag, objdict in message_dict.items():
+            if tag == "version":
+                continue
+            for obj in objdict.values():
+                uid = obj.get("uuid")
+                if not uid:
+                    if tag in CORETYPES:
+                        raise ValueError(f"{tag} stub lacks uuid")
+                    uid = obj["uuid"] = str(uuid.uuid1())
+                elif (
+                    check_clashes
+                    and tag not in CORETYPES
+                    and store.get(uuid.UUID(uid)) is not None
+                ):
+                    self.clashes.add(uid)
+        # {'$ref' value: uuid}, as many links point to the same few objects
+        self.resolved = {}
+
+    def resolve(self, ref: str) -> str:
+        """Get the uuid for a '$ref' value"""
+        uid = self.resolved.get(ref)
+        if uid is None:
+            tags = ref.split("/", 2)[-2:]
+            uid = self.resolved[ref] = self.sections[tags[0]][tags[1]]["uuid"]
+        return uid
+
+    def convert(self, tag: str, obj: Any) -> Any:
+        """Convert schema-compliant JSON object of type tag, in-place
+
+        Raises PydanticOmit if the object is not to be loaded
+
+        :param tag: Type name of object, e.g. 'Pin'
+        :param obj: JSON dictionary for object
+        :return: Pydantic-compliant JSON dictionary for object
+        """
+        if not isinstance(obj, dict):
+            # Left for pydantic to reject
+            return obj
+        import_links(tag, obj, self.resolve)
+        if obj["uuid"] in self.clashes and not resolve_uuid_clash(
+            obj, self.uuid_clash_mode
+        ):
+            raise PydanticOmit
+        return obj
+
+
+def resolve_uuid_clash(
+        new_obj: dict,
+        uuid_clash_mode: UuidClashMode = UuidClashMode.reject_new
+) -> bool:
+    """Handle uuid clash between JSON object and existing object in current store
+
+    :param new_obj: Pydantic-compliant JSON dictionary for incoming object
+    :param uuid_clash_mode: Switch for dealing with clashes
+    :return: True if new_obj is to be loaded, False if there was a clash
+    """
+    old_obj = MxlimsImplementation.get_object_by_uuid(uuid.UUID(new_obj["uuid"]))
+    if old_obj is None:
+        return True
+    if uuid_clash_mode == UuidClashMode.reject_new:
+        print(f"Uuid clash for {new_obj['uuid']}, ignore new object")
+    elif uuid_clash_mode == UuidClashMode.update_old:
+        print(f"Uuid clash for {new_obj['uuid']}, update old object")
+        update_from_json(old_obj, new_obj)
+    else:
+        # we must have an error
+        raise ValueError(f"Uuid clash for {new_obj['uuid']}")
+    return False
@@ -0,0 +1,309 @@
+# encoding: utf-8
+""" Queries over the objects in an MxlimsStore
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import operator
+from typing import Any, Callable, Iterator, Optional
+
+from .LinkSpecification import LINK_SPECIFICATION
+from .MxlimsBase import camel_to_snake
+from .MxlimsImplementation import MxlimsImplementation
+from .MxlimsStore import MxlimsStore
+from .UuidSet import UuidSet
+
+# Comparison operators, as (field value, query value) -> bool
+OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda val, values: val in values,
+    "between": lambda val, limits: limits[0] <= val <= limits[1],
+}
+
+
+class Predicate(object):
+    """Condition on the value(s) found at a field path
+
+    The path is a dot-separated sequence of field names, as in fieldmap.tsv
+    (camelCase or snake_case), link names, as in link_specification.yaml,
+    and keys into dictionary-valued fields. Where the path passes through
+    lists, multiple links, or n..n link id fields (e.g. 'inputDataIds'),
+    the predicate is true if it holds for any value.
+    Dictionary-valued fields at the end of the path give (key, value) pairs.
+    Objects are compared by uuid, so that a link may be compared to an object
+    """
+
+    def __init__(self, path: str, op: str, value: Any) -> None:
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown query operator '{op}'")
+        self.path = path
+        self.steps = tuple((step, camel_to_snake(step)) for step in path.split("."))
+        self.op = op
+        if op == "in":
+            value = frozenset(_normalise(val) for val in value)
+        else:
+            value = _normalise(value)
+        self.value = value
+        self._compare = OPERATORS[op]
+
+    def __repr__(self) -> str:
+        return f"Predicate({self.path!r}, {self.op!r}, {self.value!r})"
+
+    def get_values(self, obj: MxlimsImplementation) -> list:
+        """Get list of (normalised) values at path, starting from obj"""
+        values = [obj]
+        for step, snake_step in self.steps:
+            new_values = []
+            for val in values:
+                if isinstance(val, dict):
+                    val = val.get(step)
+                else:
+                    val = getattr(val, snake_step, None)
+                if val is None:
+                    continue
+                elif isinstance(val, (list, tuple, UuidSet)):
+                    new_values.extend(val)
+                else:
+                    new_values.append(val)
+            values = new_values
+        result = []
+        for val in values:
+            if isinstance(val, dict):
+                result.extend(val.items())
+            else:
+                result.append(_normalise(val))
+        return result
+
+    def matches(self, obj: MxlimsImplementation) -> bool:
+        """Does the predicate hold for obj?"""
+        value = self.value
+        compare = self._compare
+        for val in self.get_values(obj):
+            try:
+                if compare(val, value):
+                    return True
+            except TypeError:
+                # Incomparable values, e.g. None < 1.0
+                continue
+        return False
+
+
+def _normalise(value: Any) -> Any:
+    """Replace MXLIMS objects by their uuid"""
+    if isinstance(value, MxlimsImplementation):
+        return value.uuid
+    return value
+
+
+class Query(object):
+    """Lazy query over the objects in an MxlimsStore
+
+    Queries are built up by chaining where() calls, each of which returns
+    a new Query, and evaluated by iteration:
+
+        sweeps = store.query("CollectionSweep").where(
+            "energy", "between", (12600.0, 12800.0)
+        ).where("logisticalSample.container", "==", puck)
+        for sweep in sweeps:
+            ...
+
+    Equality and 'in' predicates are answered from the indices when possible,
+    i.e. when the path consists of forward links (those held as foreign keys,
+    like 'logistical_sample' or 'container'), optionally ending in the path of
+    a secondary index (e.g. 'barcode'). The most selective indexed predicate
+    gives the candidate objects; otherwise all objects of the type are scanned.
+    All predicates are checked for each candidate.
+
+    As for MxlimsStore.iter_objects, objects must not be added to or removed
+    from the store while a scan is being iterated over.
+    """
+
+    def __init__(
+        self,
+        store: MxlimsStore,
+        mxlims_type: Optional[str] = None,
+        basetypename: Optional[str] = None,
+        predicates: tuple[Predicate, ...] = (),
+        use_indexes: bool = True,
+    ) -> None:
+        self.store = store
+        self.mxlims_type = mxlims_type
+        self.basetypename = basetypename
+        self.predicates = predicates
+        self.use_indexes = use_indexes
+
+    def where(self, path: str, op: str, value: Any) -> Query:
+        """Get new query with the added condition
+
+        :param path: Dot-separated field path, e.g. 'logisticalSample.barcode'
+        :param op: Comparison operator; one of the keys of OPERATORS
+        :param value: Value to compare to. For 'in' a collection of values,
+            for 'between' a (lower, upper) tuple, limits included
+        :return: New Query
+        """
+        return Query(
+            self.store,
+            self.mxlims_type,
+            self.basetypename,
+            self.predicates + (Predicate(path, op, value),),
+            self.use_indexes,
+        )
+
+    def __iter__(self) -> Iterator[MxlimsImplementation]:
+        return self._execute()
+
+    def _execute(self) -> Iterator[MxlimsImplementation]:
+        candidates = self.plan()[1]
+        if candidates is None:
+            objs = self.store.iter_objects(self.mxlims_type, self.basetypename)
+        else:
+            objs = self._candidate_objects(candidates)
+        predicates = self.predicates
+        for obj in objs:
+            if all(predicate.matches(obj) for predicate in predicates):
+                yield obj
+
+    def _candidate_objects(self, uids: dict) -> Iterator[MxlimsImplementation]:
+        """Iterate over objects with given uuids, that are of the query type"""
+        store = self.store
+        if self.mxlims_type is not None:
+            objects = store.objects_by_type.get(self.mxlims_type, {})
+        elif self.basetypename is not None:
+            objects = store.objects_by_id[self.basetypename]
+        else:
+            objects = store.objects
+        basetypename = self.basetypename
+        for uid in uids:
+            obj = objects.get(uid)
+            if obj is None and store._lazy:
+                entry = store._lazy.get(uid)
+                if entry is not None and self.mxlims_type in (None, entry[1]):
+                    obj = store._load_lazy(uid)
+            if obj is not None and (
+                basetypename is None or obj.mxlims_base_type == basetypename
+            ):
+                yield obj
+
+    def all(self) -> list[MxlimsImplementation]:
+        """Get list of all matching objects"""
+        return list(self)
+
+    def first(self) -> Optional[MxlimsImplementation]:
+        """Get first matching object, or None"""
+        return next(iter(self), None)
+
+    def count(self) -> int:
+        """Get number of matching objects"""
+        return sum(1 for _ in self)
+
+    def plan(self) -> tuple[str, Optional[dict]]:
+        """Choose how to get candidate objects
+
+        :return: (description, candidate uuids), where the candidates are
+            None if all objects of the type must be scanned
+        """
+        best = None
+        if self.use_indexes:
+            self.store._flush()
+            for predicate in self.predicates:
+                result = self._plan_predicate(predicate)
+                if result is not None and (best is None or len(result[1]) < len(best[1])):
+                    best = result
+        if best is None:
+            return f"scan {self.mxlims_type or self.basetypename or 'all'}", None
+        return best
+
+    def _plan_predicate(self, predicate: Predicate) -> Optional[tuple[str, dict]]:
+        """Get candidate uuids for predicate from indices, if possible"""
+        if predicate.op == "==":
+            values = (predicate.value,)
+        elif predicate.op == "in":
+            values = predicate.value
+        else:
+            return None
+        store = self.store
+        typename = self.mxlims_type or self.basetypename
+        steps = tuple(snake_step for _, snake_step in predicate.steps)
+        # (basetypename, id_field_name) for the links followed, in order
+        chain = []
+        uids = None
+        description = None
+        for ind, step in enumerate(steps):
+            remainder = steps[ind:]
+            for name, index in store.indexes.items():
+                if index.path == remainder:
+                    uids = {}
+                    for val in values:
+                        uids.update(dict.fromkeys(index.lookup(val)))
+                    description = f"index {name}"
+                    break
+            if uids is not None:
+                break
+            linkdict = _get_forward_link(typename, step)
+            if linkdict is None:
+                return None
+            chain.append(
+                (LINK_SPECIFICATION[typename]["corename"], linkdict["link_id_name"])
+            )
+            if ind == len(steps) - 1:
+                uids = dict.fromkeys(values)
+                description = "links"
+            else:
+                typenames = linkdict["typenames"]
+                if len(typenames) == 1:
+                    typename = typenames[0]
+                else:
+                    typename = linkdict["basetypename"]
+        if uids is None:
+            return None
+        for basetypename, id_field_name in reversed(chain):
+            index = store.links_to[(basetypename, id_field_name)]
+            referrers = {}
+            with store.lock(basetypename):
+                for uid in uids:
+                    dd0 = index.get(uid)
+                    if dd0:
+                        referrers.update(dd0)
+            uids = referrers
+            description += f" <- {basetypename}.{id_field_name}"
+        return f"{description} for {predicate.path}", uids
+
+
+def _get_forward_link(typename: Optional[str], step: str) -> Optional[dict]:
+    """Get specification of link held as foreign key(s), by name or id field name"""
+    if typename not in LINK_SPECIFICATION:
+        return None
+    links = LINK_SPECIFICATION[typename]["links"]
+    linkdict = links.get(step)
+    if linkdict is None:
+        for linkdict in links.values():
+            if linkdict.get("link_id_name") == step:
+                break
+        else:
+            return None
+    if not linkdict.get("link_id_name"):
+        return None
+    return linkdict
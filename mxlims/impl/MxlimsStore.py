@@ -0,0 +1,1201 @@
+# encoding: utf-8
+""" MxlimsStore container for MXLIMS objects, with indices for lookup by uuid
+and by link
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import _thread
+import enum
+import threading
+import uuid
+import weakref
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Iterator, Optional, Sequence, TYPE_CHECKING
+
+from .LinkSpecification import (
+    CORETYPES,
+    LINK_ID_FIELDS_N1,
+    LINK_ID_FIELDS_NN,
+    LINK_ID_FIELDS_TO,
+    LINK_JSON_NAMES_N1,
+    LINK_JSON_NAMES_NN,
+)
+from .SecondaryIndex import BUILTIN_INDEXES, SecondaryIndex
+from .StoreEvents import ChangeTracker, EventBus, EventKind, StoreEvent, Subscriber
+from .StoreSnapshot import ChangeLog
+
+if TYPE_CHECKING:
+    from .LinkIntegrity import IntegrityReport
+    from .MxlimsImplementation import MxlimsImplementation
+    from .MxlimsQuery import Query
+    from .StoreSnapshot import StoreSnapshot
+    from .StoreTransaction import StoreTransaction
+    from ..mxpydantic.objects.Dataset import Dataset
+    from ..mxpydantic.objects.Job import Job
+    from ..mxpydantic.objects.LogisticalSample import LogisticalSample
+    from ..mxpydantic.objects.Sample import Sample
+
+
+class CascadeMode(enum.Enum):
+    """Enumeration for how to handle links to objects being deleted
+
+    Alternatives are:
+
+    - none: Links to the object are left in place, and no longer resolve
+    - nullify: Foreign keys to the object are set to None, or removed from lists
+    - contents: Contained LogisticalSamples are deleted, recursively;
+      other links are nullified
+    """
+    none = "none"
+    nullify = "nullify"
+    contents = "contents"
+
+
+class MxlimsStore(object):
+    """Container for MXLIMS objects, with indices for lookup by uuid and by link
+
+    Objects are registered in the store that is current when they are created,
+    and remain in it. Stores are independent, so the same uuid may be present
+    in several stores. The default store is current unless another is selected.
+
+    Used as a context manager the store is made current for the duration
+    of the block, and closed at the end:
+
+        with MxlimsStore() as store:
+            message = MxlimsMessageStrict.from_message_file(path, store=store)
+            ...
+
+    A store created with weak=True holds only weak references to its objects,
+    so that objects (and their index entries) are dropped once no longer
+    used elsewhere. Objects can also be removed explicitly with discard(),
+    or with delete(), which also cleans up links to them.
+
+    A store created with thread_safe=True can be shared between threads.
+    Registration and link updates are then done under a lock per core type,
+    which must be taken (with store.lock(basetypename)) also by code that
+    modifies several links as a unit. Note that the current store is set
+    per thread, so each worker thread must activate the store (or pass it
+    explicitly) before loading or creating objects.
+
+    Objects can be looked up by field value through secondary indices,
+    declared with add_index(). The indices in BUILTIN_INDEXES, for barcodes,
+    tracking device identifiers, and the identifiers dictionary, are always
+    present:
+
+        pins = store.lookup("barcode", "AB-1234")
+        samples = store.lookup("identifiers", ("esrf.fr", "12345"))
+
+    More general searches, using the indices where possible, are done with
+    query(); see MxlimsQuery.Query.
+
+    Changes made inside a transaction() block are undone if the block
+    raises an exception:
+
+        with store.transaction():
+            pin.container = puck
+            ...
+
+    Readers that must not block, or be blocked by, writers in other threads
+    can work on a read-only snapshot(), which is cheap to make.
+
+    Collections too large to hold in memory can be kept in a SQLite database,
+    using the subclass SqliteStore.
+
+    Objects can also be registered lazily, as JSON dictionaries (see
+    register_lazy and BaseMessage.load_lazy). They are then validated and
+    created on first access, by uuid, link, index lookup, or query; reverse
+    links and secondary indices are available before that. Operations over
+    all objects of a type, such as iter_objects(), first create the
+    lazily registered objects of that type.
+
+    Code maintaining derived data (tables, caches, search indices) can
+    subscribe() to change events - objects created, updated, linked,
+    unlinked, and deleted - instead of rescanning the store. Events are
+    collected during transactions (including message loading) and
+    batch_events() blocks, and delivered together, coalesced, at the end;
+    see StoreEvents.EventBus:
+
+        def on_change(events):
+            for event in events:
+                ...
+        store.subscribe(on_change, kinds=(EventKind.created, EventKind.deleted))
+
+    The objects changed since a checkpoint() are given by changed_since(),
+    e.g. to export only those (see BaseMessage.export_message):
+
+        checkpoint = store.checkpoint()
+        ...
+        message.export_message(path, since=checkpoint, store=store)
+    """
+
+    # Set by stores that keep objects in external storage (see SqliteStore),
+    # which must then implement _mark_changed, called after each change
+    _write_back = False
+
+    def __init__(self, weak: bool = False, thread_safe: bool = False) -> None:
+        self.weak = weak
+        self.thread_safe = thread_safe
+        # Dictionary type used for uuid:object dictionaries
+        self._dict_type = weakref.WeakValueDictionary if weak else dict
+        # Objects by uuid
+        self.objects: dict = self._dict_type()
+        # Objects by uuid, for each core type
+        self.objects_by_id: dict[str, dict] = {
+            tag: self._dict_type() for tag in CORETYPES
+        }
+        # Objects by uuid, for each mxlims_type. Filled in as types are registered
+        self.objects_by_type: dict[str, dict] = {}
+        # Reverse-link index for n..1 and n..n links, of the form
+        # (basetypename, id_field_name): {target uuid: {referrer uuid: None}}
+        # The innermost dict is used as an insertion-ordered set
+        self.links_to: dict[tuple[str, str], dict] = {
+            (tag, id_field_name): dict()
+            for tag in CORETYPES
+            for id_field_name in LINK_ID_FIELDS_N1[tag] | LINK_ID_FIELDS_NN[tag]
+        }
+        # Containment caches for LogisticalSamples, {uuid: tuple of uuids}
+        # Ancestors are innermost first, descendants depth-first.
+        # If an object is in a cache, so are its ancestors (for _ancestor_cache)
+        # or descendants (for _descendant_cache), which allows invalidation to stop
+        # at the first object not in the cache
+        self._ancestor_cache: dict[Any, tuple] = {}
+        self._descendant_cache: dict[Any, tuple] = {}
+        # Secondary indices by name, and by name of the field that triggers update
+        self.indexes: dict[str, SecondaryIndex] = {}
+        self._indexes_by_field: dict[str, list[SecondaryIndex]] = {}
+        # (basetypename, uuid): finalizer, for objects in weak stores
+        self._finalizers: dict[tuple[str, Any], weakref.finalize] = {}
+        self._tokens = []
+        # Holds the journal of the transaction in progress, if any; per thread
+        # in thread-safe stores, where each thread has its own transactions
+        self._transaction_state = (
+            _ThreadTransactionState() if thread_safe else _TransactionState()
+        )
+        # Lazily registered objects, not yet created, of the form
+        # uuid: (basetypename, mxlims_type, class, JSON dictionary, link values)
+        self._lazy: dict[Any, tuple] = {}
+        # Old values of changed entries and objects, for snapshots, and the
+        # live snapshots; changes are recorded only if there are any
+        self._change_log = ChangeLog()
+        self._snapshots = self._change_log.snapshots
+        # Change event subscribers; events are emitted only if there are any
+        self._event_bus = EventBus(thread_safe=thread_safe)
+        self._subscribers = self._event_bus.subscribers
+        # Locks by core type. Reentrant, as link setters nest index updates
+        if thread_safe:
+            self._locks = {tag: _TypeLock() for tag in CORETYPES}
+            for lock in self._locks.values():
+                lock.event_bus = self._event_bus
+            self._event_bus.locks = tuple(self._locks.values())
+        else:
+            self._locks = {tag: nullcontext() for tag in CORETYPES}
+        # Guards checking for and adding uuids in objects and _lazy, which
+        # hold all core types
+        self._uuid_lock = threading.Lock() if thread_safe else nullcontext()
+        # uuids of lazily registered objects being created, which are not new
+        self._loading: set = set()
+        # Records changed objects, once checkpoint() has been called
+        self._change_tracker: Optional[ChangeTracker] = None
+        for name, path in BUILTIN_INDEXES.items():
+            self.add_index(name, path)
+
+    @staticmethod
+    def current() -> MxlimsStore:
+        """Get the currently selected store"""
+        return _current_store.get()
+
+    @contextmanager
+    def activate(self) -> Iterator[MxlimsStore]:
+        """Context manager making this the current store, without closing it"""
+        token = _current_store.set(self)
+        try:
+            yield self
+        finally:
+            _current_store.reset(token)
+
+    def __enter__(self) -> MxlimsStore:
+        self._tokens.append(_current_store.set(self))
+        return self
+
+    def __exit__(self, *args) -> None:
+        _current_store.reset(self._tokens.pop())
+        self.close()
+
+    def __copy__(self) -> MxlimsStore:
+        # Stores are shared, not copied, when copying the objects in them
+        return self
+
+    def __deepcopy__(self, memo: dict) -> MxlimsStore:
+        return self
+
+    def lock(self, basetypename: str) -> _TypeLock | nullcontext:
+        """Lock for objects and links of core type basetypename
+
+        A no-op context manager unless the store is thread-safe"""
+        return self._locks[basetypename]
+
+    @contextmanager
+    def _lock_all(self) -> Iterator[None]:
+        """Context manager holding the locks for all core types"""
+        for tag in CORETYPES:
+            self._locks[tag].__enter__()
+        try:
+            yield
+        finally:
+            for tag in reversed(CORETYPES):
+                self._locks[tag].__exit__(None, None, None)
+
+    @property
+    def _transaction(self) -> Optional[StoreTransaction]:
+        """Journal of the transaction in progress (in this thread), if any"""
+        return self._transaction_state.transaction
+
+    @contextmanager
+    def transaction(self) -> Iterator[MxlimsStore]:
+        """Context manager making the changes inside the block atomic
+
+        Field and link changes, and object registration and removal, are
+        journaled, and rolled back if the block raises an exception.
+        Index updates for changed fields are batched, and done at the end
+        of the block, or when the indices are read inside it.
+        Changes inside field values (e.g. obj.identifiers[key] = val) are not
+        journaled. A transaction started inside another joins the outer one.
+
+        In a thread-safe store transactions are per thread, and hold no locks
+        beyond those taken for each change, so that threads can e.g. load
+        messages concurrently. Index updates are then done at once. Changes
+        made by other threads meanwhile are not isolated from the transaction;
+        rollback restores the fields changed in the transaction, and removes
+        the objects registered in it, also if other threads have changed them.
+        """
+        from .StoreTransaction import StoreTransaction
+
+        state = self._transaction_state
+        if state.transaction is not None:
+            # Nested - changes are committed or rolled back with the outer one
+            yield self
+            return
+        transaction = state.transaction = StoreTransaction(self)
+        event_bus = self._event_bus
+        # Events are delivered on commit, and dropped on rollback
+        events_start = event_bus.start_batch()
+        try:
+            yield self
+        except BaseException:
+            state.transaction = None
+            try:
+                transaction.rollback()
+            finally:
+                event_bus.discard_batch(events_start)
+            raise
+        else:
+            transaction.flush()
+            state.transaction = None
+            event_bus.end_batch()
+
+    @contextmanager
+    def batch_events(self) -> Iterator[MxlimsStore]:
+        """Context manager collecting the change events inside the block,
+        and delivering them together, coalesced, at the end
+
+        Unlike transaction(), changes are not undone on error. In a thread-safe
+        store batches are per thread, and collect the events for the changes
+        made by that thread.
+        """
+        self._event_bus.start_batch()
+        try:
+            yield self
+        finally:
+            self._event_bus.end_batch()
+
+    def subscribe(
+        self, callback: Subscriber, kinds: Optional[Sequence[EventKind]] = None
+    ) -> Subscriber:
+        """Call callback with lists of StoreEvents for changes to the store
+
+        Outside transactions and batch_events() blocks callback is called
+        once per event. In thread-safe stores it is called after the store
+        locks taken for the change are released. Exceptions raised by callback
+        propagate to the code making the change (or ending the batch).
+
+        :param callback: Function taking a list of StoreEvents
+        :param kinds: EventKinds to subscribe to. Defaults to all
+        :return: callback, for use with unsubscribe()
+        """
+        return self._event_bus.subscribe(callback, kinds)
+
+    def unsubscribe(self, callback: Subscriber) -> None:
+        """Stop calling callback, added with subscribe(), for changes"""
+        self._event_bus.unsubscribe(callback)
+
+    def checkpoint(self) -> int:
+        """Mark the current state, for finding the objects changed later
+
+        Changes are recorded from the first call on, using a change event
+        subscriber. Changes inside field values (e.g. obj.identifiers[key] = val)
+        are not detected. Changes in a transaction are recorded when it ends.
+
+        :return: Checkpoint, for use with changed_since()
+        """
+        with self._lock_all():
+            if self._change_tracker is None:
+                self._change_tracker = ChangeTracker()
+                self.subscribe(self._change_tracker)
+            return self._change_tracker.checkpoint()
+
+    def changed_since(self, checkpoint: int) -> list[MxlimsImplementation]:
+        """Get objects created or changed after checkpoint, and still present
+
+        Takes time proportional to the number of objects changed since
+        checkpoint, not to the size of the store
+
+        :param checkpoint: Value returned by checkpoint()
+        :return: List of objects, in order of last change
+        """
+        if self._change_tracker is None:
+            raise ValueError(f"Unknown change checkpoint {checkpoint}")
+        with self._lock_all():
+            result = []
+            for uid in self._change_tracker.changed_since(checkpoint):
+                obj = self.get(uid)
+                if obj is not None:
+                    result.append(obj)
+            return result
+
+    def _emit(
+        self,
+        kind: EventKind,
+        basetypename: str,
+        uid: Any,
+        fields: tuple[str, ...] = (),
+        target: Any = None,
+    ) -> None:
+        """Send change event to subscribers. Call only if there are any"""
+        self._event_bus.emit(StoreEvent(kind, basetypename, uid, fields, target))
+
+    def _emit_change(
+        self, obj: MxlimsImplementation, name: str, old_value: Any
+    ) -> None:
+        """Send events for change of field name of obj from old_value
+
+        Call only if there are subscribers, after the change"""
+        if not self.is_registered(obj):
+            return
+        basetypename = obj.mxlims_base_type
+        myuid = obj.uuid
+        value = getattr(obj, name)
+        if name in LINK_ID_FIELDS_N1[basetypename]:
+            if value != old_value:
+                if old_value is not None:
+                    self._emit(
+                        EventKind.unlinked, basetypename, myuid, (name,), old_value
+                    )
+                if value is not None:
+                    self._emit(EventKind.linked, basetypename, myuid, (name,), value)
+        elif name in LINK_ID_FIELDS_NN[basetypename]:
+            old_value = old_value or ()
+            value = value or ()
+            for uid in old_value:
+                if uid not in value:
+                    self._emit(EventKind.unlinked, basetypename, myuid, (name,), uid)
+            for uid in value:
+                if uid not in old_value:
+                    self._emit(EventKind.linked, basetypename, myuid, (name,), uid)
+        else:
+            self._emit(EventKind.updated, basetypename, myuid, (name,))
+
+    def _flush(self) -> None:
+        """Bring indices up to date with changes in transaction in progress"""
+        transaction = self._transaction
+        if transaction is not None and transaction.pending:
+            transaction.flush()
+
+    def snapshot(self) -> StoreSnapshot:
+        """Get read-only snapshot of the store, unaffected by later changes
+
+        Takes constant time, as the snapshot shares the store dictionaries;
+        see StoreSnapshot
+
+        :return: StoreSnapshot
+        """
+        from .StoreSnapshot import StoreSnapshot
+
+        with self._lock_all():
+            self._load_all_lazy()
+            self._flush()
+            return StoreSnapshot(self)
+
+    def _preserve(self, obj: MxlimsImplementation) -> None:
+        """Record field values of obj for live snapshots. Called before changes"""
+        self._change_log.preserve(obj)
+
+    def close(self) -> None:
+        """Release all objects and index entries held by the store"""
+        with self._lock_all():
+            # New dictionaries, as snapshots may hold on to the old ones
+            dict_type = self._dict_type
+            self.objects = dict_type()
+            self.objects_by_id = dict((tag, dict_type()) for tag in CORETYPES)
+            self.objects_by_type = {}
+            self._lazy = {}
+            if self._change_tracker is not None:
+                self._change_tracker.changed.clear()
+            self.links_to = dict((key, {}) for key in self.links_to)
+            for index in self.indexes.values():
+                index.clear()
+            self._ancestor_cache.clear()
+            self._descendant_cache.clear()
+            for finalizer in self._finalizers.values():
+                finalizer.detach()
+            self._finalizers.clear()
+
+    def save_snapshot(self, path: Path | str) -> int:
+        """Save all objects to a binary snapshot file, for fast reloading
+
+        See SnapshotFile.save_snapshot
+
+        :param path: Path of snapshot file, overwritten if present
+        :return: Number of objects saved
+        """
+        from .SnapshotFile import save_snapshot
+
+        self._load_all_lazy()
+        return save_snapshot(self, path)
+
+    def load_snapshot(self, path: Path | str) -> list[MxlimsImplementation]:
+        """Load objects from snapshot file made with save_snapshot, without validation
+
+        Raises ValueError if the file was made with a different format version
+        or different MXLIMS schemas. Loading into an empty store restores the
+        saved indices directly. The file is a pickle: never load snapshot files
+        from untrusted sources. See SnapshotFile.load_snapshot
+
+        :param path: Path of snapshot file
+        :return: List of objects loaded
+        """
+        from .SnapshotFile import load_snapshot
+
+        return load_snapshot(self, path)
+
+    def check_integrity(
+        self, objects: Optional[Sequence[MxlimsImplementation]] = None
+    ) -> IntegrityReport:
+        """Check that all foreign-key links resolve to objects of allowed types,
+        and agree with the reverse-link index
+
+        Runs in a single pass over the objects and their links, plus a pass
+        over the reverse-link index when checking all objects
+
+        :param objects: Objects to check links from, e.g. those just loaded.
+            Defaults to all objects in the store, which creates any lazily
+            registered objects
+        :return: IntegrityReport, listing missing and wrong-type link targets,
+            and reverse-link index errors
+        """
+        from .LinkIntegrity import check_integrity
+
+        with self._lock_all():
+            if objects is None:
+                self._load_all_lazy()
+            self._flush()
+            return check_integrity(self, objects)
+
+    def register(self, obj: MxlimsImplementation) -> None:
+        """Add new object, and its links, to the store
+
+        :param obj: Object to register
+        :return: None
+        """
+        basetypename = obj.mxlims_base_type
+        mxlims_type = obj.mxlims_type
+        myuid = obj.uuid
+        with self._locks[basetypename]:
+            obj_by_id = self.objects_by_id[basetypename]
+            obj_by_type = self.objects_by_type.get(mxlims_type)
+            if obj_by_type is None:
+                obj_by_type = self.objects_by_type.setdefault(
+                    mxlims_type, self._dict_type()
+                )
+            with self._uuid_lock:
+                old_obj = self.objects.get(myuid)
+                if old_obj is not None:
+                    raise ValueError(
+                        f"{old_obj.mxlims_base_type} with uuid '{myuid}' already exists"
+                    )
+                if self._lazy and myuid in self._lazy:
+                    raise ValueError(
+                        f"{self._lazy[myuid][0]} with uuid '{myuid}' already exists"
+                    )
+                if self._snapshots:
+                    for dd0 in (self.objects, obj_by_id, obj_by_type):
+                        self._change_log.record_entry(dd0, myuid)
+                self.objects[myuid] = obj
+            obj_by_id[myuid] = obj
+            obj_by_type[myuid] = obj
+            object.__setattr__(obj, "_mxlims_store", self)
+            if self._transaction is not None:
+                self._transaction.add_created(obj)
+            if self.weak:
+                # The finalizer keeps the object __dict__, but not the object itself,
+                # so that the links can be removed from the index once it is gone
+                self._finalizers[(basetypename, myuid)] = weakref.finalize(
+                    obj, self._remove_links, basetypename, myuid, obj.__dict__
+                )
+            for id_field_name in LINK_ID_FIELDS_N1[basetypename]:
+                self._add_index_entry(
+                    basetypename, id_field_name, getattr(obj, id_field_name), myuid
+                )
+            for id_field_name in LINK_ID_FIELDS_NN[basetypename]:
+                for uid in getattr(obj, id_field_name) or ():
+                    self._add_index_entry(basetypename, id_field_name, uid, myuid)
+            for index in self.indexes.values():
+                index.add(obj)
+            if self._subscribers and myuid not in self._loading:
+                self._emit(EventKind.created, basetypename, myuid)
+
+    def register_lazy(self, cls: type, objdict: dict) -> Any:
+        """Add object in pydantic-compliant JSON form, to be created on first access
+
+        Reverse links and secondary index entries are added at once, from
+        objdict. The object is validated when created, so validation errors
+        are raised on first access, and leave the object registered lazily
+
+        :param cls: Class of object, e.g. Pin
+        :param objdict: JSON dictionary for object, with uuid and foreign-key
+            links (as from to_import_json). Must not be modified later
+        :return: uuid of object
+        """
+        myuid = uuid.UUID(str(objdict["uuid"]))
+        fields = cls.__pydantic_fields__
+        basetypename = fields["mxlims_base_type"].default
+        mxlims_type = fields["mxlims_type"].default
+        # {id_field_name: uuid, or tuple of uuids} for the links from the object
+        links = {}
+        for id_field_name, json_name in LINK_JSON_NAMES_N1[basetypename]:
+            value = objdict.get(json_name)
+            if value is None:
+                value = objdict.get(id_field_name)
+            if value is not None:
+                links[id_field_name] = uuid.UUID(str(value))
+        for id_field_name, json_name in LINK_JSON_NAMES_NN[basetypename]:
+            value = objdict.get(json_name) or objdict.get(id_field_name)
+            if value:
+                links[id_field_name] = tuple(uuid.UUID(str(uid)) for uid in value)
+        with self._locks[basetypename]:
+            with self._uuid_lock:
+                if myuid in self.objects or myuid in self._lazy:
+                    raise ValueError(f"Object with uuid '{myuid}' already exists")
+                self._lazy[myuid] = (basetypename, mxlims_type, cls, objdict, links)
+            if self._transaction is not None:
+                self._transaction.add_lazy(myuid)
+            for id_field_name, value in links.items():
+                if id_field_name in LINK_ID_FIELDS_N1[basetypename]:
+                    self._add_index_entry(basetypename, id_field_name, value, myuid)
+                else:
+                    for uid in value:
+                        self._add_index_entry(basetypename, id_field_name, uid, myuid)
+            for index in self.indexes.values():
+                index.add_json(myuid, objdict)
+            if self._subscribers:
+                self._emit(EventKind.created, basetypename, myuid)
+        return myuid
+
+    def _load_lazy(self, uid: Any) -> Optional[MxlimsImplementation]:
+        """Create and register lazily registered object
+
+        :param uid: uuid of object
+        :return: The new object, or None if uid is not registered lazily
+        """
+        entry = self._lazy.get(uid)
+        if entry is None:
+            return None
+        basetypename, _, cls, objdict, _ = entry
+        with self._locks[basetypename]:
+            if self._lazy.pop(uid, None) is None:
+                # Created by another thread meanwhile
+                return self.objects.get(uid)
+            # Registration of the new object is not reported as a change
+            self._loading.add(uid)
+            try:
+                with self.activate():
+                    obj = cls.model_validate(objdict)
+            except BaseException:
+                self._lazy[uid] = entry
+                raise
+            finally:
+                self._loading.discard(uid)
+            transaction = self._transaction
+            if transaction is not None and uid not in transaction.lazy:
+                # Present before the transaction, so not removed on rollback
+                transaction.created.pop(id(obj), None)
+        return obj
+
+    def _load_all_lazy(
+        self, basetypename: Optional[str] = None, mxlims_type: Optional[str] = None
+    ) -> None:
+        """Create all lazily registered objects, optionally only of a given type"""
+        for uid, entry in list(self._lazy.items()):
+            if (basetypename is None or entry[0] == basetypename) and (
+                mxlims_type is None or entry[1] == mxlims_type
+            ):
+                self._load_lazy(uid)
+
+    def _discard_lazy(self, uid: Any) -> None:
+        """Remove lazily registered object, and the links from it, from the store"""
+        entry = self._lazy.get(uid)
+        if entry is not None:
+            basetypename = entry[0]
+            with self._locks[basetypename]:
+                entry = self._lazy.pop(uid, None)
+                if entry is not None:
+                    self._remove_links(basetypename, uid, entry[4])
+                    if self._subscribers:
+                        self._emit(EventKind.deleted, basetypename, uid)
+
+    def discard(self, obj: MxlimsImplementation) -> None:
+        """Remove object, and the links from it, from the store
+
+        Links to the object are left in place, but will no longer resolve
+
+        :param obj: Object to remove
+        :return: None
+        """
+        basetypename = obj.mxlims_base_type
+        myuid = obj.uuid
+        with self._locks[basetypename]:
+            obj_by_id = self.objects_by_id[basetypename]
+            if obj_by_id.get(myuid) is not obj:
+                raise ValueError(f"{basetypename} with uuid '{myuid}' is not in store")
+            if self._transaction is not None:
+                # The index entries removed must match the current field values
+                self._flush()
+                self._transaction.add_discarded(obj)
+            obj_by_type = self.objects_by_type[obj.mxlims_type]
+            if self._snapshots:
+                for dd0 in (self.objects, obj_by_id, obj_by_type):
+                    self._change_log.record_entry(dd0, myuid)
+            del obj_by_id[myuid]
+            del self.objects[myuid]
+            del obj_by_type[myuid]
+            finalizer = self._finalizers.pop((basetypename, myuid), None)
+            if finalizer is not None:
+                finalizer.detach()
+            self._remove_links(basetypename, myuid, obj.__dict__)
+            if self._subscribers:
+                self._emit(EventKind.deleted, basetypename, myuid)
+
+    def delete(
+        self,
+        obj: MxlimsImplementation,
+        cascade: CascadeMode = CascadeMode.nullify,
+    ) -> list[MxlimsImplementation]:
+        """Remove object from the store, cleaning up links to it
+
+        Referring objects are found through the reverse-link index,
+        so the cost depends on the number of links to the deleted objects
+
+        :param obj: Object to delete
+        :param cascade: How to handle links to the deleted object(s)
+        :return: List of deleted objects, contents before containers
+        """
+        cascade = CascadeMode(cascade)
+        result = []
+        with self._lock_all():
+            if not self.is_registered(obj):
+                raise ValueError(
+                    f"{obj.mxlims_base_type} with uuid '{obj.uuid}' is not in store"
+                )
+            self._delete(obj, cascade, result, set())
+        return result
+
+    def _delete(
+        self,
+        obj: MxlimsImplementation,
+        cascade: CascadeMode,
+        result: list,
+        visiting: set,
+    ) -> None:
+        """Delete obj and (for CascadeMode.contents) its contents, recursively"""
+        myuid = obj.uuid
+        visiting.add(myuid)
+        basetypename = obj.mxlims_base_type
+        if cascade is CascadeMode.contents and basetypename == "LogisticalSample":
+            for child in self.get_referrers("LogisticalSample", "container_id", myuid):
+                # Skip objects being deleted already, in case of containment cycles
+                if child.uuid not in visiting:
+                    self._delete(child, cascade, result, visiting)
+        if cascade is not CascadeMode.none:
+            for referrer_type, id_field_name in LINK_ID_FIELDS_TO[basetypename]:
+                for referrer in self.get_referrers(referrer_type, id_field_name, myuid):
+                    if id_field_name in LINK_ID_FIELDS_N1[referrer_type]:
+                        setattr(referrer, id_field_name, None)
+                    else:
+                        referrer._remove_link_nn(id_field_name, obj)
+        self.discard(obj)
+        result.append(obj)
+
+    def evict(self, uuid: Any, basetypename: Optional[str] = None) -> None:
+        """Remove object with given uuid from the store, if present
+
+        :param uuid: uuid of object to remove
+        :param basetypename: Name of base abstract class of object, if known
+        :return: None
+        """
+        if self._lazy and uuid in self._lazy:
+            self._discard_lazy(uuid)
+            return
+        obj = self.get(uuid, basetypename)
+        if obj is not None:
+            self.discard(obj)
+
+    def get(
+        self, uuid: Any, basetypename: Optional[str] = None
+    ) -> Optional[MxlimsImplementation]:
+        """Get object by uuid
+
+        :param uuid: uuid of object
+        :param basetypename: Name of base abstract class of object, if known
+        :return: Object, or None if not found
+        """
+        if basetypename is None:
+            obj = self.objects.get(uuid)
+        else:
+            obj = self.objects_by_id[basetypename].get(uuid)
+        if obj is None and self._lazy:
+            entry = self._lazy.get(uuid)
+            if entry is not None and basetypename in (None, entry[0]):
+                obj = self._load_lazy(uuid)
+        return obj
+
+    def get_all(self, basetypename: str) -> list[MxlimsImplementation]:
+        """Get list of all objects of core type basetypename"""
+        if self._lazy:
+            self._load_all_lazy(basetypename)
+        with self._locks[basetypename]:
+            return list(self.objects_by_id[basetypename].values())
+
+    def iter_objects(
+        self,
+        mxlims_type: Optional[str] = None,
+        basetypename: Optional[str] = None,
+    ) -> Iterator[MxlimsImplementation]:
+        """Iterate over objects, optionally only those of a given type
+
+        Iterates directly over the internal dictionaries, without copying,
+        so objects must not be added or removed while iterating.
+        Use get_all() for a copy that is safe to modify.
+
+        :param mxlims_type: Type name of objects, e.g. 'Pin'
+        :param basetypename: Name of core type of objects, e.g. 'LogisticalSample'
+        :return: Iterator over objects
+        """
+        if self._lazy:
+            self._load_all_lazy(basetypename, mxlims_type)
+        if mxlims_type is not None:
+            objs = self.objects_by_type.get(mxlims_type, {}).values()
+            if basetypename is None:
+                return iter(objs)
+            else:
+                return (obj for obj in objs if obj.mxlims_base_type == basetypename)
+        elif basetypename is not None:
+            return iter(self.objects_by_id[basetypename].values())
+        else:
+            return iter(self.objects.values())
+
+    def is_registered(self, obj: MxlimsImplementation) -> bool:
+        """Is obj registered in this store?"""
+        return self.objects_by_id[obj.mxlims_base_type].get(obj.uuid) is obj
+
+    def add_link(
+        self, obj: MxlimsImplementation, id_field_name: str, target_uid: Any
+    ) -> None:
+        """Add link from obj to target_uid to reverse-link index
+
+        Links from objects not registered in the store are ignored
+
+        :param obj: Object holding the link
+        :param id_field_name: Name of (forward-direction) link
+        :param target_uid: uuid of linked-to object, or None
+        :return: None
+        """
+        basetypename = obj.mxlims_base_type
+        with self._locks[basetypename]:
+            if target_uid is not None and self.is_registered(obj):
+                self._add_index_entry(basetypename, id_field_name, target_uid, obj.uuid)
+
+    def remove_link(
+        self, obj: MxlimsImplementation, id_field_name: str, target_uid: Any
+    ) -> None:
+        """Remove link from obj to target_uid from reverse-link index
+
+        Links from objects not registered in the store are ignored
+
+        :param obj: Object holding the link
+        :param id_field_name: Name of (forward-direction) link
+        :param target_uid: uuid of linked-to object, or None
+        :return: None
+        """
+        basetypename = obj.mxlims_base_type
+        with self._locks[basetypename]:
+            if target_uid is not None and self.is_registered(obj):
+                self._remove_index_entry(
+                    basetypename, id_field_name, target_uid, obj.uuid
+                )
+
+    def _add_index_entry(
+        self, basetypename: str, id_field_name: str, target_uid: Any, uid: Any
+    ) -> None:
+        """Add referrer uid for target_uid to reverse-link index"""
+        if id_field_name == "container_id" and basetypename == "LogisticalSample":
+            self._invalidate_containment(uid, target_uid)
+        if target_uid is not None:
+            index = self.links_to[(basetypename, id_field_name)]
+            if self._snapshots:
+                self._change_log.record_entry(index, target_uid)
+            referrers = index.get(target_uid)
+            if referrers is None:
+                index[target_uid] = {uid: None}
+            else:
+                referrers[uid] = None
+
+    def _remove_index_entry(
+        self, basetypename: str, id_field_name: str, target_uid: Any, uid: Any
+    ) -> None:
+        """Remove referrer uid for target_uid from reverse-link index"""
+        if id_field_name == "container_id" and basetypename == "LogisticalSample":
+            self._invalidate_containment(uid, target_uid)
+        if target_uid is not None:
+            index = self.links_to[(basetypename, id_field_name)]
+            referrers = index.get(target_uid)
+            if referrers is not None:
+                if self._snapshots:
+                    self._change_log.record_entry(index, target_uid)
+                referrers.pop(uid, None)
+                if not referrers:
+                    del index[target_uid]
+
+    def _remove_links(self, basetypename: str, uid: Any, values: dict) -> None:
+        """Remove all links from object from reverse-link index
+
+        :param basetypename: Name of base abstract class of object
+        :param uid: uuid of object
+        :param values: Field values (i.e. __dict__) of object
+        :return: None
+        """
+        with self._locks[basetypename]:
+            self._finalizers.pop((basetypename, uid), None)
+            for id_field_name in LINK_ID_FIELDS_N1[basetypename]:
+                self._remove_index_entry(
+                    basetypename, id_field_name, values.get(id_field_name), uid
+                )
+            for id_field_name in LINK_ID_FIELDS_NN[basetypename]:
+                for target_uid in values.get(id_field_name) or ():
+                    self._remove_index_entry(
+                        basetypename, id_field_name, target_uid, uid
+                    )
+            for index in self.indexes.values():
+                index.remove(uid)
+
+    def get_referrers(
+        self, basetypename: str, id_field_name: str, target_uid: Any
+    ) -> list[MxlimsImplementation]:
+        """Get objects linking to target_uid through id_field_name
+
+        :param basetypename: Name of referring base abstract class
+            (Job, Dataset, Sample, LogisticalSample)
+        :param id_field_name: Name of (forward-direction) link
+        :param target_uid: uuid of linked-to object
+        :return:
+        """
+        result = []
+        with self._locks[basetypename]:
+            self._flush()
+            obj_by_id = self.objects_by_id[basetypename]
+            uids = self.links_to[(basetypename, id_field_name)].get(target_uid, ())
+            if self._lazy:
+                # Creating objects adds their links to the index
+                uids = list(uids)
+            for uid in uids:
+                obj = obj_by_id.get(uid)
+                if obj is None and self._lazy:
+                    obj = self._load_lazy(uid)
+                if obj is not None:
+                    result.append(obj)
+        return result
+
+    def get_ancestors(self, obj: LogisticalSample) -> list[LogisticalSample]:
+        """Get containers of obj, innermost first
+
+        Cached if obj is in the store. Otherwise (e.g. after discard, or after
+        closing the store) the container links are followed without caching
+
+        :param obj: LogisticalSample
+        :return: List of containers, ending at the first one not in the store
+        """
+        obj_by_id = self.objects_by_id["LogisticalSample"]
+        if self._lazy or obj_by_id.get(obj.uuid) is not obj:
+            result = []
+            seen = {obj.uuid}
+            container_uid = obj.container_id
+            while container_uid is not None:
+                if container_uid in seen:
+                    raise ValueError(
+                        f"Containment cycle found at LogisticalSample '{container_uid}'"
+                    )
+                seen.add(container_uid)
+                container = self.get(container_uid, "LogisticalSample")
+                if container is None:
+                    break
+                result.append(container)
+                container_uid = container.container_id
+            if obj_by_id.get(obj.uuid) is not obj:
+                return result
+        with self._locks["LogisticalSample"]:
+            self._flush()
+            obj_by_id = self.objects_by_id["LogisticalSample"]
+            return list(obj_by_id[uid] for uid in self._get_ancestor_uids(obj.uuid))
+
+    def get_descendants(self, obj: LogisticalSample) -> list[LogisticalSample]:
+        """Get objects contained in obj, directly or indirectly, depth first
+
+        Cached if obj is in the store. Otherwise the objects in the store
+        that link to it are followed without caching
+
+        :param obj: LogisticalSample
+        :return: List of contained objects
+        """
+        registered = self.objects_by_id["LogisticalSample"].get(obj.uuid) is obj
+        if self._lazy or not registered:
+            index = self.links_to[("LogisticalSample", "container_id")]
+            result = []
+            seen = {obj.uuid}
+            stack = list(reversed(index.get(obj.uuid, ())))
+            while stack:
+                uid = stack.pop()
+                if uid in seen:
+                    raise ValueError(
+                        f"Containment cycle found at LogisticalSample '{uid}'"
+                    )
+                seen.add(uid)
+                child = self.get(uid, "LogisticalSample")
+                if child is not None:
+                    result.append(child)
+                    stack.extend(reversed(index.get(uid, ())))
+            if not registered:
+                return result
+        with self._locks["LogisticalSample"]:
+            self._flush()
+            obj_by_id = self.objects_by_id["LogisticalSample"]
+            return list(
+                obj_by_id[uid] for uid in self._get_descendant_uids(obj.uuid, set())
+            )
+
+    def _get_ancestor_uids(self, uid: Any) -> tuple:
+        """Get uuids of containers of registered LogisticalSample uid, filling cache"""
+        cache = self._ancestor_cache
+        result = cache.get(uid)
+        if result is not None:
+            return result
+        obj_by_id = self.objects_by_id["LogisticalSample"]
+        # Objects not in cache, innermost first
+        chain = [uid]
+        tail = ()
+        while True:
+            container_uid = obj_by_id[chain[-1]].container_id
+            if container_uid is None or container_uid not in obj_by_id:
+                break
+            cached = cache.get(container_uid)
+            if cached is not None:
+                tail = (container_uid,) + cached
+                break
+            if container_uid in chain:
+                raise ValueError(
+                    f"Containment cycle found at LogisticalSample '{container_uid}'"
+                )
+            chain.append(container_uid)
+        for ind in range(len(chain) - 1, -1, -1):
+            cache[chain[ind]] = tail
+            tail = (chain[ind],) + tail
+        return cache[uid]
+
+    def _get_descendant_uids(self, uid: Any, visiting: set) -> tuple:
+        """Get uuids of contents of LogisticalSample uid, recursively, filling cache"""
+        cache = self._descendant_cache
+        result = cache.get(uid)
+        if result is not None:
+            return result
+        obj_by_id = self.objects_by_id["LogisticalSample"]
+        visiting.add(uid)
+        ll0 = []
+        for child_uid in self.links_to[("LogisticalSample", "container_id")].get(
+            uid, ()
+        ):
+            if child_uid in visiting:
+                raise ValueError(
+                    f"Containment cycle found at LogisticalSample '{child_uid}'"
+                )
+            if child_uid in obj_by_id:
+                ll0.append(child_uid)
+                ll0.extend(self._get_descendant_uids(child_uid, visiting))
+        visiting.discard(uid)
+        result = cache[uid] = tuple(ll0)
+        return result
+
+    def _invalidate_containment(self, uid: Any, container_uid: Any) -> None:
+        """Clear cached containment affected by LogisticalSample uid entering
+        or leaving container_uid, or being added to or removed from the store"""
+        cache = self._ancestor_cache
+        if cache:
+            # uid and everything inside it
+            cache.pop(uid, None)
+            index = self.links_to[("LogisticalSample", "container_id")]
+            stack = list(index.get(uid, ()))
+            while stack:
+                child_uid = stack.pop()
+                if cache.pop(child_uid, None) is not None:
+                    stack.extend(index.get(child_uid, ()))
+        cache = self._descendant_cache
+        if cache:
+            # container_uid and everything outside it
+            cache.pop(uid, None)
+            obj_by_id = self.objects_by_id["LogisticalSample"]
+            seen = set()
+            while container_uid is not None and container_uid not in seen:
+                seen.add(container_uid)
+                cache.pop(container_uid, None)
+                obj = obj_by_id.get(container_uid)
+                container_uid = None if obj is None else obj.container_id
+
+    def add_index(self, name: str, path: str | Sequence[str]) -> SecondaryIndex:
+        """Add secondary index on field path, and index the objects already present
+
+        :param name: Name of index, used for lookup
+        :param path: Dot-separated path of field names, e.g. 'tracking_device.identifier'
+        :return: The new index
+        """
+        if name in self.indexes:
+            raise ValueError(f"Index '{name}' already exists")
+        index = SecondaryIndex(
+            path, thread_safe=self.thread_safe, change_log=self._change_log
+        )
+        self.indexes[name] = index
+        self._indexes_by_field.setdefault(index.field_name, []).append(index)
+        for obj in list(self.objects.values()):
+            index.add(obj)
+        for uid, entry in list(self._lazy.items()):
+            index.add_json(uid, entry[3])
+        return index
+
+    def lookup(self, index_name: str, value: Any) -> list[MxlimsImplementation]:
+        """Get objects with a given value in secondary index
+
+        :param index_name: Name of index, e.g. 'barcode'
+        :param value: Value to look for. For dictionary-valued fields (e.g.
+            'identifiers') a (key, value) tuple
+        :return: List of objects, in registration order
+        """
+        result = []
+        self._flush()
+        objects = self.objects
+        for uid in self.indexes[index_name].lookup(value):
+            obj = objects.get(uid)
+            if obj is None and self._lazy:
+                obj = self._load_lazy(uid)
+            if obj is not None:
+                result.append(obj)
+        return result
+
+    def query(
+        self,
+        mxlims_type: Optional[str] = None,
+        basetypename: Optional[str] = None,
+        use_indexes: bool = True,
+    ) -> Query:
+        """Start a query over objects in the store, refined with Query.where()
+
+        :param mxlims_type: Type name of objects, e.g. 'CollectionSweep'
+        :param basetypename: Name of core type of objects, e.g. 'Dataset'
+        :param use_indexes: If False, always scan all objects of the type
+        :return: Query, matching all objects of the type
+        """
+        from .MxlimsQuery import Query
+
+        return Query(self, mxlims_type, basetypename, use_indexes=use_indexes)
+
+    def reindex(
+        self, obj: MxlimsImplementation, field_name: Optional[str] = None
+    ) -> None:
+        """Update secondary index entries for obj
+
+        Needed only after modifying a field value in place,
+        e.g. obj.identifiers[key] = val; assignments are handled automatically
+
+        :param obj: Object to reindex
+        :param field_name: Update only indices on this field, if given
+        :return: None
+        """
+        if field_name is None:
+            indexes = self.indexes.values()
+        else:
+            indexes = self._indexes_by_field.get(field_name, ())
+        if indexes and self.is_registered(obj):
+            for index in indexes:
+                index.add(obj)
+
+
+class _TypeLock(_thread.RLock):
+    """Reentrant lock for one core type of a thread-safe MxlimsStore
+
+    Change events emitted while a thread holds any of the store locks are
+    delivered when it has released them all, as subscribers that read or
+    change objects of other core types could otherwise deadlock with a
+    thread taking the same locks in the opposite order.
+    Acquiring the lock is done in C, as for threading.RLock
+    """
+
+    __slots__ = ("event_bus",)
+
+    def __exit__(self, *args) -> None:
+        self.release()
+        event_bus = self.event_bus
+        if event_bus._batch.deferred:
+            event_bus.release_deferred()
+
+
+class _TransactionState(object):
+    """Holder for the transaction in progress in an MxlimsStore"""
+
+    transaction: Optional[StoreTransaction] = None
+
+
+class _ThreadTransactionState(threading.local):
+    """Holder for the transaction in progress in a thread-safe MxlimsStore,
+    in the current thread"""
+
+    transaction: Optional[StoreTransaction] = None
+
+
+_current_store: ContextVar[MxlimsStore] = ContextVar(
+    "mxlims_current_store", default=MxlimsStore()
+)
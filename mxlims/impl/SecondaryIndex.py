@@ -0,0 +1,184 @@
+# encoding: utf-8
+""" Secondary (field-value) indices for the MXLIMS object store
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import threading
+from contextlib import nullcontext
+from typing import Any, Hashable, Optional, Sequence, TYPE_CHECKING
+
+from .MxlimsBase import snake_to_camel
+from .UuidSet import UuidSet
+
+if TYPE_CHECKING:
+    from .StoreSnapshot import ChangeLog
+
+# name: field path for indices present in all MxlimsStores
+BUILTIN_INDEXES = {
+    "barcode": "barcode",
+    "tracking_device": "tracking_device.identifier",
+    "identifiers": "identifiers",
+}
+
+
+class SecondaryIndex(object):
+    """Index of objects by the value(s) found at a field path
+
+    The path is a dot-separated sequence of (snake_case) attribute names,
+    or of keys for dictionary-valued attributes, e.g. 'tracking_device.identifier'.
+    Objects without a value at the path are not indexed.
+    If the value is a list (or a UuidSet) each element is indexed separately,
+    and if it is a dictionary each (key, value) pair is indexed, so that
+    e.g. index 'identifiers' can be searched for ('esrf.fr', '12345').
+
+    The index is updated when the top-level field of the path is assigned to.
+    Changes inside a field value (e.g. obj.identifiers[key] = val) are not
+    detected, and require an explicit MxlimsStore.reindex(obj)
+    """
+
+    def __init__(
+        self,
+        path: str | Sequence[str],
+        thread_safe: bool = False,
+        change_log: Optional[ChangeLog] = None,
+    ) -> None:
+        if isinstance(path, str):
+            path = path.split(".")
+        self.path = tuple(path)
+        # Path for pydantic-compliant JSON dictionaries, which use camelCase keys
+        self.json_path = tuple(snake_to_camel(step) for step in self.path)
+        # Name of the field whose assignment triggers reindexing
+        self.field_name = self.path[0]
+        # {key value: {uuid: None}}. The innermost dict is used as an ordered set
+        self.uuids_by_key: dict[Hashable, dict] = {}
+        # {uuid: keys indexed for that uuid}
+        self.keys_by_uuid: dict[Any, tuple] = {}
+        self._lock = threading.Lock() if thread_safe else nullcontext()
+        # Log of changes for store snapshots, if any
+        self.change_log = change_log
+        # (class, attribute name) for classes that lack the attribute,
+        # as failed attribute lookup is slow for pydantic models
+        self._absent: set[tuple[type, str]] = set()
+
+    def get_keys(self, obj: Any) -> tuple:
+        """Get index keys for obj - empty if there is no value at path"""
+        value = obj
+        for step in self.path:
+            if value is None:
+                break
+            elif isinstance(value, dict):
+                value = value.get(step)
+            else:
+                # Fields are held in __dict__, properties are not
+                values = getattr(value, "__dict__", None)
+                if values is not None and step in values:
+                    value = values[step]
+                else:
+                    cls = type(value)
+                    if (cls, step) in self._absent:
+                        value = None
+                    else:
+                        value = getattr(value, step, None)
+                        if value is None and not hasattr(cls, step):
+                            self._absent.add((cls, step))
+        return self._to_keys(value)
+
+    def get_json_keys(self, objdict: dict) -> tuple:
+        """Get index keys for object in pydantic-compliant JSON form
+
+        Steps are looked up both as camelCase and as given, as the dictionary
+        may use either field aliases or field names, and keys inside
+        dictionary-valued fields are used as they are
+        """
+        value = objdict
+        for json_step, step in zip(self.json_path, self.path):
+            if not isinstance(value, dict):
+                value = None
+                break
+            json_value = value.get(json_step)
+            value = value.get(step) if json_value is None else json_value
+        return self._to_keys(value)
+
+    def _to_keys(self, value: Any) -> tuple:
+        """Get index keys for the value at the end of the path"""
+        if value is None:
+            return ()
+        elif isinstance(value, dict):
+            return tuple(value.items())
+        elif isinstance(value, (list, tuple, set, UuidSet)):
+            return tuple(value)
+        else:
+            return (value,)
+
+    def add(self, obj: Any) -> None:
+        """Index obj, replacing any previous entries for it"""
+        self._add(obj.uuid, self.get_keys(obj))
+
+    def add_json(self, uid: Any, objdict: dict) -> None:
+        """Index object uid, in pydantic-compliant JSON form, replacing
+        any previous entries for it"""
+        self._add(uid, self.get_json_keys(objdict))
+
+    def _add(self, uid: Any, keys: tuple) -> None:
+        if not keys and uid not in self.keys_by_uuid:
+            return
+        with self._lock:
+            self._remove(uid)
+            if keys:
+                log = self.change_log
+                if log is not None and not log.snapshots:
+                    log = None
+                self.keys_by_uuid[uid] = keys
+                for key in keys:
+                    if log is not None:
+                        log.record_entry(self.uuids_by_key, key)
+                    self.uuids_by_key.setdefault(key, {})[uid] = None
+
+    def remove(self, uid: Any) -> None:
+        """Remove entries for object with uuid uid"""
+        with self._lock:
+            self._remove(uid)
+
+    def _remove(self, uid: Any) -> None:
+        log = self.change_log
+        if log is not None and not log.snapshots:
+            log = None
+        for key in self.keys_by_uuid.pop(uid, ()):
+            uids = self.uuids_by_key.get(key)
+            if uids is not None:
+                if log is not None:
+                    log.record_entry(self.uuids_by_key, key)
+                uids.pop(uid, None)
+                if not uids:
+                    del self.uuids_by_key[key]
+
+    def lookup(self, key: Hashable) -> list:
+        """Get list of uuids for objects with index value key"""
+        with self._lock:
+            return list(self.uuids_by_key.get(key, ()))
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            # New dictionaries, as snapshots may hold on to the old ones
+            self.uuids_by_key = {}
+            self.keys_by_uuid = {}
@@ -0,0 +1,297 @@
+# encoding: utf-8
+""" Saving and loading the contents of an MxlimsStore as a binary snapshot file
+
+Snapshot files are pickles, and must not be loaded from untrusted sources
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import functools
+import gc
+import hashlib
+import importlib
+import pickle
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, TYPE_CHECKING
+
+from .LinkSpecification import LINK_ID_FIELDS_NN
+
+if TYPE_CHECKING:
+    from .MxlimsImplementation import MxlimsImplementation
+    from .MxlimsStore import MxlimsStore
+
+# Identifies snapshot files
+SNAPSHOT_FORMAT = "mxlims-store-snapshot"
+# Version of the file layout. Increase when it changes
+SNAPSHOT_VERSION = 2
+PICKLE_PROTOCOL = 5
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    """Context manager pausing the cyclic garbage collector
+
+    Creating many objects otherwise triggers repeated collections, which scan
+    all objects already present. Snapshot loading leaves no unreachable cycles"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+@functools.cache
+def schema_hash() -> str:
+    """Get hash of the MXLIMS JSON schemas and link specification
+
+    Snapshot files made with different schemas are rejected on loading"""
+    mxlims_dir = Path(__file__).parent.parent
+    paths = sorted((mxlims_dir / "schemas").glob("**/*.json"))
+    paths.append(Path(__file__).parent / "link_specification.yaml")
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.relative_to(mxlims_dir).as_posix().encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def save_snapshot(store: MxlimsStore, path: Path | str) -> int:
+    """Save all objects in store, and the store indices, to a binary snapshot file
+
+    The file holds a header, with format version and schema hash, followed by
+    the objects, as one row of field values per object, in registration order,
+    and the uuid maps, reverse-link index and secondary indices of the store.
+    Field names are stored once per class, and the uuid maps as row numbers.
+    Both parts are pickled with protocol 5. Lazily registered objects are
+    created first.
+
+    :param store: MxlimsStore to save
+    :param path: Path of snapshot file, overwritten if present
+    :return: Number of objects saved
+    """
+    # {class: index}, and (module, class name, field names) by index
+    class_indices = {}
+    classes = []
+    # {frozenset of names of fields set explicitly: index}
+    fields_set_indices = {}
+    rows = []
+    with store._lock_all():
+        store._load_all_lazy()
+        store._flush()
+        # {uuid: row number}
+        row_numbers = {}
+        for obj in store.objects.values():
+            cls = type(obj)
+            class_index = class_indices.get(cls)
+            if class_index is None:
+                class_index = class_indices[cls] = len(classes)
+                classes.append(
+                    (cls.__module__, cls.__qualname__, tuple(cls.model_fields))
+                )
+            values = obj.__dict__
+            fields_set = frozenset(obj.__pydantic_fields_set__)
+            fields_set_index = fields_set_indices.setdefault(
+                fields_set, len(fields_set_indices)
+            )
+            row_numbers[obj.uuid] = len(rows)
+            rows.append(
+                (
+                    class_index,
+                    fields_set_index,
+                    tuple(values[name] for name in classes[class_index][2]),
+                )
+            )
+        indices = {
+            "objects_by_id": dict(
+                (tag, tuple(row_numbers[uid] for uid in dd0))
+                for tag, dd0 in store.objects_by_id.items()
+            ),
+            "objects_by_type": dict(
+                (tag, tuple(row_numbers[uid] for uid in dd0))
+                for tag, dd0 in store.objects_by_type.items()
+            ),
+            "links_to": store.links_to,
+            "indexes": dict(
+                (name, (index.path, index.uuids_by_key, index.keys_by_uuid))
+                for name, index in store.indexes.items()
+            ),
+        }
+        header = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "schema_hash": schema_hash(),
+            "classes": classes,
+            "object_count": len(rows),
+        }
+        # Written with the locks held, as the indices are not copied
+        with Path(path).open("wb") as fp0:
+            pickle.dump(header, fp0, protocol=PICKLE_PROTOCOL)
+            pickle.dump(
+                (tuple(fields_set_indices), rows, indices),
+                fp0,
+                protocol=PICKLE_PROTOCOL,
+            )
+    return len(rows)
+
+
+def load_snapshot(store: MxlimsStore, path: Path | str) -> list[MxlimsImplementation]:
+    """Load objects from binary snapshot file into store
+
+    The objects are restored without validation. If the store is empty, and
+    is not weak, and has no transaction, snapshots or subscribers, the saved
+    indices are assigned to it directly, which is much faster than
+    registering the objects. Secondary indices not in the file (or with a
+    different path) are rebuilt. Otherwise the objects are registered one by
+    one, in a transaction, so that nothing is loaded on error, e.g. if an
+    object is already in the store.
+
+    The file is a pickle, so that loading it can run arbitrary code. Never load
+    snapshot files from untrusted sources.
+
+    :param store: MxlimsStore to load objects into
+    :param path: Path of snapshot file, made with save_snapshot
+    :return: List of objects loaded, in the order they were saved
+    """
+    path = Path(path)
+    with path.open("rb") as fp0:
+        try:
+            header = pickle.load(fp0)
+        except Exception as exc:
+            raise ValueError(f"{path} is not an MXLIMS store snapshot") from exc
+        if not isinstance(header, dict) or header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} is not an MXLIMS store snapshot")
+        if header["version"] != SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Snapshot {path} has format version {header['version']}, "
+                f"expected {SNAPSHOT_VERSION}"
+            )
+        if header["schema_hash"] != schema_hash():
+            raise ValueError(
+                f"Snapshot {path} was made with different MXLIMS schemas"
+            )
+        classes = []
+        for module_name, class_name, field_names in header["classes"]:
+            cls = getattr(importlib.import_module(module_name), class_name)
+            if tuple(cls.model_fields) != field_names:
+                raise ValueError(
+                    f"Snapshot {path} has fields for {class_name} that differ "
+                    f"from the current class"
+                )
+            # Only classes with n..n links have UuidSets to attach
+            has_link_sets = bool(
+                LINK_ID_FIELDS_NN[cls.model_fields["mxlims_base_type"].default]
+            )
+            classes.append((cls, field_names, has_link_sets))
+        with _gc_paused():
+            fields_sets, rows, indices = pickle.load(fp0)
+    with store._lock_all(), _gc_paused():
+        bulk = not (
+            store.objects
+            or store._lazy
+            or store.weak
+            or store._write_back
+            or store._transaction is not None
+            or store._snapshots
+            or store._subscribers
+        )
+        result = _restore_objects(classes, fields_sets, rows, store if bulk else None)
+        if bulk:
+            _restore_indices(store, result, indices)
+            return result
+    with store.transaction():
+        for obj in result:
+            store.register(obj)
+    return result
+
+
+def _restore_objects(
+    classes: list, fields_sets: tuple, rows: list, store: Optional[MxlimsStore]
+) -> list[MxlimsImplementation]:
+    """Create objects from snapshot rows, without validation
+
+    :param classes: (class, field names, has n..n links) by class index
+    :param fields_sets: Names of fields set explicitly, by index
+    :param rows: (class index, fields set index, field values) by object
+    :param store: Store to attach the objects to, or None
+    :return: List of objects
+    """
+    result = []
+    new_object = object.__new__
+    set_attribute = object.__setattr__
+    for class_index, fields_set_index, values in rows:
+        cls, field_names, has_link_sets = classes[class_index]
+        obj = new_object(cls)
+        # As done by pydantic model_construct, without validation
+        values = dict(zip(field_names, values))
+        if store is not None:
+            values["_mxlims_store"] = store
+        set_attribute(obj, "__dict__", values)
+        set_attribute(
+            obj, "__pydantic_fields_set__", set(fields_sets[fields_set_index])
+        )
+        set_attribute(obj, "__pydantic_extra__", None)
+        set_attribute(obj, "__pydantic_private__", None)
+        if has_link_sets:
+            obj._attach_link_sets()
+        result.append(obj)
+    return result
+
+
+def _restore_indices(
+    store: MxlimsStore, objects: list[MxlimsImplementation], indices: dict
+) -> None:
+    """Assign saved indices to empty store, holding objects
+
+    Must be called with all store locks held
+
+    :param store: Empty MxlimsStore
+    :param objects: Objects restored from snapshot, in the order saved
+    :param indices: Saved indices, as made by save_snapshot
+    :return: None
+    """
+    uids = list(obj.uuid for obj in objects)
+    store.objects = dict(zip(uids, objects))
+    objects_by_id = indices["objects_by_id"]
+    store.objects_by_id = dict(
+        (tag, dict((uids[ind], objects[ind]) for ind in objects_by_id.get(tag, ())))
+        for tag in store.objects_by_id
+    )
+    store.objects_by_type = dict(
+        (tag, dict((uids[ind], objects[ind]) for ind in row_numbers))
+        for tag, row_numbers in indices["objects_by_type"].items()
+    )
+    links_to = indices["links_to"]
+    store.links_to = dict((key, links_to.get(key, {})) for key in store.links_to)
+    saved_indexes = indices["indexes"]
+    for name, index in store.indexes.items():
+        saved = saved_indexes.get(name)
+        if saved is not None and saved[0] == index.path:
+            index.uuids_by_key = saved[1]
+            index.keys_by_uuid = saved[2]
+        else:
+            index.clear()
+            for obj in objects:
+                index.add(obj)
+    store._ancestor_cache.clear()
+    store._descendant_cache.clear()
@@ -0,0 +1,890 @@
+# encoding: utf-8
+""" MxlimsStore keeping its objects in a SQLite database
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import functools
+import importlib
+import json
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Mapping, ValuesView
+from contextlib import nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Hashable, Iterator, Optional, Sequence, TYPE_CHECKING
+from uuid import UUID
+
+from .LinkSpecification import CORETYPES, LINK_ID_FIELDS_N1, LINK_ID_FIELDS_NN
+from .MxlimsImplementation import MxlimsImplementation
+from .MxlimsStore import MxlimsStore
+from .SecondaryIndex import SecondaryIndex
+from .SnapshotFile import schema_hash
+from .StoreEvents import EventKind
+
+if TYPE_CHECKING:
+    from .LinkIntegrity import IntegrityReport
+    from .StoreSnapshot import StoreSnapshot
+
+# Number of rows read per query when iterating over objects
+READ_BATCH_SIZE = 1000
+
+# n..1 foreign-key columns of the object tables, by core type
+FK_COLUMNS = {tag: tuple(sorted(LINK_ID_FIELDS_N1[tag])) for tag in CORETYPES}
+# Tables holding n..n links, by core type and id field name
+LINK_TABLES = {
+    tag: {name: f"{tag}_{name}" for name in sorted(LINK_ID_FIELDS_NN[tag])}
+    for tag in CORETYPES
+}
+
+# Set while objects are created from database rows,
+# so that they are cached rather than registered as new objects
+_hydrating: ContextVar[bool] = ContextVar("mxlims_hydrating", default=False)
+
+
+class SqliteStore(MxlimsStore):
+    """MxlimsStore keeping its objects in a SQLite database, for collections
+    too large to hold in memory as pydantic objects
+
+    Each mxlims_type has a table, holding the objects as JSON payloads,
+    with an indexed column for each n..1 foreign key of the core type.
+    n..n links are held in a table per link, indexed on both ends, and the
+    secondary index entries in a common table. Forward and reverse links
+    and queries are answered from the database, through the same interface
+    as for MxlimsStore, so that the link properties work unchanged:
+
+        with SqliteStore("archive.sqlite") as store:
+            puck = store.lookup("barcode", "K123")[0]
+            for pin in puck.contents:
+                ...
+
+    Objects are created from the database when accessed, and the cache_size
+    most recently used ones are kept in an LRU cache; an object remains
+    the same Python object for as long as it is referenced.
+    New and changed objects are written to the database before it is next
+    read, and whenever there are more than cache_size of them; commit()
+    (also called by close()) makes the changes durable.
+    Changes inside field values (e.g. obj.identifiers[key] = val) are not
+    detected, and must be followed by store.reindex(obj).
+    In-memory snapshots (MxlimsStore.snapshot) are not supported, and raise
+    TypeError, as they work on the store dictionaries, which are here replaced
+    by views of the database. Readers in other processes or threads can open
+    their own SqliteStore on the committed database file instead.
+    """
+
+    _write_back = True
+
+    def __init__(
+        self, path: Path | str, cache_size: int = 10000, thread_safe: bool = False
+    ) -> None:
+        """
+        :param path: Path of database file, created if absent, or ':memory:'
+        :param cache_size: Number of recently used objects kept in memory
+        :param thread_safe: Allow the store to be shared between threads
+        """
+        self.path = path
+        self.cache_size = cache_size
+        # Guards the connection and the object caches
+        self._db_lock = threading.RLock() if thread_safe else nullcontext()
+        self._connection = sqlite3.connect(str(path), check_same_thread=not thread_safe)
+        self._closed = False
+        # {mxlims_type: (basetypename, class)} for types with a table
+        self._types: dict[str, tuple[str, type]] = {}
+        # Objects in use, and the most recently used ones, by uuid
+        self._live = weakref.WeakValueDictionary()
+        self._cache: OrderedDict[UUID, MxlimsImplementation] = OrderedDict()
+        # Objects changed since last written, by uuid,
+        # and removed objects still in the database, {uuid: mxlims_type}
+        self._dirty: dict[UUID, MxlimsImplementation] = {}
+        self._removed: dict[UUID, str] = {}
+        try:
+            self._create_schema()
+        except BaseException:
+            self._connection.close()
+            raise
+        super().__init__(thread_safe=thread_safe)
+        # Views of the database, in place of the dictionaries of MxlimsStore
+        self.objects = ObjectView(self)
+        self.objects_by_id = {tag: ObjectView(self, basetypename=tag) for tag in CORETYPES}
+        self.objects_by_type = TypeView(self)
+        self.links_to = {key: ReferrerView(self, *key) for key in self.links_to}
+
+    def _create_schema(self) -> None:
+        """Create the common tables if absent, and read the table of types"""
+        execute = self._connection.execute
+        execute(
+            "CREATE TABLE IF NOT EXISTS mxlims_meta "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        row = execute("SELECT value FROM mxlims_meta WHERE key = 'schema_hash'").fetchone()
+        if row is None:
+            execute(
+                "INSERT INTO mxlims_meta (key, value) VALUES ('schema_hash', ?)",
+                (schema_hash(),),
+            )
+        elif row[0] != schema_hash():
+            raise ValueError(f"Database {self.path} was made with different MXLIMS schemas")
+        execute(
+            "CREATE TABLE IF NOT EXISTS mxlims_object "
+            "(uuid TEXT PRIMARY KEY, base_type TEXT NOT NULL, mxlims_type TEXT NOT NULL)"
+        )
+        execute(
+            "CREATE INDEX IF NOT EXISTS mxlims_object_base_type "
+            "ON mxlims_object (base_type)"
+        )
+        execute(
+            "CREATE INDEX IF NOT EXISTS mxlims_object_mxlims_type "
+            "ON mxlims_object (mxlims_type)"
+        )
+        execute(
+            "CREATE TABLE IF NOT EXISTS mxlims_type (mxlims_type TEXT PRIMARY KEY, "
+            "base_type TEXT NOT NULL, module TEXT NOT NULL, class_name TEXT NOT NULL)"
+        )
+        execute(
+            "CREATE TABLE IF NOT EXISTS mxlims_index "
+            "(name TEXT PRIMARY KEY, path TEXT NOT NULL)"
+        )
+        execute(
+            "CREATE TABLE IF NOT EXISTS mxlims_index_entry "
+            "(name TEXT NOT NULL, key TEXT NOT NULL, uuid TEXT NOT NULL)"
+        )
+        execute(
+            "CREATE INDEX IF NOT EXISTS mxlims_index_entry_key "
+            "ON mxlims_index_entry (name, key)"
+        )
+        execute(
+            "CREATE INDEX IF NOT EXISTS mxlims_index_entry_uuid "
+            "ON mxlims_index_entry (name, uuid)"
+        )
+        for tables in LINK_TABLES.values():
+            for table in tables.values():
+                execute(
+                    f'CREATE TABLE IF NOT EXISTS "{table}" '
+                    f"(uuid TEXT NOT NULL, target TEXT NOT NULL)"
+                )
+                execute(f'CREATE INDEX IF NOT EXISTS "{table}_uuid" ON "{table}" (uuid)')
+                execute(
+                    f'CREATE INDEX IF NOT EXISTS "{table}_target" ON "{table}" (target)'
+                )
+        for mxlims_type, basetypename, module_name, class_name in execute(
+            "SELECT mxlims_type, base_type, module, class_name FROM mxlims_type"
+        ).fetchall():
+            cls = getattr(importlib.import_module(module_name), class_name)
+            self._types[mxlims_type] = (basetypename, cls)
+        self._connection.commit()
+
+    def _create_table(self, obj: MxlimsImplementation) -> None:
+        """Create table for objects of the type of obj"""
+        mxlims_type = obj.mxlims_type
+        basetypename = obj.mxlims_base_type
+        cls = type(obj)
+        execute = self._connection.execute
+        columns = "".join(f", {name} TEXT" for name in FK_COLUMNS[basetypename])
+        execute(
+            f'CREATE TABLE IF NOT EXISTS "{mxlims_type}" '
+            f"(uuid TEXT PRIMARY KEY{columns}, payload TEXT NOT NULL)"
+        )
+        for name in FK_COLUMNS[basetypename]:
+            execute(
+                f'CREATE INDEX IF NOT EXISTS "{mxlims_type}_{name}" '
+                f'ON "{mxlims_type}" ({name})'
+            )
+        execute(
+            "INSERT INTO mxlims_type (mxlims_type, base_type, module, class_name) "
+            "VALUES (?, ?, ?, ?)",
+            (mxlims_type, basetypename, cls.__module__, cls.__qualname__),
+        )
+        self._types[mxlims_type] = (basetypename, cls)
+
+    def commit(self) -> None:
+        """Write all changes to the database, and commit them"""
+        with self._lock_all():
+            self._flush()
+            with self._db_lock:
+                self._connection.commit()
+
+    def close(self) -> None:
+        """Commit all changes, close the database, and release the cached objects"""
+        with self._lock_all():
+            if self._closed:
+                return
+            self.commit()
+            with self._db_lock:
+                self._connection.close()
+                self._closed = True
+                self._live = weakref.WeakValueDictionary()
+                self._cache.clear()
+                self._ancestor_cache.clear()
+                self._descendant_cache.clear()
+
+    def snapshot(self) -> StoreSnapshot:
+        """Not supported. Raises TypeError
+
+        StoreSnapshots share the in-memory dictionaries of the store, which a
+        SqliteStore replaces by views of the database
+        """
+        raise TypeError(
+            "SqliteStore does not support snapshot(). Use an MxlimsStore, or "
+            "commit() and read the database file from a separate SqliteStore"
+        )
+
+    def _flush(self) -> None:
+        """Bring indices and database up to date with the changes made so far"""
+        super()._flush()
+        self._write_changes()
+
+    def _mark_changed(self, obj: MxlimsImplementation) -> None:
+        """Schedule obj for writing to the database. Called after each change"""
+        uid = obj.uuid
+        with self._db_lock:
+            if self._live.get(uid) is obj:
+                self._dirty[uid] = obj
+                if len(self._dirty) > self.cache_size:
+                    self._write_changes()
+
+    def _write_changes(self) -> None:
+        """Write new and changed objects to the database, and delete removed ones"""
+        with self._db_lock:
+            if not (self._dirty or self._removed):
+                return
+            execute = self._connection.execute
+            for uid, mxlims_type in self._removed.items():
+                suid = str(uid)
+                execute("DELETE FROM mxlims_object WHERE uuid = ?", (suid,))
+                execute(f'DELETE FROM "{mxlims_type}" WHERE uuid = ?', (suid,))
+                basetypename = self._types[mxlims_type][0]
+                for table in LINK_TABLES[basetypename].values():
+                    execute(f'DELETE FROM "{table}" WHERE uuid = ?', (suid,))
+            self._removed.clear()
+            objs = list(self._dirty.values())
+            self._dirty.clear()
+            for obj in objs:
+                self._write_object(obj)
+
+    def _write_object(self, obj: MxlimsImplementation) -> None:
+        """Insert or update the rows for obj"""
+        connection = self._connection
+        mxlims_type = obj.mxlims_type
+        basetypename = obj.mxlims_base_type
+        suid = str(obj.uuid)
+        values = obj.__dict__
+        # Only the fields set explicitly, so that loading restores fields_set
+        payload = obj.model_dump_json(include=obj.__pydantic_fields_set__ | {"uuid"})
+        connection.execute(
+            "INSERT INTO mxlims_object (uuid, base_type, mxlims_type) VALUES (?, ?, ?) "
+            "ON CONFLICT (uuid) DO NOTHING",
+            (suid, basetypename, mxlims_type),
+        )
+        connection.execute(
+            _upsert_statement(mxlims_type, basetypename),
+            (suid,)
+            + tuple(_to_text(values[name]) for name in FK_COLUMNS[basetypename])
+            + (payload,),
+        )
+        for name, table in LINK_TABLES[basetypename].items():
+            connection.execute(f'DELETE FROM "{table}" WHERE uuid = ?', (suid,))
+            targets = values[name]
+            if targets:
+                connection.executemany(
+                    f'INSERT INTO "{table}" (uuid, target) VALUES (?, ?)',
+                    ((suid, str(target)) for target in targets),
+                )
+
+    def register(self, obj: MxlimsImplementation) -> None:
+        """Add new object to the store, to be written to the database
+
+        :param obj: Object to register
+        :return: None
+        """
+        myuid = obj.uuid
+        if _hydrating.get():
+            # Created from a database row by _load_rows
+            object.__setattr__(obj, "_mxlims_store", self)
+            self._live[myuid] = obj
+            self._use(obj)
+            return
+        basetypename = obj.mxlims_base_type
+        with self._locks[basetypename], self._db_lock:
+            if self._exists(myuid):
+                raise ValueError(f"Object with uuid '{myuid}' already exists")
+            if obj.mxlims_type not in self._types:
+                self._create_table(obj)
+            object.__setattr__(obj, "_mxlims_store", self)
+            self._live[myuid] = obj
+            self._use(obj)
+            if self._transaction is not None:
+                self._transaction.add_created(obj)
+            for id_field_name in LINK_ID_FIELDS_N1[basetypename]:
+                self._add_index_entry(
+                    basetypename, id_field_name, getattr(obj, id_field_name), myuid
+                )
+            for index in self.indexes.values():
+                index.add(obj)
+            self._mark_changed(obj)
+            if self._subscribers:
+                self._emit(EventKind.created, basetypename, myuid)
+
+    def register_lazy(self, cls: type, objdict: dict) -> Any:
+        """Create and register object at once, as objects are loaded from the
+        database on demand anyway
+
+        :param cls: Class of object, e.g. Pin
+        :param objdict: JSON dictionary for object
+        :return: uuid of object
+        """
+        with self.activate():
+            return cls.model_validate(objdict).uuid
+
+    def discard(self, obj: MxlimsImplementation) -> None:
+        """Remove object from the store, and from the database when next written
+
+        Links to the object are left in place, but will no longer resolve
+
+        :param obj: Object to remove
+        :return: None
+        """
+        basetypename = obj.mxlims_base_type
+        myuid = obj.uuid
+        with self._locks[basetypename], self._db_lock:
+            if self._live.get(myuid) is not obj:
+                raise ValueError(f"{basetypename} with uuid '{myuid}' is not in store")
+            if self._transaction is not None:
+                # The index entries removed must match the current field values
+                super()._flush()
+                self._transaction.add_discarded(obj)
+            del self._live[myuid]
+            self._cache.pop(myuid, None)
+            self._dirty.pop(myuid, None)
+            self._removed[myuid] = obj.mxlims_type
+            for id_field_name in LINK_ID_FIELDS_N1[basetypename]:
+                self._remove_index_entry(
+                    basetypename, id_field_name, getattr(obj, id_field_name), myuid
+                )
+            for index in self.indexes.values():
+                index.remove(myuid)
+            if self._subscribers:
+                self._emit(EventKind.deleted, basetypename, myuid)
+
+    def _add_index_entry(
+        self, basetypename: str, id_field_name: str, target_uid: Any, uid: Any
+    ) -> None:
+        """Links are read from the database; only containment caches need updating"""
+        if id_field_name == "container_id" and basetypename == "LogisticalSample":
+            self._invalidate_containment(uid, target_uid)
+
+    def _remove_index_entry(
+        self, basetypename: str, id_field_name: str, target_uid: Any, uid: Any
+    ) -> None:
+        """Links are read from the database; only containment caches need updating"""
+        if id_field_name == "container_id" and basetypename == "LogisticalSample":
+            self._invalidate_containment(uid, target_uid)
+
+    def get_referrers(
+        self, basetypename: str, id_field_name: str, target_uid: Any
+    ) -> list[MxlimsImplementation]:
+        """Get objects linking to target_uid through id_field_name
+
+        :param basetypename: Name of referring base abstract class
+            (Job, Dataset, Sample, LogisticalSample)
+        :param id_field_name: Name of (forward-direction) link
+        :param target_uid: uuid of linked-to object
+        :return: List of objects, in registration order
+        """
+        with self._locks[basetypename]:
+            self._flush()
+            return self._load_rows(
+                self._get_referrer_rows(basetypename, id_field_name, target_uid)
+            )
+
+    def check_integrity(
+        self, objects: Optional[Sequence[MxlimsImplementation]] = None
+    ) -> IntegrityReport:
+        """Check that all foreign-key links resolve to objects of allowed types
+
+        Reverse links are read from the database, so there is no separate
+        reverse-link index to check
+
+        :param objects: Objects to check links from. Defaults to all objects
+        :return: IntegrityReport, listing missing and wrong-type link targets
+        """
+        from .LinkIntegrity import check_integrity
+
+        with self._lock_all():
+            self._flush()
+            return check_integrity(self, objects, check_index=False)
+
+    def add_index(self, name: str, path: str | Sequence[str]) -> SecondaryIndex:
+        """Add secondary index on field path, kept in the database
+
+        The objects already present are indexed, unless the database holds
+        an index with the same name and path
+
+        :param name: Name of index, used for lookup
+        :param path: Dot-separated path of field names, e.g. 'tracking_device.identifier'
+        :return: The new index
+        """
+        if name in self.indexes:
+            raise ValueError(f"Index '{name}' already exists")
+        index = SqliteIndex(self, name, path)
+        dotted_path = ".".join(index.path)
+        with self._db_lock:
+            row = self._connection.execute(
+                "SELECT path FROM mxlims_index WHERE name = ?", (name,)
+            ).fetchone()
+            is_new = row is None or row[0] != dotted_path
+            if is_new:
+                index.clear()
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO mxlims_index (name, path) VALUES (?, ?)",
+                    (name, dotted_path),
+                )
+        self.indexes[name] = index
+        self._indexes_by_field.setdefault(index.field_name, []).append(index)
+        if is_new:
+            for obj in self._iter_objects():
+                index.add(obj)
+        return index
+
+    def reindex(
+        self, obj: MxlimsImplementation, field_name: Optional[str] = None
+    ) -> None:
+        """Update secondary index entries for obj, and schedule it for writing
+
+        Needed only after modifying a field value in place,
+        e.g. obj.identifiers[key] = val; assignments are handled automatically
+
+        :param obj: Object to reindex
+        :param field_name: Update only indices on this field, if given
+        :return: None
+        """
+        self._mark_changed(obj)
+        super().reindex(obj, field_name)
+
+    def _use(self, obj: MxlimsImplementation) -> None:
+        """Put obj at the most recently used end of the LRU cache"""
+        cache = self._cache
+        uid = obj.uuid
+        if uid in cache:
+            cache.move_to_end(uid)
+        else:
+            cache[uid] = obj
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+    def _exists(self, uid: UUID) -> bool:
+        """Is there an object with uuid uid in the store?"""
+        if uid in self._live:
+            return True
+        elif uid in self._removed:
+            return False
+        return (
+            self._connection.execute(
+                "SELECT 1 FROM mxlims_object WHERE uuid = ?", (str(uid),)
+            ).fetchone()
+            is not None
+        )
+
+    def _load(
+        self,
+        uid: Any,
+        basetypename: Optional[str] = None,
+        mxlims_type: Optional[str] = None,
+    ) -> Optional[MxlimsImplementation]:
+        """Get object by uuid, from the cache or the database
+
+        :param uid: uuid of object
+        :param basetypename: Name of core type of object, if required
+        :param mxlims_type: Type name of object, if required
+        :return: Object, or None if not found or of the wrong type
+        """
+        uid = _to_uuid(uid)
+        if uid is None:
+            return None
+        with self._db_lock:
+            obj = self._live.get(uid)
+            if obj is None:
+                if uid in self._removed:
+                    return None
+                row = self._connection.execute(
+                    "SELECT uuid, mxlims_type FROM mxlims_object WHERE uuid = ?",
+                    (str(uid),),
+                ).fetchone()
+                if row is None:
+                    return None
+                obj = self._load_rows((row,))[0]
+            else:
+                self._use(obj)
+        if (basetypename is not None and obj.mxlims_base_type != basetypename) or (
+            mxlims_type is not None and obj.mxlims_type != mxlims_type
+        ):
+            return None
+        return obj
+
+    def _load_rows(self, rows: Sequence[tuple[str, str]]) -> list[MxlimsImplementation]:
+        """Get objects for (uuid, mxlims_type) rows, reading missing ones in batches
+
+        :param rows: (uuid text, mxlims_type) for objects in the database
+        :return: List of objects, in the order of rows
+        """
+        result = []
+        # {mxlims_type: {uuid text: index in result}} for objects to read
+        missing: dict[str, dict[str, int]] = {}
+        with self._db_lock:
+            live = self._live
+            for suid, mxlims_type in rows:
+                uid = UUID(suid)
+                obj = live.get(uid)
+                if obj is None and uid not in self._removed:
+                    missing.setdefault(mxlims_type, {})[suid] = len(result)
+                elif obj is not None:
+                    self._use(obj)
+                result.append(obj)
+            for mxlims_type, indices in missing.items():
+                cls = self._types[mxlims_type][1]
+                suids = list(indices)
+                for start in range(0, len(suids), READ_BATCH_SIZE):
+                    batch = suids[start : start + READ_BATCH_SIZE]
+                    payloads = self._connection.execute(
+                        f'SELECT uuid, payload FROM "{mxlims_type}" '
+                        f"WHERE uuid IN ({', '.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                    token = _hydrating.set(True)
+                    try:
+                        with self.activate():
+                            for suid, payload in payloads:
+                                result[indices[suid]] = cls.model_validate_json(payload)
+                    finally:
+                        _hydrating.reset(token)
+        return [obj for obj in result if obj is not None]
+
+    def _iter_objects(
+        self,
+        basetypename: Optional[str] = None,
+        mxlims_type: Optional[str] = None,
+        uuids_only: bool = False,
+    ) -> Iterator:
+        """Iterate over objects (or their uuids), in registration order
+
+        Rows are read in batches, so that the database is not locked meanwhile
+
+        :param basetypename: Name of core type of objects, if required
+        :param mxlims_type: Type name of objects, if required
+        :param uuids_only: Iterate over uuids rather than objects
+        :return: Iterator over objects or uuids
+        """
+        self._write_changes()
+        params = []
+        condition = ""
+        if mxlims_type is not None:
+            condition = " AND mxlims_type = ?"
+            params.append(mxlims_type)
+        elif basetypename is not None:
+            condition = " AND base_type = ?"
+            params.append(basetypename)
+        sql = (
+            f"SELECT rowid, uuid, mxlims_type FROM mxlims_object WHERE rowid > ?"
+            f"{condition} ORDER BY rowid LIMIT {READ_BATCH_SIZE}"
+        )
+        last = 0
+        while True:
+            with self._db_lock:
+                rows = self._connection.execute(sql, [last] + params).fetchall()
+                if not rows:
+                    return
+                last = rows[-1][0]
+                rows = list(row[1:] for row in rows)
+                if uuids_only:
+                    batch = list(UUID(row[0]) for row in rows)
+                else:
+                    batch = self._load_rows(rows)
+            yield from batch
+
+    def _get_referrer_rows(
+        self, basetypename: str, id_field_name: str, target_uid: Any
+    ) -> list[tuple[str, str]]:
+        """Get (uuid, mxlims_type) rows for objects linking to target_uid
+
+        :param basetypename: Name of referring core type
+        :param id_field_name: Name of (forward-direction) link
+        :param target_uid: uuid of linked-to object
+        :return: List of rows, in registration order for n..1 links,
+            and in link order for n..n links
+        """
+        if target_uid is None:
+            return []
+        self._write_changes()
+        starget = str(target_uid)
+        if id_field_name in LINK_ID_FIELDS_NN[basetypename]:
+            table = LINK_TABLES[basetypename][id_field_name]
+            sql = (
+                f'SELECT o.uuid, o.mxlims_type FROM "{table}" AS l '
+                f"JOIN mxlims_object AS o ON o.uuid = l.uuid "
+                f"WHERE l.target = ? ORDER BY l.rowid"
+            )
+            params = (starget,)
+        else:
+            mxlims_types = list(
+                mxlims_type
+                for mxlims_type, (tag, _) in self._types.items()
+                if tag == basetypename
+            )
+            if not mxlims_types:
+                return []
+            selects = " UNION ALL ".join(
+                f'SELECT uuid FROM "{mxlims_type}" WHERE {id_field_name} = ?'
+                for mxlims_type in mxlims_types
+            )
+            sql = (
+                f"SELECT uuid, mxlims_type FROM mxlims_object "
+                f"WHERE uuid IN ({selects}) ORDER BY rowid"
+            )
+            params = (starget,) * len(mxlims_types)
+        with self._db_lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def _get_link_targets(self, basetypename: str, id_field_name: str) -> list[UUID]:
+        """Get uuids of all objects linked to through id_field_name"""
+        self._write_changes()
+        if id_field_name in LINK_ID_FIELDS_NN[basetypename]:
+            table = LINK_TABLES[basetypename][id_field_name]
+            sql = f'SELECT DISTINCT target FROM "{table}"'
+        else:
+            sql = " UNION ".join(
+                f'SELECT {id_field_name} FROM "{mxlims_type}" '
+                f"WHERE {id_field_name} IS NOT NULL"
+                for mxlims_type, (tag, _) in self._types.items()
+                if tag == basetypename
+            )
+            if not sql:
+                return []
+        with self._db_lock:
+            return list(UUID(row[0]) for row in self._connection.execute(sql))
+
+    def _count(
+        self, basetypename: Optional[str] = None, mxlims_type: Optional[str] = None
+    ) -> int:
+        """Get number of objects, optionally of a given type"""
+        self._write_changes()
+        if mxlims_type is not None:
+            sql = "SELECT COUNT(*) FROM mxlims_object WHERE mxlims_type = ?"
+            params = (mxlims_type,)
+        elif basetypename is not None:
+            sql = "SELECT COUNT(*) FROM mxlims_object WHERE base_type = ?"
+            params = (basetypename,)
+        else:
+            sql = "SELECT COUNT(*) FROM mxlims_object"
+            params = ()
+        with self._db_lock:
+            return self._connection.execute(sql, params).fetchone()[0]
+
+
+class SqliteIndex(SecondaryIndex):
+    """Secondary index with its entries in the database of a SqliteStore
+
+    Keys are stored as JSON text, so that e.g. (key, value) tuples for
+    dictionary-valued fields are found on lookup
+    """
+
+    def __init__(self, store: SqliteStore, name: str, path: str | Sequence[str]) -> None:
+        super().__init__(path)
+        self.store = store
+        self.name = name
+
+    def add(self, obj: Any) -> None:
+        """Index obj, replacing any previous entries for it"""
+        suid = str(obj.uuid)
+        keys = self.get_keys(obj)
+        with self.store._db_lock:
+            connection = self.store._connection
+            connection.execute(
+                "DELETE FROM mxlims_index_entry WHERE name = ? AND uuid = ?",
+                (self.name, suid),
+            )
+            if keys:
+                connection.executemany(
+                    "INSERT INTO mxlims_index_entry (name, key, uuid) VALUES (?, ?, ?)",
+                    ((self.name, key, suid) for key in dict.fromkeys(map(_key_text, keys))),
+                )
+
+    def remove(self, uid: Any) -> None:
+        """Remove entries for object with uuid uid"""
+        with self.store._db_lock:
+            self.store._connection.execute(
+                "DELETE FROM mxlims_index_entry WHERE name = ? AND uuid = ?",
+                (self.name, str(uid)),
+            )
+
+    def lookup(self, key: Hashable) -> list:
+        """Get list of uuids for objects with index value key"""
+        with self.store._db_lock:
+            rows = self.store._connection.execute(
+                "SELECT uuid FROM mxlims_index_entry WHERE name = ? AND key = ? "
+                "ORDER BY rowid",
+                (self.name, _key_text(key)),
+            ).fetchall()
+        return list(UUID(row[0]) for row in rows)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self.store._db_lock:
+            self.store._connection.execute(
+                "DELETE FROM mxlims_index_entry WHERE name = ?", (self.name,)
+            )
+
+
+class ObjectView(Mapping):
+    """Read-only {uuid: object} mapping over the objects in a SqliteStore,
+    optionally only those of a given type"""
+
+    def __init__(
+        self,
+        store: SqliteStore,
+        basetypename: Optional[str] = None,
+        mxlims_type: Optional[str] = None,
+    ) -> None:
+        self._store = store
+        self._basetypename = basetypename
+        self._mxlims_type = mxlims_type
+
+    def get(self, uid: Any, default: Any = None) -> Any:
+        obj = self._store._load(uid, self._basetypename, self._mxlims_type)
+        return default if obj is None else obj
+
+    def __getitem__(self, uid: Any) -> MxlimsImplementation:
+        obj = self._store._load(uid, self._basetypename, self._mxlims_type)
+        if obj is None:
+            raise KeyError(uid)
+        return obj
+
+    def __contains__(self, uid: Any) -> bool:
+        return self.get(uid) is not None
+
+    def __iter__(self) -> Iterator[UUID]:
+        return self._store._iter_objects(
+            self._basetypename, self._mxlims_type, uuids_only=True
+        )
+
+    def __len__(self) -> int:
+        return self._store._count(self._basetypename, self._mxlims_type)
+
+    def values(self) -> ValuesView:
+        return _ObjectValuesView(self)
+
+
+class _ObjectValuesView(ValuesView):
+    """Values of an ObjectView, read from the database in batches"""
+
+    def __iter__(self) -> Iterator[MxlimsImplementation]:
+        view = self._mapping
+        return view._store._iter_objects(view._basetypename, view._mxlims_type)
+
+
+class TypeView(Mapping):
+    """Read-only {mxlims_type: ObjectView} mapping for the types in a SqliteStore"""
+
+    def __init__(self, store: SqliteStore) -> None:
+        self._store = store
+        self._views: dict[str, ObjectView] = {}
+
+    def __getitem__(self, mxlims_type: str) -> ObjectView:
+        result = self._views.get(mxlims_type)
+        if result is None:
+            if mxlims_type not in self._store._types:
+                raise KeyError(mxlims_type)
+            result = self._views.setdefault(
+                mxlims_type, ObjectView(self._store, mxlims_type=mxlims_type)
+            )
+        return result
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._store._types))
+
+    def __len__(self) -> int:
+        return len(self._store._types)
+
+
+class ReferrerView(Mapping):
+    """Read-only view of the links through one foreign-key field in a SqliteStore,
+    as {target uuid: {referrer uuid: None}}, like MxlimsStore.links_to"""
+
+    def __init__(self, store: SqliteStore, basetypename: str, id_field_name: str) -> None:
+        self._store = store
+        self._basetypename = basetypename
+        self._id_field_name = id_field_name
+
+    def get(self, target_uid: Any, default: Any = None) -> Any:
+        rows = self._store._get_referrer_rows(
+            self._basetypename, self._id_field_name, target_uid
+        )
+        if rows:
+            return dict.fromkeys(UUID(row[0]) for row in rows)
+        return default
+
+    def __getitem__(self, target_uid: Any) -> dict:
+        result = self.get(target_uid)
+        if result is None:
+            raise KeyError(target_uid)
+        return result
+
+    def __contains__(self, target_uid: Any) -> bool:
+        return self.get(target_uid) is not None
+
+    def __iter__(self) -> Iterator[UUID]:
+        return iter(self._store._get_link_targets(self._basetypename, self._id_field_name))
+
+    def __len__(self) -> int:
+        return len(self._store._get_link_targets(self._basetypename, self._id_field_name))
+
+
+@functools.cache
+def _upsert_statement(mxlims_type: str, basetypename: str) -> str:
+    """Get statement inserting or updating a row in the table for mxlims_type"""
+    columns = ("uuid",) + FK_COLUMNS[basetypename] + ("payload",)
+    updates = ", ".join(f"{name} = excluded.{name}" for name in columns[1:])
+    return (
+        f'INSERT INTO "{mxlims_type}" ({", ".join(columns)}) '
+        f"VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT (uuid) DO UPDATE SET {updates}"
+    )
+
+
+def _to_text(value: Any) -> Optional[str]:
+    """Convert uuid (or None) to column value"""
+    return None if value is None else str(value)
+
+
+def _to_uuid(value: Any) -> Optional[UUID]:
+    """Convert value to UUID, or None if it is not a valid uuid"""
+    if value is None or isinstance(value, UUID):
+        return value
+    try:
+        return UUID(str(value))
+    except ValueError:
+        return None
+
+
+def _key_text(key: Any) -> str:
+    """Convert secondary index key to column value"""
+    return json.dumps(key, default=str)
@@ -0,0 +1,327 @@
+# encoding: utf-8
+""" Change events for MxlimsStore subscribers
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import enum
+import threading
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Sequence
+
+
+class EventKind(enum.Enum):
+    """Kind of change reported by a StoreEvent"""
+
+    # Object registered, with its links
+    created = "created"
+    # Non-link fields changed
+    updated = "updated"
+    # Link added
+    linked = "linked"
+    # Link removed
+    unlinked = "unlinked"
+    # Object removed from the store
+    deleted = "deleted"
+
+
+class StoreEvent(NamedTuple):
+    """Change to an object in an MxlimsStore, as passed to subscribers
+
+    Events identify the object by uuid; the object itself is available
+    from the store (except after deletion) with store.get(uuid)
+    """
+
+    kind: EventKind
+    # Core type of the object, e.g. 'LogisticalSample'
+    basetypename: str
+    # uuid of the object
+    uuid: Any
+    # Names of changed fields. For link events the id field, e.g. ('container_id',)
+    fields: tuple[str, ...] = ()
+    # For link events the uuid linked to or unlinked from
+    target: Any = None
+
+
+# Subscriber callback, called with a list of events
+Subscriber = Callable[[list[StoreEvent]], Any]
+
+
+class EventBus(object):
+    """Delivers the change events of an MxlimsStore to its subscribers
+
+    Outside batches, each event is delivered as it happens. Inside a batch
+    events are collected, and delivered together, coalesced, at the end of
+    the outermost batch:
+
+    - Changes to an object created in the batch are folded into the
+      created event, as subscribers read the final state anyway
+    - Objects both created and deleted in the batch give no events, and
+      other events for deleted objects are dropped
+    - Updated events for the same object are merged, with the field names
+      in order of first change
+    - Links added and removed again in the batch (or vice versa) give no events
+
+    The store emits events only while there are subscribers. With
+    thread_safe=True batches are per thread, each collecting the events
+    for the changes made by its thread. Events emitted while the thread holds
+    any of the store locks (set in locks by thread-safe stores) are delivered,
+    in order, once it has released them all, so that subscribers may take
+    store locks in turn.
+    """
+
+    def __init__(self, thread_safe: bool = False) -> None:
+        # (callback, set of EventKinds or None for all), in subscription order.
+        # Shared with the store, which checks it before emitting
+        self.subscribers: list[tuple[Subscriber, Optional[frozenset]]] = []
+        # Reentrant locks of the store, which must provide _is_owned(), as
+        # threading.RLock does. Events are deferred while any are held
+        self.locks: tuple = ()
+        # The current batch, per thread if thread_safe
+        self._batch = _ThreadBatch() if thread_safe else _Batch()
+
+    def subscribe(
+        self, callback: Subscriber, kinds: Optional[Iterable[EventKind]] = None
+    ) -> Subscriber:
+        """Add subscriber
+
+        :param callback: Called with a list of StoreEvents
+        :param kinds: EventKinds to deliver. Defaults to all
+        :return: callback, for use with unsubscribe
+        """
+        if kinds is not None:
+            kinds = frozenset(EventKind(kind) for kind in kinds)
+        self.subscribers.append((callback, kinds))
+        return callback
+
+    def unsubscribe(self, callback: Subscriber) -> None:
+        """Remove subscriber"""
+        for ind, (subscriber, _) in enumerate(self.subscribers):
+            if subscriber is callback:
+                del self.subscribers[ind]
+                return
+        raise ValueError(f"{callback!r} is not subscribed")
+
+    def emit(self, event: StoreEvent) -> None:
+        """Deliver event, or collect it if inside a batch or holding locks"""
+        batch = self._batch
+        if batch.depth:
+            batch.pending.append(event)
+        elif self.locks and self._holds_lock():
+            batch.deferred.append([event])
+        else:
+            self.deliver([event])
+
+    def _holds_lock(self) -> bool:
+        """Does the current thread hold any of the store locks?"""
+        for lock in self.locks:
+            if lock._is_owned():
+                return True
+        return False
+
+    def release_deferred(self) -> None:
+        """Deliver the events deferred while the current thread held store
+        locks, if it holds none now. Called when releasing a store lock"""
+        if self._holds_lock():
+            return
+        batch = self._batch
+        deferred = batch.deferred
+        batch.deferred = []
+        for events in deferred:
+            self.deliver(events)
+
+    def start_batch(self) -> int:
+        """Start (possibly nested) batch
+
+        :return: Number of events collected before the batch, for discard_batch
+        """
+        batch = self._batch
+        batch.depth += 1
+        return len(batch.pending)
+
+    def end_batch(self) -> None:
+        """End batch, delivering the collected events if it is the outermost"""
+        batch = self._batch
+        batch.depth -= 1
+        if not batch.depth and batch.pending:
+            events = coalesce(batch.pending)
+            batch.pending = []
+            if self.locks and self._holds_lock():
+                batch.deferred.append(events)
+            else:
+                self.deliver(events)
+
+    def discard_batch(self, start: int) -> None:
+        """End batch, dropping the events collected since it started
+
+        :param start: Value returned by start_batch
+        :return: None
+        """
+        del self._batch.pending[start:]
+        self.end_batch()
+
+    def deliver(self, events: Sequence[StoreEvent]) -> None:
+        """Pass events to subscribers, filtered by kind"""
+        # Copied, so that callbacks may unsubscribe
+        for callback, kinds in list(self.subscribers):
+            if kinds is None:
+                selected = list(events)
+            else:
+                selected = list(event for event in events if event.kind in kinds)
+            if selected:
+                callback(selected)
+
+
+class _Batch(object):
+    """Events collected in the current batch of an EventBus"""
+
+    def __init__(self) -> None:
+        # Events collected so far
+        self.pending: list[StoreEvent] = []
+        # Nesting depth of batches
+        self.depth = 0
+        # Lists of events emitted while holding store locks, to deliver
+        # once they are released
+        self.deferred: list[list[StoreEvent]] = []
+
+
+class _ThreadBatch(_Batch, threading.local):
+    """Events collected in the current batch of an EventBus, in the current
+    thread. Initialised anew in each thread"""
+
+
+def coalesce(events: Sequence[StoreEvent]) -> list[StoreEvent]:
+    """Combine events for the same object, as described for EventBus
+
+    :param events: Events in the order they happened
+    :return: Coalesced events, in order of the first event combined into each
+    """
+    created = EventKind.created
+    deleted = EventKind.deleted
+    updated = EventKind.updated
+    # {uuid: index of first and of last deleted event}. Events for an object
+    # before its last deletion are dropped, and so is the deletion itself
+    # if the object was created in the batch
+    first_deleted = {}
+    last_deleted = {}
+    # {uuid: index of first created event}
+    first_created = {}
+    for ind, event in enumerate(events):
+        kind = event.kind
+        if kind is deleted:
+            first_deleted.setdefault(event.uuid, ind)
+            last_deleted[event.uuid] = ind
+        elif kind is created:
+            first_created.setdefault(event.uuid, ind)
+    # Events kept, with None for those dropped later
+    result: list[Optional[StoreEvent]] = []
+    # uuids of objects created in the batch (after their last deletion)
+    new_uids = set()
+    # {uuid: index of updated event in result}
+    updated_at = {}
+    # {(uuid, id field names, target): index of link event in result}
+    linked_at = {}
+    for ind, event in enumerate(events):
+        uid = event.uuid
+        kind = event.kind
+        if last_deleted:
+            last = last_deleted.get(uid)
+            if last is not None:
+                if ind < last:
+                    continue
+                if ind == last:
+                    if first_created.get(uid, ind) > first_deleted[uid]:
+                        # Present before the batch
+                        result.append(event)
+                    continue
+        if kind is created:
+            new_uids.add(uid)
+        elif uid in new_uids:
+            # Folded into the created event
+            continue
+        elif kind is updated:
+            pos = updated_at.get(uid)
+            if pos is not None:
+                previous = result[pos]
+                fields = previous.fields + tuple(
+                    name for name in event.fields if name not in previous.fields
+                )
+                result[pos] = previous._replace(fields=fields)
+                continue
+            updated_at[uid] = len(result)
+        else:
+            key = (uid, event.fields, event.target)
+            pos = linked_at.get(key)
+            if pos is not None:
+                if result[pos].kind is not kind:
+                    # Link removed again, or restored
+                    result[pos] = None
+                    del linked_at[key]
+                continue
+            linked_at[key] = len(result)
+        result.append(event)
+    return list(event for event in result if event is not None)
+
+
+class ChangeTracker(object):
+    """Subscriber recording, for each object, the checkpoint after which it
+    last changed. Used by MxlimsStore.checkpoint and changed_since
+
+    Creation, field and link changes all count. Entries are kept in order of
+    last change, so that the objects changed since a recent checkpoint
+    are found without looking at the others.
+    """
+
+    def __init__(self) -> None:
+        # Number of checkpoints taken. Changes are stamped with the current value
+        self.version = 0
+        # {uuid: version at last change}, in order of last change
+        self.changed: dict[Any, int] = {}
+
+    def __call__(self, events: list[StoreEvent]) -> None:
+        version = self.version
+        changed = self.changed
+        deleted = EventKind.deleted
+        for event in events:
+            uid = event.uuid
+            changed.pop(uid, None)
+            if event.kind is not deleted:
+                changed[uid] = version
+
+    def checkpoint(self) -> int:
+        """Start new version, and return the checkpoint ending the previous one"""
+        self.version += 1
+        return self.version - 1
+
+    def changed_since(self, checkpoint: int) -> list[Any]:
+        """Get uuids of objects changed after checkpoint, in order of last change
+
+        :param checkpoint: Value returned by checkpoint()
+        :return: List of uuids
+        """
+        if not 0 <= checkpoint < self.version:
+            raise ValueError(f"Unknown change checkpoint {checkpoint}")
+        result = []
+        for uid, version in reversed(self.changed.items()):
+            if version <= checkpoint:
+                break
+            result.append(uid)
+        result.reverse()
+        return result
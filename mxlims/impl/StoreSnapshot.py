@@ -0,0 +1,524 @@
+# encoding: utf-8
+""" Read-only, versioned snapshots of an MxlimsStore
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import copy
+import threading
+import weakref
+from collections.abc import Mapping
+from contextlib import nullcontext
+from typing import Any, Hashable, Iterator, Optional, Sequence, TYPE_CHECKING
+
+from .UuidSet import UuidSet
+
+if TYPE_CHECKING:
+    from .LinkIntegrity import IntegrityReport
+    from .MxlimsImplementation import MxlimsImplementation
+    from .MxlimsStore import MxlimsStore
+    from .MxlimsQuery import Query
+    from .SecondaryIndex import SecondaryIndex
+    from ..mxpydantic.objects.LogisticalSample import LogisticalSample
+
+# Marks dictionary entries that are absent
+MISSING = object()
+
+# Container name in ChangeLog for the field values of objects
+FIELDS = "fields"
+
+_NO_LOCK = nullcontext()
+
+
+class ChangeLog(object):
+    """Log of values before change, kept for the live snapshots of an MxlimsStore
+
+    Entries are recorded for dictionaries, identified by id(), and for object
+    field values (under FIELDS, by id() of the object). Only the first change
+    in each version is recorded, so the value an entry had for snapshot
+    version v is the one recorded at the first change after v.
+    The store records nothing while there are no live snapshots, and the
+    entries are dropped when the last snapshot is freed.
+
+    Writers must record the old value before making a change, and readers
+    must get the current value before looking in the log.
+    """
+
+    def __init__(self) -> None:
+        # Version of changes being made. Snapshots see the versions before theirs
+        self.version = 0
+        # Weak references to the live snapshots. A plain set, so that checking
+        # for snapshots before each change is fast
+        self.snapshots: set[weakref.ref] = set()
+        # {container: {key: [(version, value before change), ...]}}
+        self.entries: dict[Any, dict[Hashable, list]] = {}
+        # Serialises adding snapshots with dropping the last one. Reentrant,
+        # as a snapshot may be freed while a new one is added in the same thread
+        self._lock = threading.RLock()
+
+    def needs_record(self, container: Any, key: Hashable) -> bool:
+        """Must the current value be recorded before changing it?"""
+        changes = self.entries.get(container, {}).get(key)
+        return not changes or changes[-1][0] != self.version
+
+    def record(self, container: Any, key: Hashable, old_value: Any) -> None:
+        """Record value of entry before change
+
+        Values after the first change in the current version are ignored.
+
+        :param container: id() of dictionary, or FIELDS
+        :param key: Dictionary key, or id() of object
+        :param old_value: Value before the change, or MISSING. Must not be
+            modified later
+        :return: None
+        """
+        if not self.snapshots:
+            return
+        changes = self.entries.setdefault(container, {}).setdefault(key, [])
+        version = self.version
+        if not changes or changes[-1][0] != version:
+            changes.append((version, old_value))
+
+    def record_entry(self, container: dict, key: Hashable) -> None:
+        """Record entry of dictionary before change
+
+        Dictionary values, used as sets of uuids, are recorded as tuples"""
+        container_id = id(container)
+        if self.needs_record(container_id, key):
+            value = container.get(key, MISSING)
+            if isinstance(value, dict):
+                value = tuple(value)
+            self.record(container_id, key, value)
+
+    def preserve(self, obj: MxlimsImplementation) -> None:
+        """Record field values of obj before change"""
+        key = id(obj)
+        if self.needs_record(FIELDS, key):
+            self.record(FIELDS, key, copy_values(obj.__dict__))
+
+    def value_at(
+        self, version: int, container: Any, key: Hashable, current: Any
+    ) -> Any:
+        """Get value of entry for snapshot version, given the current value"""
+        for change_version, old_value in self.entries.get(container, {}).get(key, ()):
+            if change_version > version:
+                return old_value
+        return current
+
+    def changed_keys(self, container: Any) -> list:
+        """Get keys with recorded changes for container"""
+        return list(self.entries.get(container, ()))
+
+    def add_snapshot(self, snapshot: StoreSnapshot) -> int:
+        """Register new snapshot, and drop entries no longer needed
+
+        Must be called with all store locks held
+
+        :param snapshot: New snapshot
+        :return: Version of the snapshot
+        """
+        with self._lock:
+            versions = list(
+                snap.version
+                for snap in (ref() for ref in list(self.snapshots))
+                if snap is not None
+            )
+            if versions:
+                oldest = min(versions)
+                for container, changes_by_key in list(self.entries.items()):
+                    for key, changes in list(changes_by_key.items()):
+                        changes = list(
+                            change for change in changes if change[0] > oldest
+                        )
+                        if changes:
+                            changes_by_key[key] = changes
+                        else:
+                            del changes_by_key[key]
+                    if not changes_by_key:
+                        del self.entries[container]
+            else:
+                self.entries.clear()
+            result = self.version
+            self.version += 1
+            self.snapshots.add(weakref.ref(snapshot, self._snapshot_freed))
+            return result
+
+    def _snapshot_freed(self, ref: weakref.ref) -> None:
+        """Forget snapshot that has been freed, dropping all entries if it was
+        the last one"""
+        with self._lock:
+            self.snapshots.discard(ref)
+            if not self.snapshots:
+                self.entries.clear()
+
+
+class StoreSnapshot(object):
+    """Read-only view of an MxlimsStore, as it was when the snapshot was taken
+
+    Made with MxlimsStore.snapshot(). Creating a snapshot takes constant time,
+    as the snapshot shares the store dictionaries and indices. While snapshots
+    are alive the store records, in a ChangeLog, the old value of each
+    dictionary entry and object before changing it (once per snapshot),
+    so that writers are not held up by readers.
+    Reading from a snapshot takes no locks, and is not affected by changes
+    made to the store afterwards, from any thread.
+
+    The snapshot has the lookup and query functions of MxlimsStore.
+    The objects returned are read-only copies, made on first access,
+    whose links resolve within the snapshot:
+
+        snapshot = store.snapshot()
+        for sweep in snapshot.query("CollectionSweep").where(
+            "logisticalSample.container", "==", puck
+        ):
+            print(sweep.logistical_sample.barcode)
+
+    Lookups are somewhat slower than in the store, and len() of the object
+    dictionaries takes linear time. Changes inside field values
+    (e.g. obj.identifiers[key] = val) are not detected, and show up in the
+    snapshot. A snapshot taken inside a transaction includes the changes
+    made so far. Snapshots of weak stores hold only weak references to the
+    original objects. Keep a reference to the snapshot, or to an object copy,
+    while using the snapshot dictionaries (snapshot.objects etc.).
+    """
+
+    # Makes the copied objects read-only, as MxlimsImplementation calls
+    # _preserve() before any change when this is true
+    _snapshots = True
+    _transaction = None
+    _write_back = False
+    # Snapshots are taken after creating all lazily registered objects
+    _lazy: dict = {}
+
+    def __init__(self, store: MxlimsStore) -> None:
+        # Must be called with all store locks held
+        self.store = store
+        self.weak = store.weak
+        self._log = store._change_log
+        self.version = self._log.add_snapshot(self)
+        # Dictionaries of the store at creation, read through the log.
+        # They refer back to the snapshot through a proxy, so that the snapshot
+        # is freed (and stops changes being recorded) as soon as it is unused
+        proxy = weakref.proxy(self)
+        self.objects = _SnapshotMapping(proxy, store.objects, True)
+        self.objects_by_id = dict(
+            (tag, _SnapshotMapping(proxy, dd0, True))
+            for tag, dd0 in store.objects_by_id.items()
+        )
+        self.objects_by_type = dict(
+            (tag, _SnapshotMapping(proxy, dd0, True))
+            for tag, dd0 in store.objects_by_type.items()
+        )
+        self.links_to = dict(
+            (key, _SnapshotMapping(proxy, dd0, False))
+            for key, dd0 in store.links_to.items()
+        )
+        self.indexes = dict(
+            (name, _SnapshotIndex(proxy, index)) for name, index in store.indexes.items()
+        )
+        # {uuid: read-only copy}, for objects accessed through the snapshot.
+        # The copies refer to the snapshot, so they are held weakly
+        self._views: weakref.WeakValueDictionary[Any, MxlimsImplementation] = (
+            weakref.WeakValueDictionary()
+        )
+
+    def _get(self, container: dict, key: Hashable) -> Any:
+        """Get value of container entry at snapshot time, or MISSING
+
+        Dictionary values, used as sets of uuids, are returned as tuples"""
+        value = container.get(key, MISSING)
+        if isinstance(value, dict):
+            value = tuple(value)
+        return self._log.value_at(self.version, id(container), key, value)
+
+    def _iter(self, container: dict) -> Iterator[tuple[Hashable, Any]]:
+        """Iterate over (key, value) for entries of container at snapshot time"""
+        keys = list(container)
+        for key in keys:
+            value = self._get(container, key)
+            if value is not MISSING:
+                yield key, value
+        # Entries removed since the snapshot was taken
+        seen = set(keys)
+        for key in self._log.changed_keys(id(container)):
+            if key not in seen:
+                value = self._get(container, key)
+                if value is not MISSING:
+                    yield key, value
+
+    def _preserve(self, obj: MxlimsImplementation) -> None:
+        raise TypeError(
+            f"{obj.mxlims_type} {obj.uuid} belongs to a StoreSnapshot and is read-only"
+        )
+
+    def _view(self, obj: MxlimsImplementation) -> MxlimsImplementation:
+        """Get read-only copy of obj, with the field values at snapshot time"""
+        uid = obj.uuid
+        view = self._views.get(uid)
+        if view is None:
+            values = copy_values(obj.__dict__)
+            values = copy_values(
+                self._log.value_at(self.version, FIELDS, id(obj), values)
+            )
+            values["_mxlims_store"] = self
+            view = copy.copy(obj)
+            object.__setattr__(view, "__dict__", values)
+            # So that changes to the link id sets are refused, as for fields
+            view._attach_link_sets()
+            view = self._views.setdefault(uid, view)
+        return view
+
+    def lock(self, basetypename: str) -> nullcontext:
+        """No-op context manager, as snapshots do not change"""
+        return _NO_LOCK
+
+    def _flush(self) -> None:
+        """No-op, as snapshots have no pending index updates"""
+
+    def get(
+        self, uuid: Any, basetypename: Optional[str] = None
+    ) -> Optional[MxlimsImplementation]:
+        """Get object by uuid
+
+        :param uuid: uuid of object
+        :param basetypename: Name of base abstract class of object, if known
+        :return: Object, or None if not found
+        """
+        if basetypename is None:
+            return self.objects.get(uuid)
+        else:
+            return self.objects_by_id[basetypename].get(uuid)
+
+    def get_all(self, basetypename: str) -> list[MxlimsImplementation]:
+        """Get list of all objects of core type basetypename"""
+        return list(self.objects_by_id[basetypename].values())
+
+    def iter_objects(
+        self,
+        mxlims_type: Optional[str] = None,
+        basetypename: Optional[str] = None,
+    ) -> Iterator[MxlimsImplementation]:
+        """Iterate over objects, optionally only those of a given type
+
+        :param mxlims_type: Type name of objects, e.g. 'Pin'
+        :param basetypename: Name of core type of objects, e.g. 'LogisticalSample'
+        :return: Iterator over objects
+        """
+        if mxlims_type is not None:
+            objs = self.objects_by_type.get(mxlims_type, {}).values()
+            if basetypename is None:
+                return iter(objs)
+            else:
+                return (obj for obj in objs if obj.mxlims_base_type == basetypename)
+        elif basetypename is not None:
+            return iter(self.objects_by_id[basetypename].values())
+        else:
+            return iter(self.objects.values())
+
+    def is_registered(self, obj: MxlimsImplementation) -> bool:
+        """Is obj a copy belonging to this snapshot?"""
+        return self._views.get(obj.uuid) is obj
+
+    def get_referrers(
+        self, basetypename: str, id_field_name: str, target_uid: Any
+    ) -> list[MxlimsImplementation]:
+        """Get objects linking to target_uid through id_field_name
+
+        :param basetypename: Name of referring base abstract class
+            (Job, Dataset, Sample, LogisticalSample)
+        :param id_field_name: Name of (forward-direction) link
+        :param target_uid: uuid of linked-to object
+        :return:
+        """
+        obj_by_id = self.objects_by_id[basetypename]
+        result = []
+        for uid in self.links_to[(basetypename, id_field_name)].get(target_uid, ()):
+            obj = obj_by_id.get(uid)
+            if obj is not None:
+                result.append(obj)
+        return result
+
+    def get_ancestors(self, obj: LogisticalSample) -> list[LogisticalSample]:
+        """Get containers of obj, innermost first
+
+        :param obj: LogisticalSample
+        :return: List of containers, ending at the first one not in the snapshot
+        """
+        obj_by_id = self.objects_by_id["LogisticalSample"]
+        result = []
+        seen = {obj.uuid}
+        container = obj_by_id.get(obj.container_id)
+        while container is not None:
+            if container.uuid in seen:
+                raise ValueError(
+                    f"Containment cycle found at LogisticalSample '{container.uuid}'"
+                )
+            seen.add(container.uuid)
+            result.append(container)
+            container = obj_by_id.get(container.container_id)
+        return result
+
+    def get_descendants(self, obj: LogisticalSample) -> list[LogisticalSample]:
+        """Get objects contained in obj, directly or indirectly, depth first
+
+        :param obj: LogisticalSample
+        :return: List of contained objects
+        """
+        result = []
+        self._add_descendants(obj.uuid, result, set())
+        return result
+
+    def _add_descendants(self, uid: Any, result: list, visiting: set) -> None:
+        """Add contents of LogisticalSample uid to result, recursively"""
+        visiting.add(uid)
+        for child in self.get_referrers("LogisticalSample", "container_id", uid):
+            if child.uuid in visiting:
+                raise ValueError(
+                    f"Containment cycle found at LogisticalSample '{child.uuid}'"
+                )
+            result.append(child)
+            self._add_descendants(child.uuid, result, visiting)
+        visiting.discard(uid)
+
+    def lookup(self, index_name: str, value: Any) -> list[MxlimsImplementation]:
+        """Get objects with a given value in secondary index
+
+        :param index_name: Name of index, e.g. 'barcode'
+        :param value: Value to look for. For dictionary-valued fields (e.g.
+            'identifiers') a (key, value) tuple
+        :return: List of objects, in registration order
+        """
+        objects = self.objects
+        result = []
+        for uid in self.indexes[index_name].lookup(value):
+            obj = objects.get(uid)
+            if obj is not None:
+                result.append(obj)
+        return result
+
+    def query(
+        self,
+        mxlims_type: Optional[str] = None,
+        basetypename: Optional[str] = None,
+        use_indexes: bool = True,
+    ) -> Query:
+        """Start a query over objects in the snapshot, refined with Query.where()
+
+        :param mxlims_type: Type name of objects, e.g. 'CollectionSweep'
+        :param basetypename: Name of core type of objects, e.g. 'Dataset'
+        :param use_indexes: If False, always scan all objects of the type
+        :return: Query, matching all objects of the type
+        """
+        from .MxlimsQuery import Query
+
+        return Query(self, mxlims_type, basetypename, use_indexes=use_indexes)
+
+    def check_integrity(
+        self, objects: Optional[Sequence[MxlimsImplementation]] = None
+    ) -> IntegrityReport:
+        """Check that all foreign-key links resolve to objects of allowed types,
+        and agree with the reverse-link index
+
+        :param objects: Objects to check links from. Defaults to all objects
+        :return: IntegrityReport, listing missing and wrong-type link targets,
+            and reverse-link index errors
+        """
+        from .LinkIntegrity import check_integrity
+
+        return check_integrity(self, objects)
+
+
+class _SnapshotMapping(Mapping):
+    """Read-only mapping giving the entries of a store dictionary at snapshot time"""
+
+    __slots__ = ("_snapshot", "_container", "_is_objects")
+
+    def __init__(
+        self, snapshot: StoreSnapshot, container: dict, is_objects: bool
+    ) -> None:
+        self._snapshot = snapshot
+        self._container = container
+        # True for {uuid: object} dictionaries, whose values are given as
+        # read-only copies; otherwise values are dictionaries used as sets
+        self._is_objects = is_objects
+
+    def _convert(self, value: Any) -> Any:
+        if self._is_objects:
+            return self._snapshot._view(value)
+        return dict.fromkeys(value)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self._snapshot._get(self._container, key)
+        if value is MISSING:
+            raise KeyError(key)
+        return self._convert(value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._snapshot._get(self._container, key)
+        if value is MISSING:
+            return default
+        return self._convert(value)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._snapshot._get(self._container, key) is not MISSING
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return (key for key, _ in self._snapshot._iter(self._container))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._snapshot._iter(self._container))
+
+    def values(self) -> Iterator[Any]:
+        convert = self._convert
+        return (convert(value) for _, value in self._snapshot._iter(self._container))
+
+    def items(self) -> Iterator[tuple[Hashable, Any]]:
+        convert = self._convert
+        return (
+            (key, convert(value))
+            for key, value in self._snapshot._iter(self._container)
+        )
+
+
+class _SnapshotIndex(object):
+    """Secondary index as it was at snapshot time, for lookup only"""
+
+    def __init__(self, snapshot: StoreSnapshot, index: SecondaryIndex) -> None:
+        self._snapshot = snapshot
+        self._uuids_by_key = index.uuids_by_key
+        self.path = index.path
+        self.field_name = index.field_name
+
+    def lookup(self, key: Hashable) -> list:
+        """Get list of uuids for objects with index value key"""
+        value = self._snapshot._get(self._uuids_by_key, key)
+        if value is MISSING:
+            return []
+        return list(value)
+
+
+def copy_values(values: dict) -> dict:
+    """Copy field values, including the UuidSets that are modified in place"""
+    result = dict(values)
+    for key, val in result.items():
+        if isinstance(val, UuidSet):
+            result[key] = val.copy()
+    return result
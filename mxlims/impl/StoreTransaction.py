@@ -0,0 +1,151 @@
+# encoding: utf-8
+""" Journal for transactional updates of an MxlimsStore
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+from typing import Any, TYPE_CHECKING
+
+from .LinkSpecification import LINK_ID_FIELDS_N1, LINK_ID_FIELDS_NN
+
+if TYPE_CHECKING:
+    from .MxlimsImplementation import MxlimsImplementation
+    from .MxlimsStore import MxlimsStore
+
+
+class StoreTransaction(object):
+    """Journal of changes made to an MxlimsStore inside store.transaction()
+
+    Records the value of each field before its first change, and the objects
+    registered and discarded, so that the changes can be rolled back.
+    Index updates for changed fields are deferred, and done once per field
+    when the transaction is committed, or when the indices are next read,
+    except in thread-safe stores, where they are done at once.
+    Objects are identified by id(), as the journal keeps them alive.
+    """
+
+    def __init__(self, store: MxlimsStore) -> None:
+        self.store = store
+        # {(id(obj), field name): (obj, field name, value at transaction start)}
+        self.originals: dict[tuple[int, str], tuple] = {}
+        # {(id(obj), field name): (obj, field name, value reflected in indices)}
+        self.pending: dict[tuple[int, str], tuple] = {}
+        # {id(obj): obj} for objects registered during the transaction
+        self.created: dict[int, MxlimsImplementation] = {}
+        # Objects, present at transaction start, discarded during the transaction
+        self.discarded: list[MxlimsImplementation] = []
+        # {uuid: None} for objects registered lazily during the transaction
+        self.lazy: dict[Any, None] = {}
+
+    def is_indexed(self, obj: MxlimsImplementation, name: str) -> bool:
+        """Does changing field name of obj require index updates?"""
+        basetypename = obj.mxlims_base_type
+        return (
+            name in LINK_ID_FIELDS_N1[basetypename]
+            or name in LINK_ID_FIELDS_NN[basetypename]
+            or name in self.store._indexes_by_field
+        )
+
+    def needs_record(self, obj: MxlimsImplementation, name: str) -> bool:
+        """Must the current value of field name be recorded before changing it?"""
+        key = (id(obj), name)
+        return (key not in self.originals and key[0] not in self.created) or (
+            key not in self.pending and self.is_indexed(obj, name)
+        )
+
+    def record(self, obj: MxlimsImplementation, name: str, old_value: Any) -> None:
+        """Record value of field name of obj before it was changed. Called
+        after the change
+
+        Values after the first change of each field are ignored.
+
+        :param obj: Changed object
+        :param name: Name of changed field
+        :param old_value: Value before the change. Must not be modified later
+        :return: None
+        """
+        key = (id(obj), name)
+        if key not in self.originals and key[0] not in self.created:
+            self.originals[key] = (obj, name, old_value)
+        if key not in self.pending and self.is_indexed(obj, name):
+            self.pending[key] = (obj, name, old_value)
+            if self.store.thread_safe:
+                # Done at once, under the lock held for the change, as other
+                # threads read the indices without flushing this transaction
+                self.flush()
+
+    def add_created(self, obj: MxlimsImplementation) -> None:
+        """Record registration of obj"""
+        self.created[id(obj)] = obj
+
+    def add_lazy(self, uid: Any) -> None:
+        """Record lazy registration of object uid"""
+        self.lazy[uid] = None
+
+    def add_discarded(self, obj: MxlimsImplementation) -> None:
+        """Record that obj was discarded"""
+        if self.created.pop(id(obj), None) is None:
+            self.discarded.append(obj)
+
+    def flush(self) -> None:
+        """Bring indices up to date with the changes made so far"""
+        store = self.store
+        changes = list(self.pending.values())
+        self.pending.clear()
+        for obj, name, old_value in changes:
+            if not store.is_registered(obj):
+                continue
+            basetypename = obj.mxlims_base_type
+            myuid = obj.uuid
+            value = getattr(obj, name)
+            if name in LINK_ID_FIELDS_N1[basetypename]:
+                if value != old_value:
+                    store._remove_index_entry(basetypename, name, old_value, myuid)
+                    store._add_index_entry(basetypename, name, value, myuid)
+            elif name in LINK_ID_FIELDS_NN[basetypename]:
+                old_value = old_value or ()
+                value = value or ()
+                for uid in old_value:
+                    if uid not in value:
+                        store._remove_index_entry(basetypename, name, uid, myuid)
+                for uid in value:
+                    if uid not in old_value:
+                        store._add_index_entry(basetypename, name, uid, myuid)
+            for index in store._indexes_by_field.get(name, ()):
+                index.add(obj)
+
+    def rollback(self) -> None:
+        """Restore the store to its state at the start of the transaction
+
+        Must be called with the transaction already detached from the store,
+        so that the restoring changes are not journaled.
+        """
+        store = self.store
+        self.flush()
+        for obj, name, old_value in reversed(list(self.originals.values())):
+            setattr(obj, name, old_value)
+        for obj in reversed(list(self.created.values())):
+            if store.is_registered(obj):
+                store.discard(obj)
+        for uid in self.lazy:
+            store._discard_lazy(uid)
+        for obj in self.discarded:
+            store.register(obj)
@@ -0,0 +1,180 @@
+# encoding: utf-8
+""" Insertion-ordered set of uuids, for n..n foreign-key link fields
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+from __future__ import annotations
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import weakref
+from collections.abc import MutableSet
+from typing import Any, Iterable, Iterator, Optional
+from uuid import UUID
+
+from pydantic import GetCoreSchemaHandler
+from pydantic_core import SchemaSerializer, core_schema
+
+_LIST_SCHEMA = core_schema.list_schema(core_schema.uuid_schema())
+_SERIALIZATION_SCHEMA = core_schema.plain_serializer_function_ser_schema(
+    list, return_schema=_LIST_SCHEMA
+)
+
+
+class UuidSet(MutableSet):
+    """Insertion-ordered set of UUIDs, with O(1) membership, append and remove
+
+    Used for n..n foreign-key fields like Job.input_data_ids.
+    Validates from, and serialises to, a list of UUIDs, and compares equal
+    to lists and tuples with the same elements in the same order.
+
+    A set held in a link id field of an object is attached to it, and changes
+    to the set are made through the object, as for job.append_input_data(),
+    so that the store indices, transactions, snapshots, and change events
+    are kept up to date. Copies are not attached.
+    """
+
+    __slots__ = ("_data", "_owner")
+
+    def __init__(self, values: Iterable[UUID] = ()) -> None:
+        self._data: dict[UUID, None] = dict.fromkeys(values)
+        # (weak reference to object, field name) for the field holding the set
+        self._owner: Optional[tuple[weakref.ref, str]] = None
+
+    def __contains__(self, value: Any) -> bool:
+        return value in self._data
+
+    def __iter__(self) -> Iterator[UUID]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"UuidSet({list(self._data)!r})"
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, UuidSet):
+            return list(self._data) == list(other._data)
+        elif isinstance(other, (list, tuple)):
+            return list(self._data) == list(other)
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def __copy__(self) -> UuidSet:
+        return self.copy()
+
+    def __deepcopy__(self, memo: dict) -> UuidSet:
+        return self.copy()
+
+    def __reduce__(self) -> tuple:
+        return UuidSet, (list(self._data),)
+
+    def _attach(self, obj: Any, name: str) -> None:
+        """Attach set to field name of obj, which holds it
+
+        Called by MxlimsImplementation; obj must implement
+        _append_link_uid and _remove_link_uid
+        """
+        self._owner = (weakref.ref(obj), name)
+
+    def _get_owner(self) -> Optional[tuple[Any, str]]:
+        """Get (object, field name) for the field holding the set, if any"""
+        owner = self._owner
+        if owner is not None:
+            obj = owner[0]()
+            if obj is not None and obj.__dict__.get(owner[1]) is self:
+                return obj, owner[1]
+            # Replaced in, or gone with, the object
+            self._owner = None
+        return None
+
+    def add(self, value: UUID) -> None:
+        """Add value at the end, if not already present"""
+        if value not in self._data:
+            owner = self._get_owner()
+            if owner is None:
+                self._data[value] = None
+            else:
+                owner[0]._append_link_uid(owner[1], value)
+
+    def discard(self, value: UUID) -> None:
+        """Remove value, if present"""
+        if value in self._data:
+            owner = self._get_owner()
+            if owner is None:
+                del self._data[value]
+            else:
+                owner[0]._remove_link_uid(owner[1], value)
+
+    def append(self, value: UUID) -> None:
+        """Add value at the end. Raises ValueError if already present"""
+        if value in self._data:
+            raise ValueError(f"{value} is already present")
+        self.add(value)
+
+    def extend(self, values: Iterable[UUID]) -> None:
+        """Add values at the end, skipping those already present"""
+        for value in values:
+            self.add(value)
+
+    def remove(self, value: UUID) -> None:
+        """Remove value. Raises ValueError if not present"""
+        if value not in self._data:
+            raise ValueError(f"{value} is not present")
+        self.discard(value)
+
+    def clear(self) -> None:
+        for value in list(self._data):
+            self.discard(value)
+
+    def copy(self) -> UuidSet:
+        """Get copy of set, not attached to any object"""
+        return UuidSet(self._data)
+
+    def _add(self, value: UUID) -> None:
+        """Add value, bypassing the object holding the set. For its use only"""
+        self._data[value] = None
+
+    def _discard(self, value: UUID) -> None:
+        """Remove value, bypassing the object holding the set. For its use only"""
+        self._data.pop(value, None)
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        return core_schema.no_info_after_validator_function(
+            cls,
+            core_schema.no_info_before_validator_function(_to_list, _LIST_SCHEMA),
+            serialization=_SERIALIZATION_SCHEMA,
+        )
+
+
+# Used when the serialiser type is inferred from the value, e.g. with serialize_as_any
+UuidSet.__pydantic_serializer__ = SchemaSerializer(
+    core_schema.any_schema(serialization=_SERIALIZATION_SCHEMA)
+)
+
+
+def _to_list(value: Any) -> Any:
+    """Convert UuidSet to list before validation"""
+    if isinstance(value, UuidSet):
+        return list(value)
+    return value
@@ -383,7 +383,7 @@ from ..data.{classname}Data import {classname}Data
                 txtlist.append("    from typing_extensions import Self\n")
 
         txtlist.append(f'''
-class {classname}({classname}Data, MxlimsObject):
+class {classname}(MxlimsObject, {classname}Data):
     """MXLIMS pydantic model class for {classname}
     """
 '''
@@ -424,7 +424,11 @@ class {classname}({classname}Data, MxlimsObject):
         lines = text1.splitlines()
         for ii in range(len(lines)):
             if "list[UUID]" in lines[ii]:
-                lines[ii+1] = lines[ii+1].replace("None", "default_factory=list")
+                # n..n foreign keys are held in insertion-ordered sets
+                lines[ii] = lines[ii].replace("list[UUID]", "UuidSet")
+                lines[ii+1] = lines[ii+1].replace("None", "default_factory=UuidSet")
+                if "UuidSet" not in txtlist[0]:
+                    txtlist[0] += "from mxlims.impl.UuidSet import UuidSet\n"
         txtlist.append("\n".join(lines))
         fp1.unlink()
 
@@ -467,6 +471,26 @@ class {classname}({classname}Data, MxlimsObject):
 """
             )
 
+        elif corename == "LogisticalSample":
+            txtlist.append(
+'''
+    def ancestors(self) -> list[LogisticalSample]:
+        """Containers of this object, innermost first. Cached in the store"""
+        return self.mxlims_store.get_ancestors(self)
+
+    def containment_path(self) -> list[LogisticalSample]:
+        """Containers of this object, outermost first, followed by the object"""
+        result = self.mxlims_store.get_ancestors(self)
+        result.reverse()
+        result.append(self)
+        return result
+
+    def descendants(self) -> list[LogisticalSample]:
+        """Objects contained in this object, recursively, depth first. Cached in the store"""
+        return self.mxlims_store.get_descendants(self)
+'''
+            )
+
     else:
 
         # Add top imports
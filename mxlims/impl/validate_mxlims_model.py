@@ -23,7 +23,6 @@ __license__ = "LGPLv3+"
 __author__ = "Rasmus H Fogh"
 
 
-import json
 import jsonschema
 from pathlib import Path
 from referencing import Registry, Resource
@@ -32,6 +31,7 @@ import traceback
 
 MXLIMS_DIR = Path(__file__).parent.parent
 from mxlims import __version__ as VERSION
+from mxlims.impl.JsonBackend import get_json_backend
 
 def create_registry_from_directory(
         schema_dir=None, base_uri="https://mxlims.org/schemas/"
@@ -46,8 +46,7 @@ def create_registry_from_directory(
 
     # Use rglob to recursively find all .json files
     for schema_file in schema_dir.rglob("*.json"):
-        with open(schema_file, 'r') as f:
-            schema = json.load(f)
+        schema = get_json_backend().loads(schema_file.read_bytes())
 
         # Get relative path with forward slashes
         relative_path = schema_file.relative_to(schema_dir)
@@ -126,8 +125,13 @@ def test_valid(
     schemafile = Path(__file__).resolve().parent.parent / "schemas" / typdir / schemaname
     validity = (valstr == "valid")
     try:
-        schema = json.load(open(schemafile))
-        jsonschema.validate(instance=json.load(open(fpath)), schema=schema, registry=registry)
+        backend = get_json_backend()
+        schema = backend.loads(schemafile.read_bytes())
+        jsonschema.validate(
+            instance=backend.loads(Path(fpath).read_bytes()),
+            schema=schema,
+            registry=registry,
+        )
     except jsonschema.SchemaError as e:
         print("\nSCHEMA Error")
         print(traceback.format_exc())
@@ -7,12 +7,13 @@ from typing import Literal, TYPE_CHECKING
 from uuid import UUID, uuid1
 from mxlims.core.MxlimsObject import MxlimsObject
 from ..data.JobData import JobData
+from mxlims.impl.UuidSet import UuidSet
 if TYPE_CHECKING:
     from .Dataset import Dataset
     from .LogisticalSample import LogisticalSample
     from .Sample import Sample
 
-class Job(JobData, MxlimsObject):
+class Job(MxlimsObject, JobData):
     """MXLIMS pydantic model class for Job
     """
 
@@ -53,20 +54,20 @@ class Job(JobData, MxlimsObject):
         description="uuid for LogisticalSample related to Job",
         title="LogisticalSampleId",
     )
-    reference_data_ids: list[UUID] | None = Field(
-        default_factory=list,
+    reference_data_ids: UuidSet | None = Field(
+        default_factory=UuidSet,
         alias="referenceDataIds",
         description="uuid for reference Datasets",
         title="ReferenceDataId",
     )
-    template_data_ids: list[UUID] | None = Field(
-        default_factory=list,
+    template_data_ids: UuidSet | None = Field(
+        default_factory=UuidSet,
         alias="templateDataIds",
         description="uuid for template Datasets",
         title="TemplateDataId",
     )
-    input_data_ids: list[UUID] | None = Field(
-        default_factory=list,
+    input_data_ids: UuidSet | None = Field(
+        default_factory=UuidSet,
         alias="inputDataIds",
         description="uuid for input Datasets",
         title="InputDataId",
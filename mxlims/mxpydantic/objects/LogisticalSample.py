@@ -12,7 +12,7 @@ if TYPE_CHECKING:
     from .Job import Job
     from .Sample import Sample
 
-class LogisticalSample(LogisticalSampleData, MxlimsObject):
+class LogisticalSample(MxlimsObject, LogisticalSampleData):
     """MXLIMS pydantic model class for LogisticalSample
     """
 
@@ -74,3 +74,18 @@ class LogisticalSample(LogisticalSampleData, MxlimsObject):
     def sample(self) -> Sample | None:
         """Abstract superclass - dummy getter for LogisticalSample.sample"""
         return None
+
+    def ancestors(self) -> list[LogisticalSample]:
+        """Containers of this object, innermost first. Cached in the store"""
+        return self.mxlims_store.get_ancestors(self)
+
+    def containment_path(self) -> list[LogisticalSample]:
+        """Containers of this object, outermost first, followed by the object"""
+        result = self.mxlims_store.get_ancestors(self)
+        result.reverse()
+        result.append(self)
+        return result
+
+    def descendants(self) -> list[LogisticalSample]:
+        """Objects contained in this object, recursively, depth first. Cached in the store"""
+        return self.mxlims_store.get_descendants(self)
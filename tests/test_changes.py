@@ -0,0 +1,129 @@
+# encoding: utf-8
+""" Tests for change checkpoints and incremental message export
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import json
+
+import pytest
+
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.messages.MxlimsMessage import MxlimsMessage
+from mxlims.mxpydantic.messages.MxlimsMessageStrict import MxlimsMessageStrict
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.MxProcessing import MxProcessing
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+
+
+@pytest.fixture
+def processing_store():
+    """Store with pucks, pins, a sweep per pin, and jobs using the sweeps"""
+    with MxlimsStore() as store:
+        pucks = list(Puck(barcode=f"K{ind}") for ind in range(3))
+        pins = list(
+            Pin(barcode=f"P{ind}", container_id=pucks[ind % 3].uuid)
+            for ind in range(6)
+        )
+        sweeps = list(CollectionSweep(logistical_sample_id=pin.uuid) for pin in pins)
+        jobs = list(
+            MxProcessing(input_data_ids=[sweep.uuid for sweep in sweeps[ind::3]])
+            for ind in range(3)
+        )
+        yield store, pucks, pins, sweeps, jobs
+
+
+def test_changed_since(processing_store):
+    store, pucks, pins, sweeps, jobs = processing_store
+    with pytest.raises(ValueError):
+        store.changed_since(0)
+    checkpoint = store.checkpoint()
+    assert store.changed_since(checkpoint) == []
+    # Field change, link change, and addition
+    jobs[1].job_status = "Completed"
+    pins[2].container = pucks[0]
+    new_pin = Pin(barcode="new")
+    assert store.changed_since(checkpoint) == [jobs[1], pins[2], new_pin]
+    checkpoint2 = store.checkpoint()
+    jobs[1].job_status = "Failed"
+    assert store.changed_since(checkpoint2) == [jobs[1]]
+    # In order of last change
+    assert store.changed_since(checkpoint) == [pins[2], new_pin, jobs[1]]
+    # Deleted objects are left out, also if changed before;
+    # the sweep link to the deleted pin is nullified
+    store.delete(new_pin)
+    store.delete(pins[2])
+    assert sweeps[2].logistical_sample_id is None
+    assert store.changed_since(checkpoint) == [jobs[1], sweeps[2]]
+    assert store.changed_since(checkpoint2) == [jobs[1], sweeps[2]]
+    with pytest.raises(ValueError):
+        store.changed_since(checkpoint2 + 10)
+
+
+def test_changes_in_transactions(processing_store):
+    store, pucks, pins, sweeps, jobs = processing_store
+    checkpoint = store.checkpoint()
+    with pytest.raises(KeyError):
+        with store.transaction():
+            pins[0].barcode = "changed"
+            Pin(barcode="new")
+            raise KeyError("rollback")
+    assert store.changed_since(checkpoint) == []
+    with store.transaction():
+        pins[0].barcode = "changed"
+        new_pin = Pin(barcode="new")
+    assert store.changed_since(checkpoint) == [pins[0], new_pin]
+
+
+@pytest.mark.parametrize("cls", [MxlimsMessage, MxlimsMessageStrict])
+def test_export_since(processing_store, tmp_path, cls):
+    store, pucks, pins, sweeps, jobs = processing_store
+    message = cls.from_pydantic_objects(pucks + pins + sweeps + jobs)
+    checkpoint = store.checkpoint()
+    jobs[1].job_status = "Completed"
+    pins[2].container = pucks[0]
+    new_pin = Pin(barcode="new")
+    message.export_message(tmp_path / "full.json")
+    message.export_message(tmp_path / "changed.json", since=checkpoint, store=store)
+    full = json.loads((tmp_path / "full.json").read_text())
+    changed = json.loads((tmp_path / "changed.json").read_text())
+    assert len(full["Pin"]) == 6
+    # Only the changed objects in the message; new_pin is not in it
+    exported = set(
+        obj["uuid"]
+        for tag, objdict in changed.items()
+        if tag != "version"
+        for obj in objdict.values()
+        if "mxlimsType" in obj
+    )
+    assert exported == {str(pins[2].uuid), str(jobs[1].uuid)}
+    assert str(new_pin.uuid) not in (tmp_path / "changed.json").read_text()
+    if cls is MxlimsMessage:
+        # Links to unchanged objects are written as stubs
+        stubs = set(obj["uuid"] for obj in changed["LogisticalSample"].values())
+        assert stubs == {str(pucks[0].uuid)}
+        assert len(changed["Dataset"]) == 2
+    # The current store is used by default
+    with store.activate():
+        message.export_message(tmp_path / "changed2.json", since=checkpoint)
+    assert (tmp_path / "changed2.json").read_text() == (
+        tmp_path / "changed.json"
+    ).read_text()
@@ -0,0 +1,125 @@
+# encoding: utf-8
+""" Tests for LogisticalSample containment, and its cache in MxlimsStore
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import pytest
+
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.objects.Crystal import Crystal
+from mxlims.mxpydantic.objects.Dewar import Dewar
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+from mxlims.mxpydantic.objects.Shipment import Shipment
+
+
+@pytest.fixture
+def containers():
+    """Shipment > Dewar > Puck > Pin > Crystal, and an empty Puck"""
+    with MxlimsStore() as store:
+        shipment = Shipment(proposal_code="mx1234")
+        dewar = Dewar(container_id=shipment.uuid)
+        puck = Puck(container_id=dewar.uuid)
+        pin = Pin(container_id=puck.uuid)
+        crystal = Crystal(container_id=pin.uuid)
+        puck2 = Puck(container_id=dewar.uuid)
+        yield store, (shipment, dewar, puck, pin, crystal, puck2)
+
+
+def test_ancestors_and_descendants(containers):
+    store, (shipment, dewar, puck, pin, crystal, puck2) = containers
+    assert crystal.ancestors() == [pin, puck, dewar, shipment]
+    assert pin.containment_path() == [shipment, dewar, puck, pin]
+    assert dewar.descendants() == [puck, pin, crystal, puck2]
+    assert shipment.ancestors() == []
+
+
+def test_ancestors_of_discarded_object(containers):
+    store, (shipment, dewar, puck, pin, crystal, puck2) = containers
+    store.discard(pin)
+    assert pin.ancestors() == [puck, dewar, shipment]
+    assert pin.containment_path() == [shipment, dewar, puck, pin]
+    assert pin.descendants() == [crystal]
+    # Crystal is still in the store, and its container is not
+    assert crystal.ancestors() == []
+    assert puck.descendants() == []
+
+
+def test_ancestors_after_close(containers):
+    store, (shipment, dewar, puck, pin, crystal, puck2) = containers
+    store.close()
+    assert pin.ancestors() == []
+    assert pin.containment_path() == [pin]
+    assert dewar.descendants() == []
+
+
+def test_caches_follow_container_changes(containers):
+    store, (shipment, dewar, puck, pin, crystal, puck2) = containers
+    # Fill the caches
+    assert crystal.ancestors() == [pin, puck, dewar, shipment]
+    assert dewar.descendants() == [puck, pin, crystal, puck2]
+    assert puck2.descendants() == []
+    pin.container_id = puck2.uuid
+    assert crystal.ancestors() == [pin, puck2, dewar, shipment]
+    assert puck.descendants() == []
+    assert puck2.descendants() == [pin, crystal]
+    assert dewar.descendants() == [puck, puck2, pin, crystal]
+    pin.container = None
+    assert crystal.ancestors() == [pin]
+    assert dewar.descendants() == [puck, puck2]
+    # Moving a container moves its contents
+    pin.container = puck
+    dewar.container = None
+    assert crystal.ancestors() == [pin, puck, dewar]
+    assert shipment.descendants() == []
+
+
+def test_caches_after_delete(containers):
+    store, (shipment, dewar, puck, pin, crystal, puck2) = containers
+    assert crystal.ancestors() == [pin, puck, dewar, shipment]
+    assert shipment.descendants() == [dewar, puck, pin, crystal, puck2]
+    store.delete(puck)
+    # The link from the pin to the deleted puck is nullified
+    assert crystal.ancestors() == [pin]
+    assert shipment.descendants() == [dewar, puck2]
+    store.delete(dewar, cascade="contents")
+    assert shipment.descendants() == []
+    assert not store.is_registered(puck2)
+
+
+def test_caches_after_rollback(containers):
+    store, (shipment, dewar, puck, pin, crystal, puck2) = containers
+    assert crystal.ancestors() == [pin, puck, dewar, shipment]
+    assert dewar.descendants() == [puck, pin, crystal, puck2]
+    with pytest.raises(KeyError):
+        with store.transaction():
+            pin.container = puck2
+            Pin(container_id=puck2.uuid)
+            store.delete(dewar)
+            assert crystal.ancestors() == [pin, puck2]
+            raise KeyError("rollback")
+    assert crystal.ancestors() == [pin, puck, dewar, shipment]
+    # Rollback restores the links, but not the order of the reverse links
+    assert set(obj.uuid for obj in dewar.descendants()) == set(
+        obj.uuid for obj in (puck, pin, crystal, puck2)
+    )
+    assert puck.descendants() == [pin, crystal]
+    assert puck2.descendants() == []
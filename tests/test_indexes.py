@@ -0,0 +1,104 @@
+# encoding: utf-8
+""" Tests for secondary field-value indices
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import pytest
+
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.datatypes.TrackingDevice import TrackingDevice
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.Dewar import Dewar
+from mxlims.mxpydantic.objects.Puck import Puck
+
+
+@pytest.fixture
+def store():
+    with MxlimsStore() as store:
+        yield store
+
+
+def test_reassign_field(store):
+    puck = Puck(barcode="K1")
+    puck2 = Puck(barcode="K1")
+    assert store.lookup("barcode", "K1") == [puck, puck2]
+    puck.barcode = "K2"
+    assert store.lookup("barcode", "K1") == [puck2]
+    assert store.lookup("barcode", "K2") == [puck]
+    puck.barcode = None
+    assert store.lookup("barcode", "K2") == []
+    assert puck.uuid not in store.indexes["barcode"].keys_by_uuid
+
+
+def test_reassign_dictionary_field(store):
+    puck = Puck(identifiers={"esrf.fr": "12", "diamond.ac.uk": "A7"})
+    assert store.lookup("identifiers", ("esrf.fr", "12")) == [puck]
+    puck.identifiers = {"esrf.fr": "13"}
+    assert store.lookup("identifiers", ("esrf.fr", "12")) == []
+    assert store.lookup("identifiers", ("diamond.ac.uk", "A7")) == []
+    assert store.lookup("identifiers", ("esrf.fr", "13")) == [puck]
+    # Changes inside the value are found only after reindexing
+    puck.identifiers["esrf.fr"] = "14"
+    assert store.lookup("identifiers", ("esrf.fr", "14")) == []
+    store.reindex(puck)
+    assert store.lookup("identifiers", ("esrf.fr", "13")) == []
+    assert store.lookup("identifiers", ("esrf.fr", "14")) == [puck]
+
+
+def test_reassign_nested_field(store):
+    dewar = Dewar(tracking_device=TrackingDevice(identifier="T1", device_type="AirTag"))
+    assert store.lookup("tracking_device", "T1") == [dewar]
+    dewar.tracking_device = TrackingDevice(identifier="T2", device_type="AirTag")
+    assert store.lookup("tracking_device", "T1") == []
+    assert store.lookup("tracking_device", "T2") == [dewar]
+    dewar.tracking_device = None
+    assert store.lookup("tracking_device", "T2") == []
+
+
+def test_added_index(store):
+    sweeps = list(CollectionSweep(energy=12000.0 + ind % 2) for ind in range(4))
+    # Existing objects are indexed when the index is added
+    store.add_index("energy", "energy")
+    assert store.lookup("energy", 12001.0) == sweeps[1::2]
+    sweeps[1].energy = 12000.0
+    # In the order indexed
+    assert store.lookup("energy", 12000.0) == [sweeps[0], sweeps[2], sweeps[1]]
+    assert store.lookup("energy", 12001.0) == [sweeps[3]]
+    with pytest.raises(ValueError):
+        store.add_index("energy", "energy")
+
+
+def test_rollback_and_delete(store):
+    puck = Puck(barcode="K1", identifiers={"esrf.fr": "12"})
+    with pytest.raises(KeyError):
+        with store.transaction():
+            puck.barcode = "K2"
+            puck.identifiers = {"esrf.fr": "13"}
+            # Indices are brought up to date when read inside the transaction
+            assert store.lookup("barcode", "K2") == [puck]
+            raise KeyError("rollback")
+    assert store.lookup("barcode", "K1") == [puck]
+    assert store.lookup("barcode", "K2") == []
+    assert store.lookup("identifiers", ("esrf.fr", "12")) == [puck]
+    assert store.lookup("identifiers", ("esrf.fr", "13")) == []
+    store.delete(puck)
+    assert store.lookup("barcode", "K1") == []
+    assert store.lookup("identifiers", ("esrf.fr", "12")) == []
@@ -0,0 +1,182 @@
+# encoding: utf-8
+""" Tests for link integrity checking
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import uuid
+
+import pytest
+
+from mxlims.impl.LinkIntegrity import IndexMismatch, LinkError
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.impl.SqliteStore import SqliteStore
+from mxlims.impl.UuidSet import UuidSet
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.Dewar import Dewar
+from mxlims.mxpydantic.objects.MxProcessing import MxProcessing
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+
+CONTAINER = ("LogisticalSample", "container_id")
+
+
+def make_objects():
+    """Dewar, puck, two pins, a sweep per pin, and a job using the sweeps"""
+    dewar = Dewar()
+    puck = Puck(container_id=dewar.uuid)
+    pins = list(Pin(container_id=puck.uuid) for _ in range(2))
+    sweeps = list(CollectionSweep(logistical_sample_id=pin.uuid) for pin in pins)
+    job = MxProcessing(input_data_ids=[sweep.uuid for sweep in sweeps])
+    return dewar, puck, pins, sweeps, job
+
+
+@pytest.fixture
+def objects():
+    with MxlimsStore() as store:
+        yield store, make_objects()
+
+
+def test_valid_store(objects):
+    store, (dewar, puck, pins, sweeps, job) = objects
+    report = store.check_integrity()
+    assert report
+    assert report.errors == []
+    assert (report.object_count, report.link_count) == (7, 7)
+    assert repr(report) == (
+        "<IntegrityReport: 7 links from 7 objects, 0 missing, 0 wrong type, "
+        "0 index errors>"
+    )
+
+
+def test_missing_and_wrong_type(objects):
+    store, (dewar, puck, pins, sweeps, job) = objects
+    missing_uid = uuid.uuid4()
+    pins[0].container_id = missing_uid
+    # Pins go in Pucks, not Dewars
+    pins[1].container_id = dewar.uuid
+    report = store.check_integrity()
+    assert not report
+    assert report.missing == [
+        LinkError("Pin", pins[0].uuid, "container_id", missing_uid, None)
+    ]
+    assert report.wrong_type == [
+        LinkError("Pin", pins[1].uuid, "container_id", dewar.uuid, "Dewar")
+    ]
+    assert report.index_errors == []
+    assert "1 missing, 1 wrong type, 0 index errors" in repr(report)
+    lines = report.summary().splitlines()
+    assert lines[0] == (
+        "Checked 7 links from 7 objects: 1 missing targets, "
+        "1 targets of wrong type, 0 index errors"
+    )
+    assert lines[2] == (
+        f"Pin {pins[1].uuid}: container_id links to object of wrong type "
+        f"Dewar {dewar.uuid}"
+    )
+    # Only the links from the objects given are checked
+    assert store.check_integrity([pins[1], job]).errors == report.wrong_type
+
+
+def test_corrupt_foreign_key(objects):
+    store, (dewar, puck, pins, sweeps, job) = objects
+    missing_uid = uuid.uuid4()
+    # Set without updating the reverse-link index
+    pins[0].__dict__["container_id"] = missing_uid
+    report = store.check_integrity()
+    assert report.missing == [
+        LinkError("Pin", pins[0].uuid, "container_id", missing_uid, None)
+    ]
+    assert report.index_errors == [
+        IndexMismatch(
+            "LogisticalSample", pins[0].uuid, "container_id", missing_uid, "unindexed"
+        ),
+        IndexMismatch(
+            "LogisticalSample", pins[0].uuid, "container_id", puck.uuid, "stale"
+        ),
+    ]
+    assert str(report.index_errors[1]) == (
+        f"LogisticalSample {pins[0].uuid}: container_id "
+        f"reverse-link index entry for {puck.uuid} without link"
+    )
+
+
+def test_corrupt_reverse_link_index(objects):
+    store, (dewar, puck, pins, sweeps, job) = objects
+    index = store.links_to[CONTAINER]
+    del index[puck.uuid][pins[1].uuid]
+    index[dewar.uuid][pins[0].uuid] = None
+    input_index = store.links_to[("Job", "input_data_ids")]
+    del input_index[sweeps[0].uuid]
+    report = store.check_integrity()
+    assert report.missing == report.wrong_type == []
+    assert report.index_errors == [
+        IndexMismatch(
+            "LogisticalSample", pins[1].uuid, "container_id", puck.uuid, "unindexed"
+        ),
+        IndexMismatch("Job", job.uuid, "input_data_ids", sweeps[0].uuid, "unindexed"),
+        IndexMismatch(
+            "LogisticalSample", pins[0].uuid, "container_id", dewar.uuid, "stale"
+        ),
+    ]
+    assert "3 index errors" in repr(report)
+    # Stale entries are found only when checking all objects
+    assert store.check_integrity([pins[0], pins[1]]).index_errors == [
+        report.index_errors[0]
+    ]
+
+
+def test_detached_link_set(objects):
+    store, (dewar, puck, pins, sweeps, job) = objects
+    # Same links, in a set that changes would bypass the store through
+    job.__dict__["input_data_ids"] = UuidSet(job.input_data_ids)
+    report = store.check_integrity()
+    assert report.index_errors == [
+        IndexMismatch("Job", job.uuid, "input_data_ids", None, "detached")
+    ]
+    assert str(report.index_errors[0]) == (
+        f"Job {job.uuid}: input_data_ids link set not attached to object"
+    )
+
+
+def test_lazy_objects():
+    with MxlimsStore() as store:
+        puck = Puck()
+        uid = store.register_lazy(
+            Pin, {"uuid": str(uuid.uuid4()), "containerId": str(puck.uuid)}
+        )
+        # Links from lazily registered objects are in the index
+        report = store.check_integrity([puck])
+        assert report and uid in store._lazy
+        report = store.check_integrity()
+        assert report and (report.object_count, report.link_count) == (2, 1)
+        assert uid not in store._lazy
+
+
+def test_sqlite_store(tmp_path):
+    with SqliteStore(tmp_path / "store.sqlite") as store:
+        dewar, puck, pins, sweeps, job = make_objects()
+        assert store.check_integrity()
+        pins[1].container_id = dewar.uuid
+        report = store.check_integrity()
+        assert report.wrong_type == [
+            LinkError("Pin", pins[1].uuid, "container_id", dewar.uuid, "Dewar")
+        ]
+        assert report.index_errors == []
@@ -0,0 +1,126 @@
+# encoding: utf-8
+""" Tests for the JSON parsing backends
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import importlib
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+import mxlims
+from mxlims.impl import JsonBackend
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.messages.ShipmentMessage import ShipmentMessage
+
+MESSAGE_DIR = Path(mxlims.__file__).parent / "test" / "json" / "v0.6.13" / "messages"
+
+MESSAGE_PATHS = sorted(MESSAGE_DIR.glob("*/valid/*.json"))
+
+# JSON texts that the faster libraries read differently, or not at all
+EDGE_CASES = [
+    '{"big": 123456789012345678901234567890, "negative": -18446744073709551617}',
+    '{"limit": 18446744073709551615, "small": -9223372036854775808}',
+    '{"floats": [1e308, 1.5e-300, -0.0, 0.1, 3.0000000000000004, 1E5]}',
+    '{"special": [NaN, Infinity, -Infinity]}',
+    '{"text": "Ångström 中文 \\u00e9\\ud83d\\ude00 \\"quoted\\"\\n\\t"}',
+    '{"lone_surrogate": "\\ud800"}',
+    '{"nested": [[[[[[[[[[{"deep": [true, false, null]}]]]]]]]]]]}',
+    '{"empty": [{}, [], ""]}',
+]
+
+
+@pytest.fixture(autouse=True)
+def restore_backend():
+    backend = JsonBackend.get_json_backend()
+    yield
+    JsonBackend._backend = backend
+
+
+def as_json(value):
+    """Value as JSON text, for comparison including types and NaN"""
+    return json.dumps(value, sort_keys=True)
+
+
+@pytest.mark.parametrize("name", list(JsonBackend.BACKENDS))
+@pytest.mark.parametrize("path", MESSAGE_PATHS, ids=list(p.name for p in MESSAGE_PATHS))
+def test_messages_parse_identically(name, path):
+    backend = JsonBackend.BACKENDS[name]()
+    expected = json.loads(path.read_text())
+    assert backend.loads(path.read_bytes()) == expected
+    assert backend.loads(path.read_text()) == expected
+
+
+@pytest.mark.parametrize("name", list(JsonBackend.BACKENDS))
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_edge_cases_parse_identically(name, text):
+    backend = JsonBackend.BACKENDS[name]()
+    expected = as_json(json.loads(text))
+    assert as_json(backend.loads(text)) == expected
+    if "\\ud800" not in text:
+        # Lone surrogates cannot be encoded as UTF-8
+        assert as_json(backend.loads(text.encode())) == expected
+
+
+@pytest.mark.parametrize("name", list(JsonBackend.BACKENDS))
+def test_invalid_json(name):
+    backend = JsonBackend.BACKENDS[name]()
+    for text in ('{"a": 1', '{"a": 1,}', b'{"a": "\xff"}', ""):
+        with pytest.raises(ValueError):
+            backend.loads(text)
+
+
+@pytest.mark.parametrize("name", list(JsonBackend.BACKENDS))
+def test_load_message_with_backend(name):
+    path = MESSAGE_DIR / "ShipmentMessage" / "valid" / "plates.json"
+    with MxlimsStore():
+        expected = ShipmentMessage.from_message_file(path).model_dump()
+    assert JsonBackend.set_json_backend(name).name == name
+    assert JsonBackend.get_json_backend().name == name
+    with MxlimsStore():
+        assert ShipmentMessage.from_message_file(path).model_dump() == expected
+
+
+def test_set_json_backend():
+    assert JsonBackend.set_json_backend().name == next(iter(JsonBackend.BACKENDS))
+    with pytest.raises(ValueError, match="not available"):
+        JsonBackend.set_json_backend("simdjson")
+
+
+def test_fallback_without_optional_modules(monkeypatch):
+    # None in sys.modules makes the import fail
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    monkeypatch.setitem(sys.modules, "msgspec", None)
+    try:
+        importlib.reload(JsonBackend)
+        assert list(JsonBackend.BACKENDS) == ["json"]
+        assert JsonBackend.get_json_backend().name == "json"
+        with pytest.raises(ValueError, match="Available: json"):
+            JsonBackend.set_json_backend("orjson")
+        assert JsonBackend.get_json_backend().loads(EDGE_CASES[0]) == json.loads(
+            EDGE_CASES[0]
+        )
+    finally:
+        monkeypatch.undo()
+        importlib.reload(JsonBackend)
+    assert ("orjson" in JsonBackend.BACKENDS) == (JsonBackend.orjson is not None)
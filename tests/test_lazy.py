@@ -0,0 +1,150 @@
+# encoding: utf-8
+""" Tests for lazily registered objects
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import uuid
+from pathlib import Path
+
+import pytest
+
+import mxlims
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.messages.ShipmentMessage import ShipmentMessage
+from mxlims.mxpydantic.objects.Pin import Pin
+
+MESSAGE_PATH = (
+    Path(mxlims.__file__).parent
+    / "test"
+    / "json"
+    / "v0.6.13"
+    / "messages"
+    / "ShipmentMessage"
+    / "valid"
+    / "singlePositionPins.json"
+)
+
+# uuids of objects in the message, contained in each other from Shipment to Pin
+SHIPMENT = uuid.UUID("0196f23d-0f3c-2c96-b3d1-b908984ec709")
+DEWAR = uuid.UUID("0196f23a-dce0-2560-baac-f1b23ec9e0cb")
+PUCK = uuid.UUID("0196f23a-dce0-2560-baac-f1b23ec9e0aa")
+PIN = uuid.UUID("0196f23a-dce0-2560-baac-f1b23ec9e0dd")
+
+
+@pytest.fixture
+def lazy_store():
+    """Store with the objects of the message registered lazily"""
+    with MxlimsStore() as store:
+        uids = ShipmentMessage.load_lazy(MESSAGE_PATH)
+        assert len(uids) == 6
+        assert set(store._lazy) == set(uids)
+        assert len(store.objects) == 0
+        yield store
+
+
+def test_get(lazy_store):
+    store = lazy_store
+    pin = store.get(PIN)
+    assert isinstance(pin, Pin)
+    assert pin.mxlims_store is store
+    assert PIN not in store._lazy and store.objects[PIN] is pin
+    assert store.get(PIN, "LogisticalSample") is pin
+    # Links are followed to other lazily registered objects
+    assert pin.container.uuid == PUCK
+    assert store.get(PUCK, "Sample") is None
+    assert len(store._lazy) == 4
+    # Loading is not reported as a change
+    assert store.changed_since(store.checkpoint()) == []
+
+
+def test_query(lazy_store):
+    store = lazy_store
+    query = store.query("Pin").where("containerId", "==", PUCK)
+    pins = query.all()
+    assert list(pin.uuid for pin in pins) == [PIN]
+    # Only the objects matched through the index are created
+    assert set(store.objects) == {PIN}
+    assert store.lookup("barcode", "DLS-MX-1234")[0].uuid == DEWAR
+    assert set(store.objects) == {PIN, DEWAR}
+    assert store.query("Pin", use_indexes=False).all() == pins
+
+
+def test_get_referrers(lazy_store):
+    store = lazy_store
+    referrers = store.get_referrers("LogisticalSample", "container_id", DEWAR)
+    assert list(obj.uuid for obj in referrers) == [PUCK]
+    assert set(store.objects) == {PUCK}
+    assert store.get(PUCK).contents == [store.get(PIN)]
+
+
+def test_get_descendants(lazy_store):
+    store = lazy_store
+    shipment = store.get(SHIPMENT)
+    descendants = store.get_descendants(shipment)
+    assert list(obj.uuid for obj in descendants) == [DEWAR, PUCK, PIN]
+    assert all(store.objects[obj.uuid] is obj for obj in descendants)
+    assert store.get_ancestors(descendants[-1]) == descendants[-2::-1] + [shipment]
+
+
+def test_failed_load(lazy_store):
+    store = lazy_store
+    uid = uuid.uuid4()
+    # Invalid field value, detected only when the object is created
+    store.register_lazy(
+        Pin, {"uuid": str(uid), "containerId": str(PUCK), "positionInPuck": "top"}
+    )
+    assert uid in store.links_to["LogisticalSample", "container_id"][PUCK]
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            store.get(uid)
+        # The object is left registered lazily, and nothing else is changed
+        assert uid in store._lazy and uid not in store.objects
+        assert uid in store.links_to["LogisticalSample", "container_id"][PUCK]
+        assert len(store.objects) == 0
+    with pytest.raises(ValueError):
+        store.get(PUCK).contents
+    store.evict(uid)
+    assert uid not in store._lazy
+    assert list(pin.uuid for pin in store.get(PUCK).contents) == [PIN]
+
+
+def test_failed_message_load_rolls_back(lazy_store):
+    store = lazy_store
+    uids = set(store._lazy)
+    links = dict((key, dict(dd0)) for key, dd0 in store.links_to.items() if dd0)
+    # Loading the same objects again clashes; the clashing objects are created
+    with pytest.raises(ValueError):
+        ShipmentMessage.load_lazy(MESSAGE_PATH, uuid_clash_mode="error")
+    assert len(store.objects) + len(store._lazy) == 6
+    assert set(store.objects) | set(store._lazy) == uids
+    assert dict((key, dict(dd0)) for key, dd0 in store.links_to.items() if dd0) == links
+
+
+def test_transaction_rollback():
+    with MxlimsStore() as store:
+        with pytest.raises(KeyError):
+            with store.transaction():
+                ShipmentMessage.load_lazy(MESSAGE_PATH)
+                store.get(PIN).position_in_puck = 2
+                raise KeyError("rollback")
+        assert store._lazy == {} and len(store.objects) == 0
+        assert all(not dd0 for dd0 in store.links_to.values())
+        assert store.lookup("barcode", "DLS-MX-1234") == []
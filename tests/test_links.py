@@ -0,0 +1,124 @@
+# encoding: utf-8
+""" Tests for the reverse-link index of MxlimsStore
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import pytest
+
+from mxlims.impl.LinkSpecification import LINK_ID_FIELDS_N1, LINK_ID_FIELDS_NN
+from mxlims.impl.MxlimsStore import CascadeMode, MxlimsStore
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.MxProcessing import MxProcessing
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+
+
+def expected_links(store):
+    """Reverse-link index recalculated from the object fields"""
+    result = {key: {} for key in store.links_to}
+    for basetypename, obj_by_id in store.objects_by_id.items():
+        for uid, obj in obj_by_id.items():
+            for id_field_name in LINK_ID_FIELDS_N1[basetypename]:
+                target_uid = getattr(obj, id_field_name)
+                if target_uid is not None:
+                    index = result[(basetypename, id_field_name)]
+                    index.setdefault(target_uid, set()).add(uid)
+            for id_field_name in LINK_ID_FIELDS_NN[basetypename]:
+                for target_uid in getattr(obj, id_field_name) or ():
+                    index = result[(basetypename, id_field_name)]
+                    index.setdefault(target_uid, set()).add(uid)
+    return result
+
+
+def assert_links_consistent(store):
+    found = {
+        key: {target_uid: set(uids) for target_uid, uids in index.items() if uids}
+        for key, index in store.links_to.items()
+    }
+    assert found == expected_links(store)
+
+
+@pytest.fixture
+def linked_store():
+    """Store with two pucks holding two pins each, a sweep on each pin,
+    and a job using the first two sweeps"""
+    with MxlimsStore() as store:
+        pucks = list(Puck(barcode=f"puck{ind}") for ind in range(2))
+        pins = list(Pin(container_id=pucks[ind // 2].uuid) for ind in range(4))
+        sweeps = list(
+            CollectionSweep(logistical_sample_id=pin.uuid) for pin in pins
+        )
+        job = MxProcessing(input_data_ids=[sweep.uuid for sweep in sweeps[:2]])
+        assert_links_consistent(store)
+        yield store, pucks, pins, sweeps, job
+
+
+def test_links_after_reassignment(linked_store):
+    store, pucks, pins, sweeps, job = linked_store
+    pins[0].container = pucks[1]
+    pins[3].container_id = None
+    sweeps[2].logistical_sample = pins[0]
+    job.input_data = sweeps[1:3]
+    job.input_data_ids.append(sweeps[3].uuid)
+    job.input_data_ids.discard(sweeps[1].uuid)
+    assert_links_consistent(store)
+    assert pucks[0].contents == [pins[1]]
+    assert set(pin.uuid for pin in pucks[1].contents) == {
+        pins[0].uuid, pins[2].uuid
+    }
+    assert sweeps[3].uuid in job.input_data_ids
+    assert job.input_data == [sweeps[2], sweeps[3]]
+
+
+@pytest.mark.parametrize("cascade", list(CascadeMode))
+def test_links_after_delete(linked_store, cascade):
+    store, pucks, pins, sweeps, job = linked_store
+    store.delete(pucks[0], cascade=cascade)
+    store.delete(sweeps[0], cascade=cascade)
+    assert_links_consistent(store)
+    assert not store.is_registered(pucks[0])
+    if cascade is CascadeMode.none:
+        assert sweeps[0].uuid in job.input_data_ids
+    else:
+        assert list(job.input_data_ids) == [sweeps[1].uuid]
+    if cascade is CascadeMode.contents:
+        assert not store.is_registered(pins[0])
+    else:
+        assert store.is_registered(pins[0])
+
+
+def test_links_after_rollback(linked_store):
+    store, pucks, pins, sweeps, job = linked_store
+    before = expected_links(store)
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            pins[0].container = pucks[1]
+            job.input_data_ids.append(sweeps[3].uuid)
+            job.input_data_ids.discard(sweeps[0].uuid)
+            new_pin = Pin(container_id=pucks[0].uuid)
+            store.delete(pins[1])
+            raise RuntimeError("abort")
+    assert_links_consistent(store)
+    assert expected_links(store) == before
+    assert not store.is_registered(new_pin)
+    assert store.is_registered(pins[1])
+    assert pins[0].container is pucks[0]
+    assert list(job.input_data_ids) == [sweeps[0].uuid, sweeps[1].uuid]
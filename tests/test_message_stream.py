@@ -0,0 +1,206 @@
+# encoding: utf-8
+""" Tests for reading and writing messages incrementally
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+import mxlims
+from mxlims.impl.MessageStream import iter_message_json, iter_message_objects
+from mxlims.impl.MxlimsImplementation import to_export_json
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.messages.MxlimsMessage import MxlimsMessage
+from mxlims.mxpydantic.messages.MxlimsMessageStrict import MxlimsMessageStrict
+from mxlims.mxpydantic.messages.ShipmentMessage import ShipmentMessage
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.MxProcessing import MxProcessing
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+
+MESSAGE_DIR = Path(mxlims.__file__).parent / "test" / "json" / "v0.6.13" / "messages"
+
+MESSAGES = list(
+    (cls, path)
+    for cls in (MxlimsMessageStrict, ShipmentMessage)
+    for path in sorted((MESSAGE_DIR / cls.__name__ / "valid").glob("*.json"))
+)
+
+CHUNK_SIZES = (1, 2, 7, 4096)
+
+
+def dumped_objects(store):
+    """{uuid: model_dump()} for the objects in store"""
+    return dict((obj.uuid, obj.model_dump()) for obj in store.iter_objects())
+
+
+def dumps_message(message):
+    """Message as written by export_message before write_message was added"""
+    message_json = json.loads(
+        message.model_dump_json(
+            indent=4, by_alias=True, exclude_none=True, serialize_as_any=True
+        )
+    )
+    to_export_json(message_json)
+    return json.dumps(message_json, indent=4)
+
+
+def written_message(message):
+    """Message as written by write_message, checking text and binary output"""
+    text = io.StringIO()
+    message.write_message(text)
+    binary = io.BytesIO()
+    message.write_message(binary)
+    assert binary.getvalue() == text.getvalue().encode("ascii")
+    return text.getvalue()
+
+
+@pytest.fixture
+def mixed_store():
+    """Store with pucks, pins, sweeps and jobs, with non-ASCII text"""
+    with MxlimsStore() as store:
+        pucks = list(
+            Puck(barcode=f"K{ind}é中", identifiers={"esrf.fr": 'b\n"x'})
+            for ind in range(2)
+        )
+        pins = list(
+            Pin(barcode=f"P{ind}ü", container_id=pucks[ind % 2].uuid)
+            for ind in range(4)
+        )
+        sweeps = list(
+            CollectionSweep(energy=12000.0 + ind / 3, logistical_sample_id=pin.uuid)
+            for ind, pin in enumerate(pins)
+        )
+        jobs = list(
+            MxProcessing(input_data_ids=[sweep.uuid for sweep in sweeps[ind::2]])
+            for ind in range(2)
+        )
+        yield store, pucks + pins + sweeps + jobs
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize(
+    "cls, path", MESSAGES, ids=list(path.name for _, path in MESSAGES)
+)
+def test_iter_message_objects(cls, path, chunk_size):
+    with MxlimsStore() as store:
+        cls.from_message_file(path)
+        expected = dumped_objects(store)
+    with MxlimsStore() as store:
+        objects = list(iter_message_objects(cls, path, chunk_size=chunk_size))
+        assert all(obj.mxlims_store is store for obj in objects)
+        assert len(objects) == len(expected)
+        assert dumped_objects(store) == expected
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_iter_message_json(chunk_size):
+    path = MESSAGES[0][1]
+    message_json = {}
+    for tag, name, obj in iter_message_json(path, chunk_size):
+        if tag == "version":
+            message_json[tag] = obj
+        else:
+            message_json.setdefault(tag, {})[name] = obj
+    expected = json.loads(path.read_text())
+    assert message_json == dict((key, val) for key, val in expected.items() if val)
+
+
+@pytest.mark.parametrize(
+    "cls, path", MESSAGES, ids=list(path.name for _, path in MESSAGES)
+)
+def test_write_message(cls, path, tmp_path):
+    with MxlimsStore():
+        message = cls.from_message_file(path)
+        assert written_message(message) == dumps_message(message)
+        message.export_message(tmp_path / "message.json")
+    assert (tmp_path / "message.json").read_text() == dumps_message(message)
+
+
+def test_write_message_with_stubs(mixed_store):
+    store, objects = mixed_store
+    # The pins are linked to, but not in the message, and so written as stubs
+    message = MxlimsMessage.from_pydantic_objects(objects[6:])
+    text = written_message(message)
+    assert text == dumps_message(message)
+    message_json = json.loads(text)
+    stubs = message_json["LogisticalSample"]
+    assert set(stub["uuid"] for stub in stubs.values()) == set(
+        str(pin.uuid) for pin in objects[2:6]
+    )
+    assert all(set(stub) == {"mxlimsBaseType", "uuid"} for stub in stubs.values())
+    assert len(message_json["CollectionSweep"]) == 4
+    assert "Pin" not in message_json
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_non_ascii_round_trip(mixed_store, tmp_path, chunk_size):
+    store, objects = mixed_store
+    message = MxlimsMessage.from_pydantic_objects(objects)
+    path = tmp_path / "message.json"
+    message.export_message(path)
+    text = path.read_text()
+    assert text == dumps_message(message)
+    assert text.isascii()
+    with MxlimsStore() as store2:
+        loaded = list(iter_message_objects(MxlimsMessage, path, chunk_size=chunk_size))
+        assert dumped_objects(store2) == dumped_objects(store)
+        assert len(loaded) == len(objects)
+        puck = store2.lookup("barcode", "K0é中")[0]
+        assert puck.identifiers == {"esrf.fr": 'b\n"x'}
+        assert list(pin.barcode for pin in puck.contents) == ["P0ü", "P2ü"]
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_iter_message_objects_with_stubs(tmp_path, chunk_size):
+    pin_uid = "0196f23a-dce0-2560-baac-f1b23ec9e0dd"
+    message_json = {
+        "version": "0.6.13",
+        "CollectionSweep": {
+            "Sweep1": {
+                "mxlimsType": "CollectionSweep",
+                "energy": 12700.0,
+                "logisticalSampleRef": {"$ref": "#/LogisticalSample/Pin1"},
+            }
+        },
+        "LogisticalSample": {
+            "Pin1": {"mxlimsBaseType": "LogisticalSample", "uuid": pin_uid}
+        },
+    }
+    path = tmp_path / "message.json"
+    path.write_text(json.dumps(message_json, indent=4))
+    with MxlimsStore() as store:
+        MxlimsMessage.from_message_file(path)
+        assert len(store.objects) == 1
+    with MxlimsStore() as store:
+        (sweep,) = iter_message_objects(MxlimsMessage, path, chunk_size=chunk_size)
+        # The stub is used for the link, and not loaded
+        assert list(store.objects) == [sweep.uuid]
+        assert str(sweep.logistical_sample_id) == pin_uid
+        assert sweep.logistical_sample is None
+    del message_json["LogisticalSample"]["Pin1"]["uuid"]
+    path.write_text(json.dumps(message_json, indent=4))
+    with MxlimsStore():
+        with pytest.raises(ValueError, match="stub lacks uuid"):
+            list(iter_message_objects(MxlimsMessage, path, chunk_size=chunk_size))
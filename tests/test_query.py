@@ -0,0 +1,68 @@
+# encoding: utf-8
+""" Tests for queries over MxlimsStore objects
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import pytest
+
+from mxlims.impl.MxlimsImplementation import MxlimsStore
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.MxProcessing import MxProcessing
+
+
+@pytest.fixture
+def processing_store():
+    """Store with four sweeps, and jobs using one or two of them as input"""
+    with MxlimsStore() as store:
+        sweeps = list(CollectionSweep(energy=12600.0 + 10 * ind) for ind in range(4))
+        jobs = list(
+            MxProcessing(input_data_ids=[sweeps[ind].uuid, sweeps[(ind + 1) % 4].uuid])
+            for ind in range(4)
+        )
+        yield store, sweeps, jobs
+
+
+@pytest.mark.parametrize("use_indexes", [True, False])
+def test_query_link_id_set(processing_store, use_indexes):
+    store, sweeps, jobs = processing_store
+    query = store.query("MxProcessing", use_indexes=use_indexes)
+    assert query.where("inputDataIds", "==", sweeps[1].uuid).all() == jobs[:2]
+    assert query.where("input_data_ids", "==", sweeps[1]).all() == jobs[:2]
+    assert query.where("inputDataIds", "in", [sweeps[0].uuid]).all() == [
+        jobs[0], jobs[3]
+    ]
+    assert query.where("inputData", "==", sweeps[2]).all() == jobs[1:3]
+    assert query.where("inputData.energy", ">", 12625.0).all() == jobs[2:]
+
+
+def test_query_link_id_set_after_append(processing_store):
+    store, sweeps, jobs = processing_store
+    jobs[0].append_input_data(sweeps[2])
+    query = store.query("MxProcessing").where("inputDataIds", "==", sweeps[2].uuid)
+    assert set(job.uuid for job in query) == set(job.uuid for job in jobs[:3])
+
+
+def test_index_on_link_id_set(processing_store):
+    store, sweeps, jobs = processing_store
+    store.add_index("input", "input_data_ids")
+    assert store.lookup("input", sweeps[3].uuid) == [jobs[2], jobs[3]]
+    query = store.query("MxProcessing").where("inputDataIds", "==", sweeps[3].uuid)
+    assert query.all() == jobs[2:]
@@ -0,0 +1,61 @@
+# encoding: utf-8
+""" Tests for message export and import round trips
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import json
+from pathlib import Path
+
+import pytest
+
+import mxlims
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.messages.MxlimsMessageStrict import MxlimsMessageStrict
+from mxlims.mxpydantic.messages.ShipmentMessage import ShipmentMessage
+
+MESSAGE_DIR = Path(mxlims.__file__).parent / "test" / "json" / "v0.6.13" / "messages"
+
+MESSAGES = list(
+    (cls, path)
+    for cls in (MxlimsMessageStrict, ShipmentMessage)
+    for path in sorted((MESSAGE_DIR / cls.__name__ / "valid").glob("*.json"))
+)
+
+
+@pytest.mark.parametrize(
+    "cls, path", MESSAGES, ids=list(path.name for _, path in MESSAGES)
+)
+def test_export_import_round_trip(cls, path, tmp_path):
+    with MxlimsStore() as store:
+        message = cls.from_message_file(path)
+        n_objects = len(store.objects)
+        message.export_message(tmp_path / "first.json")
+    assert json.loads((tmp_path / "first.json").read_text()) == json.loads(
+        path.read_text()
+    )
+    with MxlimsStore() as store:
+        message2 = cls.from_message_file(tmp_path / "first.json")
+        assert len(store.objects) == n_objects
+        message2.export_message(tmp_path / "second.json")
+    assert message2.model_dump(mode="json") == message.model_dump(mode="json")
+    assert (tmp_path / "second.json").read_text() == (
+        tmp_path / "first.json"
+    ).read_text()
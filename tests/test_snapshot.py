@@ -0,0 +1,64 @@
+# encoding: utf-8
+""" Tests for MxlimsStore snapshots
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import gc
+
+from mxlims.impl.MxlimsImplementation import MxlimsStore
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.MxProcessing import MxProcessing
+
+
+def test_snapshot_sees_old_values():
+    with MxlimsStore() as store:
+        sweep = CollectionSweep(energy=12600.0)
+        job = MxProcessing(input_data_ids=[sweep.uuid])
+        snapshot = store.snapshot()
+        sweep.energy = 12700.0
+        job.input_data_ids.discard(sweep.uuid)
+        old_sweep = snapshot.get(sweep.uuid)
+        assert old_sweep.energy == 12600.0
+        assert snapshot.get(job.uuid).input_data_ids == [sweep.uuid]
+        assert sweep.energy == 12700.0
+        assert not job.input_data_ids
+
+
+def test_change_log_dropped_with_last_snapshot():
+    with MxlimsStore() as store:
+        sweeps = list(CollectionSweep(energy=12600.0 + ind) for ind in range(3))
+        log = store._change_log
+        snapshot1 = store.snapshot()
+        snapshot2 = store.snapshot()
+        sweeps[0].energy = 1.0
+        assert log.entries
+        del snapshot1
+        gc.collect()
+        assert log.entries
+        assert snapshot2.get(sweeps[0].uuid).energy == 12600.0
+        del snapshot2
+        gc.collect()
+        assert not log.snapshots
+        assert not log.entries
+        # Nothing is recorded while there are no snapshots
+        for sweep in sweeps:
+            sweep.energy = 2.0
+        assert not log.entries
@@ -0,0 +1,128 @@
+# encoding: utf-8
+""" Tests for saving and loading MxlimsStore snapshot files
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import pytest
+
+from mxlims.impl import SnapshotFile
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.MxProcessing import MxProcessing
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    """Snapshot file of a store with pucks, pins, sweeps and a job, and the
+    indices of that store"""
+    path = tmp_path / "store.snapshot"
+    with MxlimsStore() as store:
+        store.add_index("energy", "energy")
+        pucks = list(Puck(barcode=f"K{ind}") for ind in range(2))
+        pins = list(
+            Pin(barcode=f"P{ind}", container_id=pucks[ind % 2].uuid)
+            for ind in range(4)
+        )
+        sweeps = list(
+            CollectionSweep(energy=12000.0 + ind, logistical_sample_id=pin.uuid)
+            for ind, pin in enumerate(pins)
+        )
+        MxProcessing(input_data_ids=[sweep.uuid for sweep in sweeps[:2]])
+        assert store.save_snapshot(path) == 11
+        indices = index_contents(store)
+    return path, indices
+
+
+def index_contents(store):
+    """uuid maps and indices of store, with uuids for objects"""
+    return (
+        list(store.objects),
+        dict((tag, list(dd0)) for tag, dd0 in store.objects_by_id.items()),
+        dict((tag, list(dd0)) for tag, dd0 in store.objects_by_type.items() if dd0),
+        dict(
+            (key, dict((uid, list(dd1)) for uid, dd1 in dd0.items() if dd1))
+            for key, dd0 in store.links_to.items()
+        ),
+        dict(
+            (name, dict((key, list(dd1)) for key, dd1 in index.uuids_by_key.items()))
+            for name, index in store.indexes.items()
+        ),
+    )
+
+
+def test_load_restores_indices(snapshot_path):
+    snapshot_path, indices = snapshot_path
+    with MxlimsStore() as store:
+        store.add_index("energy", "energy")
+        objects = store.load_snapshot(snapshot_path)
+        assert index_contents(store) == indices
+        assert all(obj.mxlims_store is store for obj in objects)
+        puck = store.lookup("barcode", "K1")[0]
+        assert list(pin.barcode for pin in puck.contents) == ["P1", "P3"]
+        sweep = store.lookup("energy", 12002.0)[0]
+        assert sweep.logistical_sample.barcode == "P2"
+        job = store.get_all("Job")[0]
+        assert job.input_data[0].energy == 12000.0
+        # The loaded objects are kept up to date like any others
+        sweep.logistical_sample = puck.contents[0]
+        job.input_data_ids.append(sweep.uuid)
+        assert store.get_referrers("Job", "input_data_ids", sweep.uuid) == [job]
+        assert len(puck.contents[0].datasets) == 2
+
+
+def test_load_rebuilds_new_index(snapshot_path):
+    snapshot_path = snapshot_path[0]
+    with MxlimsStore() as store:
+        store.add_index("energy2", "energy")
+        store.load_snapshot(snapshot_path)
+        assert len(store.lookup("energy2", 12003.0)) == 1
+
+
+def test_load_into_non_empty_store(snapshot_path):
+    snapshot_path = snapshot_path[0]
+    with MxlimsStore() as store:
+        Pin(barcode="other")
+        objects = store.load_snapshot(snapshot_path)
+        assert len(store.objects) == len(objects) + 1
+        assert len(store.lookup("barcode", "K0")[0].contents) == 2
+        # A second load clashes, and loads nothing
+        with pytest.raises(ValueError):
+            store.load_snapshot(snapshot_path)
+        assert len(store.objects) == len(objects) + 1
+
+
+def test_schema_hash_mismatch(snapshot_path, monkeypatch):
+    snapshot_path = snapshot_path[0]
+    monkeypatch.setattr(SnapshotFile, "schema_hash", lambda: "different")
+    with MxlimsStore() as store:
+        with pytest.raises(ValueError, match="different MXLIMS schemas"):
+            store.load_snapshot(snapshot_path)
+        assert not store.objects
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / "message.json"
+    path.write_text("{}")
+    with MxlimsStore() as store:
+        with pytest.raises(ValueError, match="not an MXLIMS store snapshot"):
+            store.load_snapshot(path)
@@ -0,0 +1,165 @@
+# encoding: utf-8
+""" Tests for SqliteStore
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import gc
+
+import pytest
+
+from mxlims.impl import SqliteStore as SqliteStoreModule
+from mxlims.impl.SqliteStore import SqliteStore
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.MxProcessing import MxProcessing
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Database file with two pucks, four pins, a sweep per pin, and a job
+    taking the first two sweeps as input"""
+    path = tmp_path / "store.sqlite"
+    with SqliteStore(path) as store:
+        pucks = list(Puck(barcode=f"K{ind}") for ind in range(2))
+        pins = list(
+            Pin(barcode=f"P{ind}", container_id=pucks[ind % 2].uuid)
+            for ind in range(4)
+        )
+        sweeps = list(
+            CollectionSweep(energy=12000.0 + ind, logistical_sample_id=pin.uuid)
+            for ind, pin in enumerate(pins)
+        )
+        MxProcessing(input_data_ids=[sweep.uuid for sweep in sweeps[:2]])
+    return path
+
+
+def test_reopen(db_path):
+    with SqliteStore(db_path) as store:
+        assert len(store.objects) == 11
+        assert len(store.objects_by_type["Pin"]) == 4
+        pin = store.lookup("barcode", "P2")[0]
+        assert pin.mxlims_store is store
+        assert pin.container.barcode == "K0"
+        assert store.get(pin.uuid) is pin
+        sweep = pin.datasets[0]
+        assert sweep.energy == 12002.0
+        # Only the fields set are restored as set
+        assert sweep.model_fields_set == {
+            "uuid",
+            "energy",
+            "logistical_sample_id",
+        }
+
+
+def test_reverse_links(db_path):
+    with SqliteStore(db_path) as store:
+        puck = store.lookup("barcode", "K1")[0]
+        # n..1 links, from the foreign-key columns
+        assert list(pin.barcode for pin in puck.contents) == ["P1", "P3"]
+        assert len(store.links_to["LogisticalSample", "container_id"][puck.uuid]) == 2
+        # n..n links, from the link tables
+        job = store.get_all("Job")[0]
+        sweeps = job.input_data
+        assert list(sweep.energy for sweep in sweeps) == [12000.0, 12001.0]
+        assert sweeps[0].input_for == [job]
+        assert sweeps[0].logistical_sample.datasets == [sweeps[0]]
+        assert store.lookup("barcode", "P2")[0].datasets[0].input_for == []
+
+
+def test_lru_cache_keeps_identity(db_path):
+    with SqliteStore(db_path, cache_size=2) as store:
+        pin = store.lookup("barcode", "P0")[0]
+        uid = pin.uuid
+        # Cycle the other objects through the cache
+        assert len(list(store.objects.values())) == 11
+        assert len(store._cache) == 2
+        assert uid not in store._cache
+        assert store.get(uid) is pin
+        assert pin.container.contents[0] is pin
+        # Once unreferenced, the object is dropped, and read again on access
+        del pin
+        list(store.objects.values())
+        gc.collect()
+        assert uid not in store._live
+        pin = store.get(uid)
+        assert pin.barcode == "P0"
+        assert store.lookup("barcode", "P0") == [pin]
+
+
+def test_changes_survive_eviction(db_path):
+    with SqliteStore(db_path, cache_size=2) as store:
+        uid = store.lookup("barcode", "P0")[0].uuid
+        store.get(uid).barcode = "P0a"
+        list(store.objects.values())
+        gc.collect()
+        assert store.get(uid).barcode == "P0a"
+    with SqliteStore(db_path) as store:
+        assert store.lookup("barcode", "P0a")[0].uuid == uid
+
+
+def test_transaction_rollback(db_path):
+    with SqliteStore(db_path) as store:
+        pin = store.lookup("barcode", "P0")[0]
+        puck = pin.container
+        with pytest.raises(KeyError):
+            with store.transaction():
+                Pin(barcode="new", container_id=puck.uuid)
+                pin.barcode = "changed"
+                pin.container_id = None
+                raise KeyError("rollback")
+        assert pin.barcode == "P0"
+        assert pin.container is puck
+        assert store.lookup("barcode", "new") == []
+        assert list(obj.barcode for obj in puck.contents) == ["P0", "P2"]
+        assert len(store.objects) == 11
+    with SqliteStore(db_path) as store:
+        assert store.lookup("barcode", "new") == []
+        assert store.lookup("barcode", "changed") == []
+        assert len(store.lookup("barcode", "P0")[0].container.contents) == 2
+
+
+def test_cascade_delete(db_path):
+    with SqliteStore(db_path) as store:
+        puck = store.lookup("barcode", "K0")[0]
+        pins = puck.contents
+        sweeps = list(pin.datasets[0] for pin in pins)
+        deleted = store.delete(puck, cascade="contents")
+        assert deleted == pins + [puck]
+        assert all(not store.is_registered(obj) for obj in deleted)
+        # Links to the deleted objects are nullified
+        assert all(sweep.logistical_sample_id is None for sweep in sweeps)
+        # Datasets are not contents, and are kept
+        assert sweeps[0] in store.get_all("Job")[0].input_data
+        assert len(store.objects) == 8
+    with SqliteStore(db_path) as store:
+        assert len(store.objects) == 8
+        assert store.lookup("barcode", "K0") == []
+        assert store.lookup("barcode", "P0") == []
+        sweep = store.get(sweeps[0].uuid)
+        assert sweep.logistical_sample is None
+        assert sweep.input_for == store.get_all("Job")
+
+
+def test_schema_hash_mismatch(db_path, monkeypatch):
+    monkeypatch.setattr(SqliteStoreModule, "schema_hash", lambda: "other")
+    with pytest.raises(ValueError, match="different MXLIMS schemas"):
+        SqliteStore(db_path)
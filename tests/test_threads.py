@@ -0,0 +1,168 @@
+# encoding: utf-8
+""" Tests for thread-safe MxlimsStores
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import sys
+import threading
+import uuid
+
+from mxlims.impl.MxlimsImplementation import MxlimsStore
+from mxlims.impl.StoreEvents import EventKind
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+
+
+def run_in_transaction(store, inside, release, fail):
+    """Create a Pin in a transaction, and wait for release before ending it"""
+    with store.activate():
+        try:
+            with store.transaction():
+                Pin(barcode="other")
+                inside.set()
+                release.wait(10)
+                if fail:
+                    raise KeyError("rollback")
+        except KeyError:
+            pass
+
+
+def test_transactions_do_not_block_other_threads():
+    store = MxlimsStore(thread_safe=True)
+    inside = threading.Event()
+    release = threading.Event()
+    thread = threading.Thread(
+        target=run_in_transaction, args=(store, inside, release, True)
+    )
+    thread.start()
+    assert inside.wait(10)
+    try:
+        # Would deadlock if the other transaction held the store locks
+        with store.activate(), store.transaction():
+            puck = Puck()
+            pin = Pin(barcode="mine", container_id=puck.uuid)
+        assert puck.contents == [pin]
+    finally:
+        release.set()
+        thread.join()
+    # The other transaction is rolled back, and this one is not
+    assert store.lookup("barcode", "other") == []
+    assert store.lookup("barcode", "mine") == [pin]
+    assert puck.contents == [pin]
+
+
+def test_event_batches_are_per_thread():
+    store = MxlimsStore(thread_safe=True)
+    received = []
+    store.subscribe(received.append, kinds=(EventKind.created,))
+    inside = threading.Event()
+    release = threading.Event()
+    thread = threading.Thread(
+        target=run_in_transaction, args=(store, inside, release, False)
+    )
+    thread.start()
+    assert inside.wait(10)
+    try:
+        with store.activate():
+            pin = Pin(barcode="mine")
+        # Delivered at once, not held back by the other thread's transaction
+        assert [event.uuid for events in received for event in events] == [pin.uuid]
+    finally:
+        release.set()
+        thread.join()
+    assert len(received) == 2
+
+
+def test_subscribers_run_without_store_locks():
+    store = MxlimsStore(thread_safe=True)
+    with store.activate():
+        pin = Pin(barcode="pin")
+        sweep = CollectionSweep(energy=12000.0, logistical_sample_id=pin.uuid)
+    in_callback = threading.Event()
+    other_has_lock = threading.Event()
+
+    def on_dataset_change(events):
+        # Takes the LogisticalSample lock, while the other thread holds it
+        # and waits for the Dataset lock
+        if events[0].basetypename == "Dataset":
+            in_callback.set()
+            assert other_has_lock.wait(10)
+            pin.barcode = "seen"
+
+    def lock_in_other_order():
+        with store.lock("LogisticalSample"):
+            other_has_lock.set()
+            assert in_callback.wait(10)
+            with store.lock("Dataset"):
+                pass
+
+    store.subscribe(on_dataset_change, kinds=(EventKind.updated,))
+    thread = threading.Thread(target=lock_in_other_order, daemon=True)
+    thread.start()
+    changer = threading.Thread(
+        target=setattr, args=(sweep, "energy", 12500.0), daemon=True
+    )
+    changer.start()
+    changer.join(10)
+    thread.join(10)
+    assert not changer.is_alive() and not thread.is_alive(), "Deadlock"
+    assert store.lookup("barcode", "seen") == [pin]
+
+
+def register_same_uuid(store, uid):
+    """Create a Pin and a CollectionSweep with the same uuid in two threads"""
+    barrier = threading.Barrier(2)
+    created = []
+    errors = []
+
+    def create(cls):
+        with store.activate():
+            barrier.wait(10)
+            try:
+                created.append(cls(uuid=uid))
+            except ValueError as exc:
+                errors.append(exc)
+
+    threads = [
+        threading.Thread(target=create, args=(cls,)) for cls in (Pin, CollectionSweep)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return created, errors
+
+
+def test_uuid_clash_across_core_types():
+    store = MxlimsStore(thread_safe=True)
+    # Switch threads often, to interleave the two registrations
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(200):
+            uid = uuid.uuid4()
+            created, errors = register_same_uuid(store, uid)
+            # Only one of the two objects with the same uuid gets in
+            assert len(created) == 1 and len(errors) == 1
+            assert store.objects[uid] is created[0]
+    finally:
+        sys.setswitchinterval(interval)
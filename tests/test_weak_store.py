@@ -0,0 +1,119 @@
+# encoding: utf-8
+""" Tests for MxlimsStores holding weak references to their objects
+
+License:
+
+The code in this file is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This code is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with this file. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+__copyright__ = """ Copyright © 2026 -  MXLIMS collaboration."""
+__license__ = "LGPLv3+"
+__author__ = "Rasmus H Fogh"
+
+import gc
+
+import pytest
+
+from mxlims.impl.MxlimsStore import MxlimsStore
+from mxlims.mxpydantic.objects.CollectionSweep import CollectionSweep
+from mxlims.mxpydantic.objects.MxProcessing import MxProcessing
+from mxlims.mxpydantic.objects.Pin import Pin
+from mxlims.mxpydantic.objects.Puck import Puck
+
+CONTAINER = ("LogisticalSample", "container_id")
+SAMPLE = ("Dataset", "logistical_sample_id")
+INPUT_DATA = ("Job", "input_data_ids")
+
+
+@pytest.fixture
+def weak_store():
+    with MxlimsStore(weak=True) as store:
+        store.add_index("energy", "energy")
+        yield store
+
+
+def make_objects(puck):
+    """Pins in puck, a sweep per pin, and a job using the sweeps"""
+    pins = list(Pin(barcode=f"P{ind}", container_id=puck.uuid) for ind in range(3))
+    sweeps = list(
+        CollectionSweep(energy=12000.0 + ind, logistical_sample_id=pin.uuid)
+        for ind, pin in enumerate(pins)
+    )
+    job = MxProcessing(input_data_ids=[sweep.uuid for sweep in sweeps])
+    return pins, sweeps, job
+
+
+def stored_uuids(store):
+    """Set of uuids found in any dictionary or index of store"""
+    result = set(store.objects)
+    for dd0 in store.objects_by_id.values():
+        result.update(dd0)
+    for dd0 in store.objects_by_type.values():
+        result.update(dd0)
+    for dd0 in store.links_to.values():
+        for referrers in dd0.values():
+            result.update(referrers)
+    for index in store.indexes.values():
+        result.update(index.keys_by_uuid)
+        for uids in index.uuids_by_key.values():
+            result.update(uids)
+    return result
+
+
+def test_unreferenced_objects_are_dropped(weak_store):
+    store = weak_store
+    puck = Puck(barcode="K1")
+    pins, sweeps, job = make_objects(puck)
+    dropped = set(obj.uuid for obj in pins[1:] + sweeps[1:] + [job])
+    # Keep the first pin and sweep only
+    del pins[1:], sweeps[1:], job
+    gc.collect()
+    assert stored_uuids(store) == {puck.uuid, pins[0].uuid, sweeps[0].uuid}
+    assert not dropped & stored_uuids(store)
+    assert store.links_to[CONTAINER] == {puck.uuid: {pins[0].uuid: None}}
+    assert store.links_to[SAMPLE] == {pins[0].uuid: {sweeps[0].uuid: None}}
+    assert store.links_to[INPUT_DATA] == {}
+    assert store.lookup("barcode", "P1") == []
+    assert store.lookup("energy", 12000.0) == sweeps
+    assert puck.contents == pins
+    assert sweeps[0].input_for == []
+    assert store.check_integrity()
+
+
+def test_referenced_objects_are_kept(weak_store):
+    store = weak_store
+    puck = Puck(barcode="K1")
+    pins, sweeps, job = make_objects(puck)
+    gc.collect()
+    assert len(store.objects) == 8
+    # Links do not keep their targets alive
+    del puck
+    gc.collect()
+    assert len(store.objects) == 7
+    assert pins[0].container is None
+    assert store.lookup("barcode", "P2") == [pins[2]]
+    assert job.input_data == sweeps
+
+
+def test_objects_created_in_transaction(weak_store):
+    store = weak_store
+    puck = Puck(barcode="K1")
+    with store.transaction():
+        make_objects(puck)
+        # Held by the transaction until it ends
+        gc.collect()
+        assert len(store.objects) == 8
+    gc.collect()
+    assert stored_uuids(store) == {puck.uuid}
+    assert puck.contents == []